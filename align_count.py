@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+align_count.py
+==============
+toBAM.sh + to_featureCounts.sh 的並行版：STAR 比對與 featureCounts 計數重疊執行
+
+● STAR 索引只載入一次：先 --genomeLoad LoadAndExit 放進共享記憶體，
+  各 sample 以 --genomeLoad LoadAndKeep 共用，結束後 Remove（--keep_genome 可保留）
+● 在「總執行緒 / 總記憶體」預算內同時跑多個 sample：
+    每個 STAR 佔 --star_threads 執行緒與 --sort_ram GB（--limitBAMsortRAM）
+    共享索引大小（Genome + SA + SAindex）先從記憶體預算扣除
+● 某個專案的 BAM 全部完成就立即啟動該專案的 featureCounts，不等其他專案
+● 可續跑：已有 Log.final.out 的 sample 略過；counts 檔比所有 BAM 新則略過計數
+● counts 檔與 to_featureCounts.sh 相同：<INPUT_PREFIX>_<TISSUE>_count/<INPUT_PREFIX>_counts.txt
+  （combine_geo_data.py 讀取此路徑）；--keep_tissue 改為 <INPUT_PREFIX>_<TISSUE>_counts.txt
+
+--star / --featurecounts 可指定執行檔（例如測試用的 stub）。
+"""
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import subprocess
+import sys
+import threading
+import time
+
+
+BAM_SUFFIX = "Aligned.sortedByCoord.out.bam"
+GENOME_FILES = ("Genome", "SA", "SAindex")
+
+
+# ────── 資源預算 ──────
+class Budget:
+    """執行緒 / 記憶體 token；不足時阻塞直到其他工作釋放
+
+    priority=True（featureCounts）等待期間，一般工作（STAR）不得取用，
+    避免計數被後續排隊的比對一直搶先。
+    """
+
+    def __init__(self, threads: int, mem_gb: float):
+        self.threads, self.mem = threads, mem_gb
+        self._cv = threading.Condition()
+        self._urgent = 0
+
+    def acquire(self, threads: int, mem_gb: float = 0.0, priority: bool = False):
+        fits = lambda: self.threads >= threads and self.mem >= mem_gb
+        with self._cv:
+            if priority:
+                self._urgent += 1
+                self._cv.wait_for(fits)
+                self._urgent -= 1
+            else:
+                self._cv.wait_for(lambda: fits() and not self._urgent)
+            self.threads -= threads
+            self.mem -= mem_gb
+
+    def release(self, threads: int, mem_gb: float = 0.0):
+        with self._cv:
+            self.threads += threads
+            self.mem += mem_gb
+            self._cv.notify_all()
+
+
+def run_logged(cmd, log_path: Path, budget: Budget, threads: int,
+               mem_gb: float = 0.0, priority: bool = False):
+    """取得預算後執行指令，stdout/stderr 寫入 log_path；回傳 (returncode, 秒數)"""
+    budget.acquire(threads, mem_gb, priority)
+    try:
+        t0 = time.perf_counter()
+        with open(log_path, "w") as log:
+            rc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+        return rc, time.perf_counter() - t0
+    finally:
+        budget.release(threads, mem_gb)
+
+
+# ────── 樣本收集 ──────
+def find_samples(input_dir: Path, paired: bool, ext: str):
+    """回傳 [(sample, [fastq...])]，依檔案大小由大到小"""
+    samples = []
+    if paired:
+        for fq1 in sorted(input_dir.glob(f"*_1{ext}")):
+            sample = fq1.name[: -len(f"_1{ext}")]
+            fq2 = input_dir / f"{sample}_2{ext}"
+            if not fq2.is_file():
+                print(f"⚠  配對檔 {fq2} 不存在，跳過 {sample}")
+                continue
+            samples.append((sample, [fq1, fq2]))
+    else:
+        for fq in sorted(input_dir.glob(f"*{ext}")):
+            samples.append((fq.name[: -len(ext)], [fq]))
+    samples.sort(key=lambda s: -sum(f.stat().st_size for f in s[1]))
+    return samples
+
+
+def find_projects(base_dir: Path, names, ext: str):
+    """names 為空時，自動找 base_dir 下含 FASTQ 的資料夾（排除 *_bam / *_count）"""
+    if names:
+        dirs = [base_dir / n for n in names]
+        missing = [d for d in dirs if not d.is_dir()]
+        if missing:
+            sys.exit(f"❌ 找不到資料夾：{', '.join(map(str, missing))}")
+        return dirs
+    return [d for d in sorted(base_dir.iterdir())
+            if d.is_dir() and not d.name.endswith(("_bam", "_count"))
+            and any(d.glob(f"*{ext}"))]
+
+
+def genome_size_gb(genome_dir: Path) -> float:
+    return sum((genome_dir / f).stat().st_size
+               for f in GENOME_FILES if (genome_dir / f).is_file()) / 1e9
+
+
+# ────── 單一步驟 ──────
+def star_cmd(args, fastqs, prefix: str, genome_load: str):
+    cmd = [args.star, "--genomeDir", args.genome_dir,
+           "--genomeLoad", genome_load,
+           "--readFilesIn", *map(str, fastqs)]
+    if args.gzip:
+        cmd += ["--readFilesCommand", "zcat"]
+    cmd += ["--runThreadN", str(args.star_threads),
+            "--outSAMtype", "BAM", "SortedByCoordinate",
+            "--limitBAMsortRAM", str(int(args.sort_ram * 1e9)),
+            "--outFileNamePrefix", prefix]
+    return cmd
+
+
+def align_sample(args, budget: Budget, out_dir: Path, sample: str, fastqs):
+    prefix = f"{out_dir}/{sample}_"
+    bam = Path(prefix + BAM_SUFFIX)
+    if Path(prefix + "Log.final.out").is_file() and bam.is_file():
+        return sample, bam, 0, 0.0, True
+    print(f"▶  STAR  : {sample}")
+    rc, wall = run_logged(star_cmd(args, fastqs, prefix, "LoadAndKeep"),
+                          Path(prefix + "run.log"), budget,
+                          args.star_threads, args.sort_ram)
+    return sample, bam, rc, wall, False
+
+
+def count_project(args, budget: Budget, project: Path, bams):
+    out_dir = project.parent / f"{project.name}_count"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    prefix = project.name if args.keep_tissue else project.name.rsplit("_", 1)[0]
+    output = out_dir / f"{prefix}_counts.txt"
+    newest_bam = max(b.stat().st_mtime for b in bams)
+    if output.is_file() and output.stat().st_mtime >= newest_bam:
+        return project, output, 0, 0.0, True
+
+    cmd = [args.featurecounts, "-T", str(args.fc_threads),
+           "-t", "exon", "-g", "gene_id", "-a", args.gtf, "-o", str(output)]
+    if args.paired:
+        cmd.append("-p")
+    cmd.append("--primary")
+    cmd += [str(b) for b in sorted(bams)]
+    print(f"▶  featureCounts : {project.name}（{len(bams)} BAM）")
+    rc, wall = run_logged(cmd, out_dir / "featureCounts.log", budget,
+                          args.fc_threads, priority=True)
+    return project, output, rc, wall, False
+
+
+# ────── 主程式 ──────
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description="Concurrent STAR alignment + per-project featureCounts.")
+    p.add_argument("--base_dir", default="raw_data",
+                   help="儲存主資料夾（toBAM.sh 的 BASE_DIR）")
+    p.add_argument("--project", action="append", default=[],
+                   help="<INPUT_PREFIX>_<TISSUE> 資料夾名稱，可重複；省略時自動偵測")
+    p.add_argument("--genome_dir", default="./ref/S_lycopersicum/star_index")
+    p.add_argument("--gtf", default="ref/S_lycopersicum/ITAG4.1_gene_models.gtf")
+    p.add_argument("--paired", action="store_true", help="雙端 (_1/_2)")
+    p.add_argument("--gzip", action="store_true", help="*.fastq.gz 輸入")
+    p.add_argument("--threads", type=int, default=24, help="總執行緒預算")
+    p.add_argument("--mem_gb", type=float, default=64, help="總記憶體預算 (GB)")
+    p.add_argument("--star_threads", type=int, default=6, help="每個 STAR 的執行緒")
+    p.add_argument("--sort_ram", type=float, default=4,
+                   help="每個 STAR 的 BAM 排序記憶體 (GB)")
+    p.add_argument("--fc_threads", type=int, default=4, help="featureCounts 執行緒")
+    p.add_argument("--keep_tissue", action="store_true",
+                   help="counts 檔名保留最後一段 _<TISSUE>（預設去掉，與 to_featureCounts.sh 相同）")
+    p.add_argument("--keep_genome", action="store_true",
+                   help="結束後不從共享記憶體移除索引")
+    p.add_argument("--star", default="STAR", help="STAR 執行檔")
+    p.add_argument("--featurecounts", default="featureCounts",
+                   help="featureCounts 執行檔")
+    args = p.parse_args(argv)
+
+    ext = ".fastq.gz" if args.gzip else ".fastq"
+    base = Path(args.base_dir)
+    projects = find_projects(base, args.project, ext)
+    plan = {}
+    for proj in projects:
+        samples = find_samples(proj, args.paired, ext)
+        if not samples:
+            print(f"⚠️  {proj} 中找不到 *{ext} – skipped.")
+            continue
+        plan[proj] = samples
+    if not plan:
+        sys.exit(f"❌ {base} 中沒有可比對的 FASTQ")
+
+    genome_gb = genome_size_gb(Path(args.genome_dir))
+    mem_left = args.mem_gb - genome_gb
+    if (mem_left < args.sort_ram or args.threads < args.star_threads
+            or args.threads < args.fc_threads):
+        sys.exit(f"❌ 預算不足：索引 {genome_gb:.1f} GB，剩 {mem_left:.1f} GB / "
+                 f"{args.threads} 執行緒，無法執行任何 STAR（{args.sort_ram} GB / "
+                 f"{args.star_threads} 執行緒）")
+    budget = Budget(args.threads, mem_left)
+    n_star = min(args.threads // args.star_threads, int(mem_left // args.sort_ram))
+    n_samples = sum(len(s) for s in plan.values())
+
+    print(f"▶  {len(plan)} 專案 / {n_samples} sample；"
+          f"最多 {n_star} 個 STAR 同時執行（索引 {genome_gb:.1f} GB 共用）")
+    print("-------------------------------------------------------")
+
+    # ---------- 載入共享索引 ----------
+    tmp = base / ".star_genome_load"
+    tmp.mkdir(parents=True, exist_ok=True)
+    load_cmd = [args.star, "--genomeDir", args.genome_dir,
+                "--genomeLoad", "LoadAndExit", "--outFileNamePrefix", f"{tmp}/"]
+    if subprocess.run(load_cmd, stdout=subprocess.DEVNULL).returncode != 0:
+        sys.exit("❌ STAR 無法載入索引到共享記憶體")
+
+    failed = []
+    try:
+        # STAR 與 featureCounts 分開排隊，計數不會排在尚未開始的比對之後
+        with ThreadPoolExecutor(max_workers=n_star) as star_pool, \
+             ThreadPoolExecutor(max_workers=len(plan)) as count_pool:
+            pending, remaining, bams = {}, {}, {}
+            for proj, samples in plan.items():
+                out_dir = proj.parent / f"{proj.name}_bam"
+                out_dir.mkdir(parents=True, exist_ok=True)
+                remaining[proj], bams[proj] = len(samples), []
+                for sample, fastqs in samples:
+                    fut = star_pool.submit(align_sample, args, budget, out_dir, sample, fastqs)
+                    pending[fut] = ("star", proj)
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    kind, proj = pending.pop(fut)
+                    if kind == "star":
+                        sample, bam, rc, wall, skipped = fut.result()
+                        remaining[proj] -= 1
+                        if rc != 0:
+                            failed.append(sample)
+                            print(f"❌ STAR 失敗：{sample}（見 {bam.parent}/{sample}_run.log）")
+                        else:
+                            bams[proj].append(bam)
+                            print(f"↺  已完成，略過 : {sample}" if skipped
+                                  else f"Finished        : {sample}（{wall:.0f}s）")
+                        if remaining[proj] == 0:
+                            if len(bams[proj]) == len(plan[proj]):
+                                nxt = count_pool.submit(count_project, args, budget,
+                                                  proj, bams[proj])
+                                pending[nxt] = ("count", proj)
+                            else:
+                                print(f"⚠️  {proj.name} 有 sample 失敗，不執行 featureCounts")
+                    else:
+                        _, output, rc, wall, skipped = fut.result()
+                        if rc != 0:
+                            failed.append(proj.name)
+                            print(f"❌ featureCounts 失敗：{proj.name}")
+                        else:
+                            print(f"↺  counts 已是最新 : {output}" if skipped
+                                  else f"完成，輸出：{output}（{wall:.0f}s）")
+    finally:
+        if not args.keep_genome:
+            subprocess.run([args.star, "--genomeDir", args.genome_dir,
+                            "--genomeLoad", "Remove",
+                            "--outFileNamePrefix", f"{tmp}/"],
+                           stdout=subprocess.DEVNULL)
+
+    if failed:
+        sys.exit(f"❌ 失敗：{', '.join(failed)}")
+    print("All samples processed!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+benchmark.py
+============
+以 synth_data.py 的合成資料量測各 pipeline 步驟的時間與記憶體
+
+  python benchmark.py run --scale small --out bench_results/           # 產生資料（已存在則沿用）並全部量測
+  python benchmark.py run --data synth_small --only deg_summary graph_dedupe --repeat 3
+  python benchmark.py compare bench_results/A.json bench_results/B.json
+  python benchmark.py startup --budget_ms 300        # cre_finding.py 的啟動時間
+
+● 每個 case 在獨立子行程執行，case 之間互不影響：
+    wall_s 含直譯器啟動與 import，import_s 為模組載入，stage_s 只含步驟本身；
+    CPU 時間由 os.wait4 取得，peak RSS 由子行程自行回報（含其 worker 行程）
+● 準備工作（複製輸入、先跑上游步驟）在父行程完成，不計入量測
+● 結果寫成 <out>/<時間>_<git commit>.json：
+    scale、git commit、Python 版本與每個 case 的
+    wall_s / import_s / stage_s / cpu_user_s / cpu_sys_s / peak_rss_mb / items / items_per_s（取 repeat 的中位數）
+● compare：列出兩次結果各 case 的耗時與記憶體比值
+● startup：量測 cre-finding --help、每個子指令 --help 與輕量子指令的啟動時間（取最小值），
+  超過 --budget_ms 者列出 -X importtime 最耗時的模組，並以 exit 1 結束；
+  結果寫成 <out>/startup_<時間>_<git commit>.json
+
+case：combine_geo_data, deg_summary, extract_DEG_and_nonDEG, extract_promoter,
+      extract_promoter_stream, extract_multi_expt_DEG_and_nonDEG,
+      extract_multi_expt_promoter, meme_parse, graph_dedupe, motif_logo
+"""
+
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+REPO = Path(__file__).resolve().parent
+PREFIX = "synth"
+SIG_COUNT = 2
+
+
+# ────── 準備（父行程）──────
+def _ids(path):
+    return [ln.strip() for ln in open(path) if ln.strip()]
+
+
+def setup_combine(data, work):
+    raw = work / "raw_data/SRP399644_tomato_root_count"
+    raw.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(data / "raw_counts/SYN_counts.txt", raw / "SRP399644_tomato_counts.txt")
+    shutil.copyfile(data / "run_info.txt", work / "run_info.txt")
+    (work / "exp_files/tomato").mkdir(parents=True, exist_ok=True)
+
+
+def setup_filter(data, work):
+    if not (work / "deg_summary" / f"{PREFIX}_nonDEG.tsv").is_file():
+        import deg_summary
+        deg_summary.main(["--input_dir", str(data / "deg_results"),
+                          "--out_dir", str(work / "deg_summary"), "--prefix", PREFIX])
+
+
+def setup_promoter(data, work):
+    """以 gene_lists 合成 Step-2 的 *_geneid.txt（不依賴前一個 case）"""
+    out = work / "deg_summary"
+    out.mkdir(parents=True, exist_ok=True)
+    deg, non = [], []
+    for d in sorted((data / "gene_lists").iterdir()):
+        deg += _ids(d / "DEG.txt")
+        non += _ids(d / "nonDEG.txt")
+    deg = list(dict.fromkeys(deg))
+    non = [g for g in dict.fromkeys(non) if g not in set(deg)]
+    for label, ids in (("DEG", deg), ("nonDEG", non)):
+        (out / f"{PREFIX}_{label}_filtered_sig_count_{SIG_COUNT}_geneid.txt").write_text(
+            "\n".join(ids) + "\n")
+    (work / "stream_ids.txt").write_text("\n".join(deg + non) + "\n")
+    shutil.rmtree(work / "prom_seq_files", ignore_errors=True)
+
+
+def setup_multi_promoter(data, work):
+    shutil.rmtree(work / "multi_prom", ignore_errors=True)
+    shutil.copytree(data / "gene_lists", work / "multi_prom")
+
+
+def setup_logo(data, work):
+    shutil.rmtree(work / "logos", ignore_errors=True)
+
+
+# ────── 量測本體（子行程）──────
+def run_combine(data, work):
+    import runpy
+    os.chdir(work)
+    runpy.run_path(str(REPO / "combine_geo_data.py"), run_name="__main__")
+    return sum(1 for _ in open(data / "raw_counts/SYN_counts.txt")) - 2
+
+
+def run_deg_summary(data, work):
+    import deg_summary
+    deg_summary.main(["--input_dir", str(data / "deg_results"),
+                      "--out_dir", str(work / "deg_summary"), "--prefix", PREFIX])
+    return _n_gene_rows(data)
+
+
+def run_filter(data, work):
+    import extract_DEG_and_nonDEG
+    extract_DEG_and_nonDEG.main(["--species", PREFIX, "--summary_dir",
+                                 str(work / "deg_summary"), "--sig_th", str(SIG_COUNT)])
+    return sum(1 for _ in open(work / "deg_summary" / f"{PREFIX}_DEG.tsv")) + \
+        sum(1 for _ in open(work / "deg_summary" / f"{PREFIX}_nonDEG.tsv")) - 2
+
+
+def run_promoter(data, work):
+    import extract_promoter
+    extract_promoter.main(["--sig_count", str(SIG_COUNT), "--summary_dir",
+                           str(work / "deg_summary"), "--prefix", PREFIX,
+                           "--gff_path", str(data / "ref/genes.gff"),
+                           "--fasta_path", str(data / "ref/genome.fa"),
+                           "--out_dir", str(work / "prom_seq_files")])
+    return sum(1 for f in (work / "prom_seq_files").glob("*.fa")
+               for ln in open(f) if ln.startswith(">"))
+
+
+def run_promoter_stream(data, work):
+    import extract_promoter
+    with open(work / "stream_ids.txt") as fin, open(work / "stream.fa", "w") as fout:
+        sys.stdin, sys.stdout = fin, fout
+        try:
+            extract_promoter.main(["--stream", "--label", "bench",
+                                   "--gff_path", str(data / "ref/genes.gff"),
+                                   "--fasta_path", str(data / "ref/genome.fa")])
+        finally:
+            sys.stdin, sys.stdout = sys.__stdin__, sys.__stdout__
+    return len(_ids(work / "stream_ids.txt"))
+
+
+def run_multi_split(data, work):
+    import extract_multi_expt_DEG_and_nonDEG as m
+    m.main(["-i", str(data / "deg_results"), "-o", str(work / "multi_split")])
+    return _n_gene_rows(data)
+
+
+def run_multi_promoter(data, work):
+    import extract_multi_expt_promoter as m
+    m.main(["-r", str(work / "multi_prom"), "-g", str(data / "ref/genes.gff"),
+            "-f", str(data / "ref/genome.fa")])
+    return sum(len(_ids(f)) for f in (work / "multi_prom").glob("*/*.txt")
+               if f.name in ("DEG.txt", "nonDEG.txt"))
+
+
+def run_meme_parse(data, work):
+    from motif_set import MotifSet
+    motifs = MotifSet.read_meme(data / "motifs/streme.meme")
+    motifs.write_meme(work / "roundtrip.meme")
+    motifs.save_npz(work / "roundtrip.npz")
+    MotifSet.load_npz(work / "roundtrip.npz")
+    return len(motifs)
+
+
+def run_graph_dedupe(data, work):
+    from cre_integrate import graph_dedupe
+    from motif_cluster import read_edges
+    from motif_set import MotifSet
+    evals = MotifSet.read_meme(data / "motifs/streme.meme").evals()
+    edges = read_edges(str(data / "motifs/tomtom.tsv"))
+    graph_dedupe(edges, evals, 0.05)
+    return edges.count()
+
+
+def run_logo(data, work, n_logos=50):
+    from motif_logo import render_logos
+    from motif_set import MotifSet
+    motifs = list(MotifSet.read_meme(data / "motifs/streme.meme"))[:n_logos]
+    jobs = [(m, m.id, f"{k:03d}_{m.id}") for k, m in enumerate(motifs, 1)]
+    render_logos(jobs, str(work / "logos"), n_jobs=4)
+    return len(jobs)
+
+
+def _n_gene_rows(data):
+    return sum(sum(1 for _ in open(f)) - 1 for f in (data / "deg_results").glob("*.tsv"))
+
+
+# name → (setup, run, items 單位, 計時前先 import 的模組)
+CASES = {
+    "combine_geo_data":                  (setup_combine, run_combine, "genes", ["pandas"]),
+    "deg_summary":                       (None, run_deg_summary, "gene_rows", ["deg_summary"]),
+    "extract_DEG_and_nonDEG":            (setup_filter, run_filter, "genes",
+                                          ["extract_DEG_and_nonDEG"]),
+    "extract_promoter":                  (setup_promoter, run_promoter, "sequences",
+                                          ["extract_promoter"]),
+    "extract_promoter_stream":           (setup_promoter, run_promoter_stream, "sequences",
+                                          ["extract_promoter"]),
+    "extract_multi_expt_DEG_and_nonDEG": (None, run_multi_split, "gene_rows",
+                                          ["extract_multi_expt_DEG_and_nonDEG"]),
+    "extract_multi_expt_promoter":       (setup_multi_promoter, run_multi_promoter, "sequences",
+                                          ["extract_multi_expt_promoter"]),
+    "meme_parse":                        (None, run_meme_parse, "motifs", ["motif_set"]),
+    "graph_dedupe":                      (None, run_graph_dedupe, "edges", ["cre_integrate"]),
+    "motif_logo":                        (setup_logo, run_logo, "logos", ["motif_logo"]),
+}
+
+
+def peak_rss_mb():
+    """本行程 peak RSS（Linux 取 VmHWM，不含 fork 前父行程的記憶體）+ 子行程最大值"""
+    import resource
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/status") as fh:
+            own = next(int(ln.split()[1]) for ln in fh if ln.startswith("VmHWM")) / 1024
+    except (OSError, StopIteration):
+        pass
+    kids = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return max(own, kids)
+
+
+def child(name, data, work, result_path):
+    """子行程進入點：執行單一 case，把 items、stage_s、peak RSS 寫到 result_path"""
+    import importlib
+    sys.path.insert(0, str(REPO))
+    t_imp = time.perf_counter()
+    for mod in CASES[name][3]:
+        importlib.import_module(mod)
+    t0 = time.perf_counter()
+    items = CASES[name][1](Path(data), Path(work))
+    stage = time.perf_counter() - t0
+    Path(result_path).write_text(json.dumps({
+        "items": items, "stage_s": stage, "import_s": t0 - t_imp,
+        "peak_rss_mb": peak_rss_mb()}))
+
+
+def measure(name, data: Path, work: Path):
+    setup = CASES[name][0]
+    if setup:
+        setup(data, work)
+    res_path = work / f".{name}.result.json"
+    res_path.unlink(missing_ok=True)
+    with open(work / f"{name}.log", "w") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, str(Path(__file__).resolve()), "_case",
+                                 name, str(data), str(work), str(res_path)],
+                                stdout=log, stderr=subprocess.STDOUT, cwd=work)
+        _, status, ru = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - t0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    row = {"wall_s": round(wall, 3), "cpu_user_s": round(ru.ru_utime, 3),
+           "cpu_sys_s": round(ru.ru_stime, 3), "peak_rss_mb": round(ru.ru_maxrss / 1024, 1),
+           "status": "ok" if proc.returncode == 0 else f"exit {proc.returncode}"}
+    if proc.returncode == 0:
+        inner = json.loads(res_path.read_text())
+        row["stage_s"] = round(inner["stage_s"], 3)
+        row["import_s"] = round(inner["import_s"], 3)
+        row["peak_rss_mb"] = round(inner["peak_rss_mb"], 1)
+        row["items"] = inner["items"]
+        row["items_per_s"] = round(inner["items"] / max(inner["stage_s"], 1e-9), 1)
+    return row
+
+
+def summarise(runs):
+    """repeat 結果取中位數（以 wall_s 排序取中間那次）"""
+    ok = [r for r in runs if r["status"] == "ok"]
+    if not ok:
+        return dict(runs[-1])
+    mid = sorted(ok, key=lambda r: r["wall_s"])[(len(ok) - 1) // 2]
+    out = dict(mid)
+    out["wall_s_all"] = [r["wall_s"] for r in ok]
+    return out
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "-C", str(REPO), "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ────── 子指令 ──────
+def cmd_run(args):
+    from synth_data import SCALES, generate
+
+    data = Path(args.data or f"synth_{args.scale}").resolve()
+    if not (data / "synth.json").is_file():
+        sys.stderr.write(f"[INFO] Generating {args.scale} synthetic data → {data}\n")
+        generate(data, SCALES[args.scale], args.seed)
+    scale = json.loads((data / "synth.json").read_text())
+
+    names = args.only or list(CASES)
+    bad = [n for n in names if n not in CASES]
+    if bad:
+        sys.exit(f"❌ 未知 case：{', '.join(bad)}（可用：{', '.join(CASES)}）")
+
+    out_dir = Path(args.out)
+    work = Path(args.work or out_dir / "work").resolve()
+    work.mkdir(parents=True, exist_ok=True)
+    commit = git_commit()
+    result = {"started_at": time.strftime("%Y-%m-%d %H:%M:%S"), "git_commit": commit,
+              "python": platform.python_version(), "host": platform.node(),
+              "cpu_count": os.cpu_count(), "data": str(data), "scale": scale,
+              "repeat": args.repeat, "cases": {}}
+
+    for name in names:
+        runs = [measure(name, data, work) for _ in range(args.repeat)]
+        row = {"unit": CASES[name][2], **summarise(runs)}
+        result["cases"][name] = row
+        rate = f"{row['items_per_s']:,.0f} {row['unit']}/s" if "items_per_s" in row else ""
+        sys.stderr.write(f"[INFO] {name:<34} {row['wall_s']:>8.2f}s  "
+                         f"{row['peak_rss_mb']:>8.1f} MB  {rate}  {row['status']}\n")
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f"{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    out.write_text(json.dumps(result, indent=1))
+    sys.stderr.write(f"[DONE] {len(names)} case(s) → {out}\n")
+    if any(r["status"] != "ok" for r in result["cases"].values()):
+        sys.exit(1)
+
+
+def cmd_compare(args):
+    a, b = (json.loads(Path(p).read_text()) for p in (args.base, args.new))
+    if a["scale"] != b["scale"]:
+        sys.stderr.write("[WARN] 兩次結果的資料規模不同，比值僅供參考\n")
+    print(f"case\twall_{a['git_commit']}\twall_{b['git_commit']}\twall_ratio\t"
+          f"rss_{a['git_commit']}\trss_{b['git_commit']}\trss_ratio")
+    for name in [n for n in a["cases"] if n in b["cases"]]:
+        ra, rb = a["cases"][name], b["cases"][name]
+        key = "stage_s" if "stage_s" in ra and "stage_s" in rb else "wall_s"
+        print(f"{name}\t{ra[key]}\t{rb[key]}\t{rb[key] / max(ra[key], 1e-9):.2f}\t"
+              f"{ra['peak_rss_mb']}\t{rb['peak_rss_mb']}\t"
+              f"{rb['peak_rss_mb'] / max(ra['peak_rss_mb'], 1e-9):.2f}")
+
+
+def _importtime_top(cmd, n=5):
+    """-X importtime：回傳累計耗時最多的頂層 import [(模組, ms)]"""
+    err = subprocess.run([sys.executable, "-X", "importtime", *cmd], capture_output=True,
+                         text=True, cwd=REPO).stderr
+    rows = []
+    for ln in err.splitlines():
+        if not ln.startswith("import time:") or "|" not in ln:
+            continue
+        _, cum, name = (x.strip() for x in ln[len("import time:"):].split("|"))
+        if cum.isdigit() and not name.startswith(" ") and "." not in name.strip():
+            rows.append((name.strip(), int(cum) / 1000))
+    return sorted(rows, key=lambda r: -r[1])[:n]
+
+
+def cmd_startup(args):
+    from cre_finding import COMMANDS
+
+    entry = str(REPO / "cre_finding.py")
+    log = Path(args.out) / "startup_runlog.jsonl"
+    log.parent.mkdir(parents=True, exist_ok=True)
+    log.write_text(json.dumps({"run_id": "x", "script": "s", "kind": "stage", "name": "n",
+                               "wall_s": 0.1, "cpu_s": 0.1, "peak_rss_mb": 1}) + "\n")
+    cmds = [["--help"]] + [[name, "--help"] for name in COMMANDS]
+    cmds += [["runlog", "summary", str(log)]]
+
+    rows, over = [], []
+    for argv in cmds:
+        cmd = [entry, *argv]
+        walls = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            rc = subprocess.run([sys.executable, *cmd], stdout=subprocess.DEVNULL,
+                                stderr=subprocess.DEVNULL, cwd=REPO).returncode
+            walls.append((time.perf_counter() - t0) * 1000)
+        ms = min(walls)
+        row = {"cmd": " ".join(argv), "ms": round(ms, 1), "returncode": rc}
+        if ms > args.budget_ms or rc != 0:
+            row["top_imports_ms"] = _importtime_top(cmd)
+            over.append(row)
+        rows.append(row)
+        sys.stderr.write(f"[INFO] {row['cmd']:<34} {ms:>7.1f} ms"
+                         f"{'  ⚠️ over budget' if ms > args.budget_ms else ''}"
+                         f"{f'  exit {rc}' if rc else ''}\n")
+
+    commit = git_commit()
+    out = Path(args.out) / f"startup_{time.strftime('%Y%m%d_%H%M%S')}_{commit}.json"
+    out.write_text(json.dumps({"git_commit": commit, "python": platform.python_version(),
+                               "budget_ms": args.budget_ms, "repeat": args.repeat,
+                               "commands": rows}, indent=1))
+    for row in over:
+        tops = ", ".join(f"{m} {t:.0f} ms" for m, t in row["top_imports_ms"])
+        sys.stderr.write(f"[WARN] {row['cmd']}: {tops}\n")
+    sys.stderr.write(f"[DONE] {len(rows)} command(s), {len(over)} over budget → {out}\n")
+    if over:
+        sys.exit(1)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["_case"]:
+        return child(*argv[1:5])
+    from synth_data import SCALES                 # --scale 的選項（_case 子行程不需要）
+
+    p = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="產生 / 沿用合成資料並量測")
+    r.add_argument("--scale", default="small", choices=sorted(SCALES))
+    r.add_argument("--data", help="既有的 synth_data.py 輸出資料夾")
+    r.add_argument("--seed", type=int, default=1)
+    r.add_argument("--only", nargs="*", help="只跑這些 case")
+    r.add_argument("--repeat", type=int, default=1)
+    r.add_argument("--out", default="bench_results")
+    r.add_argument("--work", help="case 的暫存輸出（預設 <out>/work）")
+
+    c = sub.add_parser("compare", help="比較兩次結果")
+    c.add_argument("base")
+    c.add_argument("new")
+
+    s = sub.add_parser("startup", help="cre_finding.py 啟動時間")
+    s.add_argument("--budget_ms", type=float, default=300)
+    s.add_argument("--repeat", type=int, default=5)
+    s.add_argument("--out", default="bench_results")
+    args = p.parse_args(argv)
+
+    {"run": cmd_run, "compare": cmd_compare, "startup": cmd_startup}[args.cmd](args)
+
+
+if __name__ == "__main__":
+    main()
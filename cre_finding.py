@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+cre_finding.py
+==============
+所有步驟的單一入口：cre-finding <子指令> [參數...]
+
+  python cre_finding.py --help                 # 列出子指令（不載入任何腳本）
+  python cre_finding.py promoter --stream < ids.txt > prom.fa
+  python cre_finding.py deg-summary --input_dir tomato_deg_results
+  ln -s "$PWD/cre_finding.py" ~/bin/cre-finding   # 之後可直接 cre-finding ...
+
+● 子指令只在被選到時才 import 對應腳本；pandas / scipy / pyfaidx / matplotlib /
+  logomaker / pydeseq2 等皆在實際用到的函式內才 import，
+  --help 與輕量子指令不需付出這些載入時間（見 benchmark.py startup）
+● 子指令以 runpy 執行原腳本的 __main__，行為與直接 python xxx.py 相同
+● combine / deseq2 以檔頭 CONFIG 區塊設定、沒有命令列參數：
+  --help 只顯示說明，不會執行
+"""
+
+import sys
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent
+
+# 子指令 → (模組, 說明, 是否為 CONFIG 式腳本)
+COMMANDS = {
+    "fetch":          ("fetch_sra",                        "prefetch + fasterq-dump（平行、可續跑）", False),
+    "align":          ("align_count",                      "STAR 比對 + featureCounts", False),
+    "combine":        ("combine_geo_data",                 "featureCounts → GEO sample 表現量表", True),
+    "deseq2":         ("deg_analysis",                     "合併表現量並批次執行 DESeq2", True),
+    "deg-screen":     ("deg_screen",                       "DESeq2 前的快速 DEG 篩檢（所有資料集一次算完）", False),
+    "deg-summary":    ("deg_summary",                      "合併多個 DEG 表，計算 meta_p / sig_count", False),
+    "deg-filter":     ("extract_DEG_and_nonDEG",           "依 sig_count 篩選 DEG / Non-DEG", False),
+    "promoter":       ("extract_promoter",                 "擷取 DEG / Non-DEG promoter（含 --stream）", False),
+    "deg-bits":       ("deg_bits",                         "基因 × 實驗 顯著性位元矩陣：建立 / 跨實驗查詢", False),
+    "multi-split":    ("extract_multi_expt_DEG_and_nonDEG", "每個實驗各自拆分 DEG / non-DEG 清單", False),
+    "multi-promoter": ("extract_multi_expt_promoter",      "每個實驗各自擷取 promoter", False),
+    "pipeline":       ("pipeline_driver",                  "DEG summary → 篩選 → promoter，多組參數單一行程", False),
+    "streme":         ("streme_batch",                     "STREME 批次排程", False),
+    "integrate":      ("cre_integrate",                    "STREME 結果整合、Tomtom 去冗餘、logo（可多資料集）", False),
+    "cross-species":  ("cross_species_motif_cre_summary",  "跨物種 motif 比對", False),
+    "scan":           ("motif_scan",                       "PWM 掃描 promoter → gene × motif 矩陣", False),
+    "kmer":           ("kmer_index",                       "promoter k-mer 索引建立 / IUPAC 查詢", False),
+    "serve":          ("promoter_server",                  "常駐 promoter HTTP 服務", False),
+    "stage":          ("stage_run",                        "內容定址 stage 執行器（shell 流程用）", False),
+    "runlog":         ("instrument",                       "彙整 CRE_RUN_LOG 量測紀錄", False),
+    "synth":          ("synth_data",                       "產生合成測試資料", False),
+    "bench":          ("benchmark",                        "各步驟效能量測 / 啟動時間量測", False),
+}
+
+
+def usage(out=sys.stdout):
+    out.write("usage: cre-finding <command> [args...]\n\ncommands:\n")
+    for name, (module, text, _) in COMMANDS.items():
+        out.write(f"  {name:<15} {text}  [{module}.py]\n")
+    out.write("\n每個子指令的參數：cre-finding <command> --help\n")
+
+
+def config_help(module: str):
+    """CONFIG 式腳本：只讀出檔頭說明，不 import、不執行"""
+    import ast
+    src = (REPO / f"{module}.py").read_text(encoding="utf-8")
+    doc = ast.get_docstring(ast.parse(src)) or ""
+    if not doc:                                         # 以 # 註解寫的檔頭
+        doc = "\n".join(ln.lstrip("# ").rstrip() for ln in src.splitlines()[1:12]
+                        if ln.startswith("#"))
+    print(f"{module}.py（參數請修改檔案開頭的 CONFIG 區塊）\n\n{doc.strip()}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help", "help"):
+        usage()
+        return
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        usage(sys.stderr)
+        sys.exit(f"❌ 未知子指令：{name}")
+
+    module, _, config_style = COMMANDS[name]
+    if config_style and any(a in ("-h", "--help") for a in rest):
+        config_help(module)
+        return
+
+    import runpy
+    if str(REPO) not in sys.path:
+        sys.path.insert(0, str(REPO))
+    sys.argv = [f"cre-finding {name}", *rest]
+    runpy.run_module(module, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,34 +4,59 @@
 ===============================
 (1) 掃描 STREME 結果 → 轉檔、E-value 過濾並重新命名
 (2) 合併成 all.meme
-(3) Tomtom 自比對去冗餘
+(3) Tomtom 自比對去冗餘（比對一次，可對多個 q-value 閾值分別分群）
 (4) 繪製 filtered.meme 前 N_LOGO_MOTIFS 個 logo
 (5) 依 redundant_motif_reps.tsv 再畫代表 motif 前 N_REP_LOGOS 個 logo
+
+多資料集同時執行（例如番茄 + 阿拉伯芥）：
+  python cre_integrate.py --data_dir multi_exp_tomato --data_dir multi_exp_arabidopsis
+  或在 CONFIG 設定 DATA_DIRS
+● 各資料集在自己的 thread 中依序跑 (1)–(5)，準備 / Tomtom / logo 工作送進共用的
+  worker pool（--jobs，thread pool 跑 Tomtom 等子行程、process pool 畫 logo），
+  總時間約等於最慢的資料集
+● CONFIG 中位於 DATA_DIR 底下的輸出路徑，會對應到各資料集自己的資料夾
+● 結束時列出每個資料集的 motif 數、保留數、cluster 數、各步驟耗時與狀態
 """
 
 # ───────────────────────── CONFIG ─────────────────────────
 # ── 資料來源與輸出 ──
 DATA_DIR        = "./multi_exp_tomato"          # 多個實驗資料夾
+DATA_DIRS       = []          # 多資料集同時處理（如 ["./multi_exp_tomato", "./multi_exp_arabidopsis"]）；[] = 只處理 DATA_DIR
+SHARED_JOBS     = 8           # 多資料集時共用 worker pool 的大小（--jobs）
 
 # ── 去冗餘後輸出 ──
 FILTERED_MEME   = f"{DATA_DIR}/filtered.meme"
 KEPT_ID_TSV     = f"{DATA_DIR}/kept_motif_ids.tsv"
 REDUNDANT_TSV   = f"{DATA_DIR}/redundant_motif_reps.tsv"
+FILTERED_NPZ    = f"{DATA_DIR}/filtered.npz"   # 二進位 motif 集合；None = 不輸出
 
 # ── 參數設定 ──
 EVALUE_FILTER   = 10.0        # STREME motifs：保留 E ≤ 10
-TOMTOM_THRESH   = 0.05        # Tomtom q-value 閾值
+PREP_JOBS       = 8           # 平行準備 STREME 結果的 thread 數
+TOMTOM_THRESH   = 0.05        # Tomtom q-value 閾值（主要輸出與 logo 使用）
+TOMTOM_SWEEP    = [0.01, 0.05, 0.1]       # 額外試算的閾值；[] = 不試算
+SWEEP_DIR       = f"{DATA_DIR}/thresh_sweep"
+
+# ── Tomtom 比對快取（以 motif PWM 內容雜湊為 key）──
+TOMTOM_CACHE    = f"{DATA_DIR}/tomtom_cache.sqlite"   # 設為 None 則每次完整重跑
+CACHE_P_CUTOFF  = 0.1         # 快取保留 p ≤ 此值的 pair（須 ≥ 所有閾值）
+
+# ── Tomtom 分片平行（query 切 N 份，各自對完整 target 比對）──
+TOMTOM_SHARDS   = 1           # 1 = 單一 Tomtom 行程
+TOMTOM_JOBS     = 4           # 同時執行的 Tomtom 行程上限
 
 # ── Logo 繪圖 ──
-N_LOGO_MOTIFS   = 5                       # filtered.meme 前 N 個
+N_LOGO_MOTIFS   = 5                       # filtered.meme 前 N 個（None = 全部）
 LOGO_OUT_DIR    = f"{DATA_DIR}/motif_logos"
 
-N_REP_LOGOS     = 5                       # 代表 motif 前 N
+N_REP_LOGOS     = 5                       # 代表 motif 前 N（None = 全部）
 REP_LOGO_DIR    = f"{DATA_DIR}/reps_motif_logos"
 
 FIGSIZE         = (4, 1.5)                # 單圖尺寸 (inch)
 DPI             = 200                     # 解析度
 COLOR_SCHEME    = "classic"               # Logomaker 色盤
+LOGO_FORMATS    = ("png",)                # 可加 "svg"
+LOGO_JOBS       = 4                       # 平行繪圖的 worker 數
 
 # ── 其他 (通常無須調整) ──
 OUT_DIR         = f"{DATA_DIR}/temp"            # 暫存目錄
@@ -41,67 +66,120 @@ TEMP_DIR        = f"{OUT_DIR}/tomtom_temp"
 # ──────────────────────────────────────────────────────────
 
 
-import os, re, shutil, subprocess, sys
-from collections import defaultdict, deque
+import argparse, json, os, re, shutil, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-import logomaker as lm
+
+from instrument import popen_tool, run_tool, stage
+from motif_cluster import EdgeTable, read_edges
+from motif_compare import run_tomtom_cached, run_tomtom_sharded
+from motif_logo import new_logo_pool, render_logos
+from motif_set import MotifSet
 
 
 # ╭────────────────────── 共用工具 ───────────────────────╮
 def run(cmd, **kw):
     try:
-        return subprocess.run(cmd, check=True, text=True,
-                              capture_output=True, **kw)
+        return run_tool(cmd, check=True, text=True, capture_output=True, **kw)
     except subprocess.CalledProcessError as e:
         sys.stderr.write(f"\n❌ 指令失敗：{' '.join(cmd)}\n{e.stderr}\n")
         sys.exit(1)
 
 
-def parse_meme_file(meme_path: Path):
-    txt = meme_path.read_text()
-    first = txt.find("MOTIF ")
-    header = txt[:first].strip().splitlines() if first != -1 else txt.strip().splitlines()
-    motifs, evals = {}, {}
-    for blk in txt.split("MOTIF ")[1:]:
-        block = "MOTIF " + blk
-        mid = blk.splitlines()[0].split()[0]
-        m = re.search(r"\bE\s*=\s*([0-9.eE+-]+)", blk)
-        e_val = float(m.group(1)) if m else float("inf")
-        motifs[mid] = block
-        evals[mid]  = e_val
-    return header, motifs, evals
-
-
-def filter_and_rename(raw_meme: Path, out_meme: Path,
-                      e_thr: float, prefix: str):
-    header, motifs, evals = parse_meme_file(raw_meme)
-    with out_meme.open("w") as fh:
-        fh.write("\n".join(header) + "\n\n")
-        for mid, blk in motifs.items():
-            if evals[mid] > e_thr:
+def load_streme(raw: Path, source: str) -> MotifSet:
+    """讀取 STREME 結果；HTML 先經 meme2meme 轉換（逐行解析其 stdout）；
+    stderr 寫到暫存檔，避免大量警告塞滿 pipe 而與 stdout 互相等待"""
+    if raw.suffix.lower() != ".html":
+        return MotifSet.read_meme(raw, source)
+    cmd = ["meme2meme", str(raw)]
+    with tempfile.TemporaryFile("w+") as err_fh:
+        with popen_tool(cmd, stdout=subprocess.PIPE, stderr=err_fh, text=True) as proc:
+            mset = MotifSet.parse(proc.stdout, source)
+        err_fh.seek(0)
+        err = err_fh.read()
+    if proc.returncode:
+        sys.stderr.write(f"\n❌ 指令失敗：{' '.join(cmd)}\n{err}\n")
+        sys.exit(1)
+    return mset
+
+
+def filter_and_rename(mset: MotifSet, e_thr: float, prefix: str) -> MotifSet:
+    out = MotifSet(list(mset.header))
+    for m in mset:
+        if m.evalue <= e_thr:
+            out.add(m.renamed(f"{prefix}_{m.id}"))
+    return out
+
+
+def find_streme_results(data_dir: str):
+    """掃描 <exp>/streme_* 資料夾 → [(exp, sub, raw 檔)]"""
+    found = []
+    for exp_dir in sorted(Path(data_dir).iterdir()):
+        if not exp_dir.is_dir():
+            continue
+        for streme_dir in sorted(d for d in exp_dir.iterdir()
+                                 if d.is_dir() and d.name.startswith("streme_")):
+            raw = None
+            if (streme_dir / "streme.txt").is_file():
+                raw = streme_dir / "streme.txt"
+            elif (streme_dir / "streme.html").is_file():
+                raw = streme_dir / "streme.html"
+            else:
+                for pat in ("*.meme", "*.txt", "*.html"):
+                    files = list(streme_dir.glob(pat))
+                    if files:
+                        raw = files[0]
+                        break
+            if not raw:
+                print(f"⚠️  找不到 STREME 結果：{streme_dir}")
                 continue
-            lines = blk.splitlines()
-            parts = lines[0].split()
-            parts[1] = f"{prefix}_{parts[1]}"
-            lines[0] = " ".join(parts)
-            fh.write("\n".join(lines).rstrip() + "\n\n")
-
-
-def merge_meme(prepared_dir: Path, out_file: Path):
-    files = sorted(prepared_dir.glob("*.meme"))
-    if not files:
-        sys.exit("❌ prepared 資料夾沒有 .meme 檔")
-    head, *_ = parse_meme_file(files[0])
-    out_file.write_text("\n".join(head) + "\n\n")
-    with out_file.open("a") as fh:
-        for f in files:
-            _, motifs, _ = parse_meme_file(f)
-            for blk in motifs.values():
-                fh.write(blk.strip() + "\n\n")
+            found.append((exp_dir.name, streme_dir.name, raw))
+    return found
+
+
+def prepare_one(exp: str, sub: str, raw: Path, prepared_dir: Path,
+                e_thr: float, reuse: bool) -> tuple:
+    """單一 STREME 結果 → 過濾、改名後的 MotifSet；prepared 檔較新時直接沿用"""
+    tag = f"{exp}_{sub}"
+    out = prepared_dir / f"{tag}.meme"
+    if reuse and out.is_file() and out.stat().st_mtime >= raw.stat().st_mtime:
+        return MotifSet.read_meme(out, tag), True
+
+    mset = filter_and_rename(load_streme(raw, tag), e_thr, tag)
+    part = out.with_suffix(".meme.part")
+    mset.write_meme(part)
+    part.replace(out)
+    return mset, False
+
+
+def prepare_all(data_dir: str, prepared_dir: Path, e_thr: float,
+                n_jobs: int, pool=None) -> list:
+    """以 thread pool 平行準備所有實驗（pool 不為 None 時用共用 pool）；
+    E-value 閾值改變時全部重做"""
+    params = prepared_dir / ".params.json"
+    reuse = params.is_file() and json.loads(params.read_text()) == {"evalue": e_thr}
+
+    found = find_streme_results(data_dir)
+    own = None if pool is not None else ThreadPoolExecutor(max_workers=max(1, n_jobs))
+    try:
+        futs = [(pool or own).submit(prepare_one, exp, sub, raw, prepared_dir, e_thr, reuse)
+                for exp, sub, raw in found]
+        prepared = []
+        for k, ((exp, sub, raw), fut) in enumerate(zip(found, futs), 1):
+            mset, reused = fut.result()
+            note = "沿用 prepared" if reused else raw.name
+            print(f"  [{k}] 處理 {exp}/{sub} → {note}")
+            prepared.append(mset)
+    finally:
+        if own is not None:
+            own.shutdown()
+
+    params.write_text(json.dumps({"evalue": e_thr}))
+    return prepared
 
 
 def run_tomtom(meme_file: str, out_dir: str, thresh: float) -> str:
@@ -110,49 +188,22 @@ def run_tomtom(meme_file: str, out_dir: str, thresh: float) -> str:
     return f"{out_dir}/tomtom.tsv"
 
 
-def graph_dedupe(tsv: str, evals: dict):
-    g = defaultdict(set)
-    with open(tsv) as fh:
-        for ln in fh:
-            if (ln.startswith('#') or ln.startswith('Query_ID') or not ln.strip()):
-                continue
-            q, t, *_ = ln.split('\t')
-            if q == t:
-                continue
-            g[q].add(t); g[t].add(q)
-
-    visited, discard = set(), set()
-    rep2dup = {}
-    for node in g:
-        if node in visited:
-            continue
-        q = deque([node]); comp = []
-        while q:
-            cur = q.popleft()
-            if cur in visited:
-                continue
-            visited.add(cur)
-            comp.append(cur)
-            q.extend(g[cur] - visited)
-        if len(comp) == 1:
-            continue
-        comp.sort(key=lambda m: (evals.get(m, float("inf")), m))
-        rep, dups = comp[0], comp[1:]
-        rep2dup[rep] = dups
-        discard.update(dups)
+def graph_dedupe(edges: EdgeTable, evals: dict, thresh: float = float("inf")):
+    rep2dup = edges.clusters(evals, thresh)
+    discard = {m for dups in rep2dup.values() for m in dups}
     return rep2dup, discard
 
 
-def write_outputs(header, motifs, evals, discard, rep2dup):
-    kept = [m for m in motifs if m not in discard]
+def write_outputs(motifs: MotifSet, discard, rep2dup,
+                  filtered_meme=FILTERED_MEME, kept_tsv=KEPT_ID_TSV,
+                  redundant_tsv=REDUNDANT_TSV) -> MotifSet:
+    evals = motifs.evals()
+    kept = [m for m in motifs.ids() if m not in discard]
     kept.sort(key=lambda m: (evals.get(m, float("inf")), m))
+    kept_set = motifs.subset(kept)
+    kept_set.write_meme(filtered_meme)
 
-    with open(FILTERED_MEME, "w") as fh:
-        fh.write("\n".join(header) + "\n\n")
-        for m in kept:
-            fh.write(motifs[m].strip() + "\n\n")
-
-    with open(KEPT_ID_TSV, "w") as fh:
+    with open(kept_tsv, "w") as fh:
         fh.write("experiment\tresult_dir\tmotif_id\te_value\n")
         for mid in kept:
             parts = mid.split("_")
@@ -165,7 +216,7 @@ def write_outputs(header, motifs, evals, discard, rep2dup):
                 exp, res, motif_id = "NA", "NA", mid
             fh.write(f"{exp}\t{res}\t{motif_id}\t{evals[mid]:.3g}\n")
 
-    with open(REDUNDANT_TSV, "w") as fh:
+    with open(redundant_tsv, "w") as fh:
         fh.write("representative\te_value\tdup_count\tduplicate_motifs\n")
         reps = sorted(rep2dup, key=lambda m: (evals.get(m, float('inf')), m))
         for r in reps:
@@ -173,181 +224,274 @@ def write_outputs(header, motifs, evals, discard, rep2dup):
             fh.write(f"{r}\t{e_val:.3g}\t{len(rep2dup[r])}\t{';'.join(rep2dup[r])}\n")
 
     print(f"✅ Motif 去冗餘：總 {len(motifs)} → 保留 {len(kept)} (移除 {len(discard)})")
-    print(f"➡ {FILTERED_MEME}\n➡ {KEPT_ID_TSV}\n➡ {REDUNDANT_TSV}")
-
-
-# ╭──────────────── Motif-logo 共用函式 ─────────────────╮
-def meme_info_matrix(pwm_df, nsites):
-    entropy = -(pwm_df * np.log2(pwm_df.clip(lower=1e-9))).sum(axis=1)
-    e_n = 3 / (2 * np.log(2) * nsites)
-    return pwm_df.mul(2.0 - (entropy + e_n), axis=0).clip(lower=0)
-
-
-def draw_logo_block(motif_block, title, save_path):
-    rows = [list(map(float, ln.split()))
-            for ln in motif_block.splitlines()
-            if re.match(r'^\s*[0-9.]+\s', ln)]
-    pwm = pd.DataFrame(rows, columns=['A','C','G','T'])
-    m = re.search(r'nsites=\s*(\d+)', motif_block)
-    nsites = int(m.group(1)) if m else 1
-    info_mat = meme_info_matrix(pwm, nsites)
+    print(f"➡ {filtered_meme}\n➡ {kept_tsv}\n➡ {redundant_tsv}")
+    return kept_set
+
+
+def threshold_sweep(motifs: MotifSet, edges, thresholds, out_dir):
+    """同一份 edge 表，依各 q-value 閾值分別去冗餘並輸出摘要"""
+    evals, rows = motifs.evals(), []
+    for thr in sorted(thresholds):
+        sub = Path(out_dir) / f"q{thr:g}"
+        sub.mkdir(parents=True, exist_ok=True)
+        rep2dup, discard = graph_dedupe(edges, evals, thr)
+        write_outputs(motifs, discard, rep2dup,
+                      sub / "filtered.meme", sub / "kept_motif_ids.tsv",
+                      sub / "redundant_motif_reps.tsv")
+        rows.append((thr, edges.count(thr), len(rep2dup),
+                     len(motifs) - len(discard)))
+
+    summary = Path(out_dir) / "summary.tsv"
+    with open(summary, "w") as fh:
+        fh.write("q_thresh\tn_edges\tn_clusters\tn_kept\tn_total\n")
+        for thr, n_edges, n_clu, n_kept in rows:
+            fh.write(f"{thr:g}\t{n_edges}\t{n_clu}\t{n_kept}\t{len(motifs)}\n")
+    print(f"✔ 閾值試算完成 → {summary}")
+
+
+# ╭──────────────── Motif-logo（平行 + 快取）─────────────────╮
+def plot_logos(jobs, out_dir: str, pool=None):
+    n_new, n_cached = render_logos(jobs, out_dir, FIGSIZE, DPI, COLOR_SCHEME,
+                                   LOGO_FORMATS, LOGO_JOBS, pool)
+    print(f"✔  logo：新繪製 {n_new} 張，沿用快取 {n_cached} 張 → {out_dir}/")
 
-    fig, ax = plt.subplots(figsize=FIGSIZE)
-    lm.Logo(info_mat, ax=ax, color_scheme=COLOR_SCHEME)
-    ax.set_title(title, fontsize=9)
-    ax.set_xticks([]); ax.set_yticks([])
-    plt.tight_layout()
-    fig.savefig(save_path, dpi=DPI, bbox_inches='tight')
-    plt.close(fig)
 
-
-# ╰───────────────────────────────────────────────────────╯
 # ── logo-step ①：filtered.meme 前 N_LOGO_MOTIFS ──
-def batch_plot_logos(filtered_meme: str,
+def batch_plot_logos(kept: MotifSet,
                      out_dir: str,
-                     n_motifs: int):
-    txt = Path(filtered_meme).read_text()
-    blocks = ["MOTIF "+b for b in txt.split("MOTIF ")[1:]]
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
-    for idx, blk in enumerate(blocks[:n_motifs], 1):
-        motif_id = re.search(r'^MOTIF\s+(.+?)$', blk, re.MULTILINE).group(1).strip()
-        safe = re.sub(r'[^A-Za-z0-9_-]', '_', motif_id)[:80]
-        out_png = Path(out_dir) / f"{idx:02d}_{safe}.png"
-        primary = motif_id.split()[0]
+                     n_motifs: int | None, pool=None):
+    jobs = []
+    for idx, m in enumerate(list(kept)[:n_motifs], 1):
+        safe = re.sub(r'[^A-Za-z0-9_-]', '_', m.title)[:80]
         try:
-            species = primary.split('_')[1]
+            species = m.id.split('_')[1]
         except IndexError:
             species = "species?"
-        motif_seq = primary.split('-')[-1]
-        e_val = re.search(r'\bE\s*=\s*([0-9.eE+-]+)', blk)
+        motif_seq = m.id.split('-')[-1]
         title = f"{species} motif: {motif_seq}"
-        if e_val:
-            title += f"  (E={float(e_val.group(1)):.2g})"
-        draw_logo_block(blk, title, out_png)
-        print(f"✔  {motif_seq} → {out_png}")
-    print(f"✅ 前 {min(n_motifs,len(blocks))} 個 motif-logo 完成")
+        if np.isfinite(m.evalue):
+            title += f"  (E={m.evalue:.2g})"
+        jobs.append((m, title, f"{idx:02d}_{safe}"))
+    plot_logos(jobs, out_dir, pool)
+    print(f"✅ 前 {len(jobs)} 個 motif-logo 完成")
 
 
 # ── logo-step ②：代表 motif（cluster reps）──
-def parse_meme_blocks(meme_path):
-    txt = Path(meme_path).read_text()
-    mapping = {}
-    for blk in txt.split("MOTIF ")[1:]:
-        block = "MOTIF " + blk
-        full_id = blk.splitlines()[0].strip()
-        base_id = full_id.split(' STREME-')[0]
-        mapping[base_id] = block
-    return mapping
-
-
-def batch_plot_rep_logos(filtered_meme: str,
-                         redundant_tsv: str,
+def batch_plot_rep_logos(kept: MotifSet,
+                         rep2dup: dict,
                          out_dir: str,
-                         n_reps: int):
-    df = pd.read_csv(redundant_tsv, sep='\t')
-    df = df.dropna(subset=['representative'])
-    df['e_value'] = pd.to_numeric(df['e_value'], errors='coerce')
-    df.sort_values('e_value', inplace=True)
-    reps = df.head(n_reps)
-
-    id2block = parse_meme_blocks(filtered_meme)
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
-
-    for idx, row in enumerate(reps.itertuples(index=False), 1):
-        rep_id  = row.representative
-        dup_cnt = int(row.dup_count)
-        blk = id2block.get(rep_id)
-        if blk is None:
+                         n_reps: int | None, pool=None):
+    evals = kept.evals()
+    reps = sorted(rep2dup, key=lambda m: (evals.get(m, float('inf')), m))[:n_reps]
+
+    jobs = []
+    for idx, rep_id in enumerate(reps, 1):
+        dup_cnt = len(rep2dup[rep_id])
+        if rep_id not in kept:
             print(f"⚠️  找不到 {rep_id} 的 MOTIF block，略過")
             continue
 
         safe = re.sub(r'[^A-Za-z0-9_-]', '_', rep_id)[:80]
-        out_png = Path(out_dir) / f"{idx:02d}_{safe}.png"
-
         primary = rep_id.split('_')[-1]      # 最尾段含 motifSeq
         motif_seq = primary.split('-')[-1]
         species = rep_id.split('_')[1] if '_' in rep_id else 'species?'
-        e_val = row.e_value
+        e_val = evals[rep_id]
         title = f"{species} motif: {motif_seq} (E={e_val:.2g}, dup={dup_cnt})"
-        draw_logo_block(blk, title, out_png)
-        print(f"✔  {rep_id} → {out_png}")
+        jobs.append((kept[rep_id], title, f"{idx:02d}_{safe}"))
+    plot_logos(jobs, out_dir, pool)
 
     print(f"✅ 代表 motif-logo 完成，輸出於「{out_dir}/」")
 
 
-# ────────────────────────── MAIN ──────────────────────────
-def main():
-    prepared_dir = Path(PREPARED_DIR)
-    prepared_dir.mkdir(parents=True, exist_ok=True)
-    Path(OUT_DIR).mkdir(parents=True, exist_ok=True)
-
-    # === 1. 轉檔 + 過濾 + 改名 ===
-    n = 0
-    for exp_dir in sorted(Path(DATA_DIR).iterdir()):
-        if not exp_dir.is_dir():
-            continue
-        exp = exp_dir.name
-        for streme_dir in sorted(d for d in exp_dir.iterdir()
-                                 if d.is_dir() and d.name.startswith("streme_")):
-            sub = streme_dir.name
-            raw = None
-            if (streme_dir / "streme.txt").is_file():
-                raw = streme_dir / "streme.txt"
-            elif (streme_dir / "streme.html").is_file():
-                raw = streme_dir / "streme.html"
-            else:
-                for pat in ("*.meme", "*.txt", "*.html"):
-                    files = list(streme_dir.glob(pat))
-                    if files:
-                        raw = files[0]
-                        break
-            if not raw:
-                print(f"⚠️  找不到 STREME 結果：{streme_dir}")
-                continue
-
-            n += 1
-            print(f"  [{n}] 處理 {exp}/{sub} → {raw.name}")
+# ╭──────────────────────── 資料集 ─────────────────────────╮
+def _under(path, data_dir: str):
+    """CONFIG 中位於 DATA_DIR 底下的路徑 → data_dir 底下的對應路徑（其餘原樣）"""
+    if path is None:
+        return None
+    rel = os.path.relpath(path, DATA_DIR)
+    return path if rel.startswith("..") else os.path.join(data_dir, rel)
+
+
+@dataclass
+class Dataset:
+    """單一資料集的輸入 / 輸出路徑與進度紀錄"""
+    data_dir: str
+    times: dict = field(default_factory=dict)       # 步驟 → 秒
+    counts: dict = field(default_factory=dict)      # motifs / kept / clusters
+    status: str = "pending"
+
+    def __post_init__(self):
+        d = self.data_dir
+        self.name = Path(d).name
+        self.filtered_meme = _under(FILTERED_MEME, d)
+        self.kept_tsv      = _under(KEPT_ID_TSV, d)
+        self.redundant_tsv = _under(REDUNDANT_TSV, d)
+        self.filtered_npz  = _under(FILTERED_NPZ, d)
+        self.sweep_dir     = _under(SWEEP_DIR, d)
+        self.tomtom_cache  = _under(TOMTOM_CACHE, d)
+        self.logo_dir      = _under(LOGO_OUT_DIR, d)
+        self.rep_logo_dir  = _under(REP_LOGO_DIR, d)
+        self.out_dir       = _under(OUT_DIR, d)
+        self.prepared_dir  = _under(PREPARED_DIR, d)
+        self.all_meme      = _under(ALL_MEME, d)
+        self.temp_dir      = _under(TEMP_DIR, d)
+        self.multi = False
+
+    @contextmanager
+    def stage(self, name, **kw):
+        """instrument stage；多資料集時名稱加上資料集前綴，並記錄耗時"""
+        t0 = time.perf_counter()
+        try:
+            with stage(f"{self.name}/{name}" if self.multi else name, **kw) as st:
+                yield st
+        finally:
+            self.times[name] = time.perf_counter() - t0
 
-            tmp = prepared_dir / f"{exp}_{sub}.raw.meme"
-            out = prepared_dir / f"{exp}_{sub}.meme"
 
-            if raw.suffix.lower() == ".html":
-                run(["meme2meme", str(raw)], stdout=tmp.open("w"))
-            else:
-                shutil.copy(raw, tmp)
+def integrate(ds: Dataset, pool=None, logo_pool=None):
+    """單一資料集的 (1)–(5)；pool / logo_pool 為 None 時各步驟自行建立 pool"""
+    tag = f"[{ds.name}] " if ds.multi else ""
+    prepared_dir = Path(ds.prepared_dir)
+    prepared_dir.mkdir(parents=True, exist_ok=True)
+    Path(ds.out_dir).mkdir(parents=True, exist_ok=True)
 
-            filter_and_rename(tmp, out, EVALUE_FILTER, f"{exp}_{sub}")
-            tmp.unlink(missing_ok=True)
+    # === 1. 轉檔 + 過濾 + 改名（平行；prepared 較新者沿用）===
+    with ds.stage("prepare", unit="motifs") as st:
+        prepared = prepare_all(ds.data_dir, prepared_dir, EVALUE_FILTER, PREP_JOBS, pool)
+        st.items = sum(len(m) for m in prepared)
 
-    if n == 0:
-        sys.exit("❌ 未找到任何 STREME 資料夾，流程終止")
+    if not prepared:
+        sys.exit(f"❌ {tag}未找到任何 STREME 資料夾，流程終止")
 
-    # === 2. 合併 ===
-    merge_meme(prepared_dir, Path(ALL_MEME))
-    print("✔ 合併完成 → all.meme")
+    # === 2. 合併（記憶體中；all.meme 僅供 Tomtom 讀取）===
+    with ds.stage("merge", unit="motifs") as st:
+        motifs = MotifSet.merge(prepared)
+        motifs.write_meme(ds.all_meme)
+        st.items = len(motifs)
+    ds.counts["motifs"] = len(motifs)
+    print(f"✔ {tag}合併完成 → all.meme")
 
     # === 3. Tomtom 去冗餘 ===
-    if Path(TEMP_DIR).exists():
-        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+    if Path(ds.temp_dir).exists():
+        shutil.rmtree(ds.temp_dir, ignore_errors=True)
 
-    header, motifs, evals = parse_meme_file(Path(ALL_MEME))
-    if not motifs:
-        print("⚠️  all.meme 無 motif，流程結束")
+    if not len(motifs):
+        print(f"⚠️  {tag}all.meme 無 motif，流程結束")
         return
 
-    tsv = run_tomtom(ALL_MEME, TEMP_DIR, TOMTOM_THRESH)
-    rep2dup, discard = graph_dedupe(tsv, evals)
-    write_outputs(header, motifs, evals, discard, rep2dup)
+    # 以最寬鬆的閾值比對一次，各閾值再於記憶體中分群
+    loosest = max([TOMTOM_THRESH, *TOMTOM_SWEEP])
+    with ds.stage("tomtom", unit="motifs", items=len(motifs)):
+        if ds.tomtom_cache:
+            tsv = run_tomtom_cached(motifs, ds.tomtom_cache, ds.temp_dir,
+                                    loosest, CACHE_P_CUTOFF,
+                                    n_shards=TOMTOM_SHARDS, n_jobs=TOMTOM_JOBS,
+                                    pool=pool)
+        elif TOMTOM_SHARDS > 1:
+            tsv = run_tomtom_sharded(motifs, ds.all_meme, ds.temp_dir,
+                                     loosest, TOMTOM_SHARDS, TOMTOM_JOBS, pool=pool)
+        elif pool is not None:
+            tsv = pool.submit(run_tomtom, ds.all_meme, ds.temp_dir, loosest).result()
+        else:
+            tsv = run_tomtom(ds.all_meme, ds.temp_dir, loosest)
+    with ds.stage("graph_dedupe", unit="edges") as st:
+        edges = read_edges(tsv)
+        rep2dup, discard = graph_dedupe(edges, motifs.evals(), TOMTOM_THRESH)
+        st.items = edges.count()
+    ds.counts["clusters"] = len(rep2dup)
+    with ds.stage("write_outputs", unit="motifs", items=len(motifs)):
+        kept = write_outputs(motifs, discard, rep2dup,
+                             ds.filtered_meme, ds.kept_tsv, ds.redundant_tsv)
+        if ds.filtered_npz:
+            kept.save_npz(ds.filtered_npz)
+    ds.counts["kept"] = len(kept)
+    if TOMTOM_SWEEP:
+        with ds.stage("threshold_sweep", unit="thresholds", items=len(TOMTOM_SWEEP)):
+            threshold_sweep(motifs, edges, TOMTOM_SWEEP, ds.sweep_dir)
 
     # === 4. filtered.meme 前 N_LOGO_MOTIFS ===
-    batch_plot_logos(FILTERED_MEME, LOGO_OUT_DIR, N_LOGO_MOTIFS)
+    with ds.stage("logos", unit="logos", items=len(list(kept)[:N_LOGO_MOTIFS])):
+        batch_plot_logos(kept, ds.logo_dir, N_LOGO_MOTIFS, logo_pool)
 
     # === 5. 代表 motif 前 N_REP_LOGOS ===
-    if Path(REDUNDANT_TSV).is_file():
-        batch_plot_rep_logos(FILTERED_MEME, REDUNDANT_TSV,
-                             REP_LOGO_DIR, N_REP_LOGOS)
+    if rep2dup:
+        with ds.stage("rep_logos", unit="logos", items=len(list(rep2dup)[:N_REP_LOGOS])):
+            batch_plot_rep_logos(kept, rep2dup, ds.rep_logo_dir, N_REP_LOGOS, logo_pool)
+    else:
+        print(f"⚠️  {tag}沒有冗餘 motif 群組，略過代表 motif-logo")
+
+
+def run_one(ds: Dataset, pool=None, logo_pool=None):
+    t0 = time.perf_counter()
+    ds.status = "running"
+    try:
+        integrate(ds, pool, logo_pool)
+        ds.status = "ok"
+    except (Exception, SystemExit) as e:             # 含 sys.exit；不中斷其他資料集（Ctrl-C 照常中止）
+        ds.status = f"failed: {e}"
+        sys.stderr.write(f"❌ [{ds.name}] {e}\n")
+    finally:
+        ds.times["total"] = time.perf_counter() - t0
+    return ds
+
+
+def print_progress(datasets):
+    steps = ["prepare", "tomtom", "graph_dedupe", "logos", "rep_logos", "total"]
+    print("\n=== 各資料集摘要 ===")
+    print("dataset\tmotifs\tkept\tclusters\t" + "\t".join(f"{s}_s" for s in steps) + "\tstatus")
+    for ds in datasets:
+        cnt = [str(ds.counts.get(k, "-")) for k in ("motifs", "kept", "clusters")]
+        sec = [f"{ds.times[s]:.1f}" if s in ds.times else "-" for s in steps]
+        print(f"{ds.name}\t" + "\t".join(cnt + sec) + f"\t{ds.status}")
+
+
+def run_many(data_dirs, n_jobs: int):
+    """多資料集同時執行：每個資料集一個協調 thread，重工作送進共用 pool"""
+    datasets = [Dataset(d) for d in data_dirs]
+    names = [ds.name for ds in datasets]
+    if len(set(names)) != len(names):
+        sys.exit(f"❌ 資料夾名稱重複：{', '.join(names)}")
+    for ds in datasets:
+        ds.multi = True
+    print(f"► {len(datasets)} 個資料集同時執行，共用 pool：{n_jobs} workers")
+
+    pool = ThreadPoolExecutor(max_workers=max(1, n_jobs))
+    logo_pool = new_logo_pool(min(n_jobs, LOGO_JOBS * len(datasets)))
+    drivers = ThreadPoolExecutor(max_workers=len(datasets))
+    executors = (drivers, pool, logo_pool)
+    try:
+        for fut in [drivers.submit(run_one, ds, pool, logo_pool) for ds in datasets]:
+            fut.result()
+    except KeyboardInterrupt:
+        # 取消尚未開始的工作；執行中的 Tomtom / logo 由其子行程各自收到 SIGINT
+        sys.stderr.write("\n[WARN] 中斷：取消共用 pool 中等待的工作\n")
+        for ex in executors:
+            ex.shutdown(wait=False, cancel_futures=True)
+        raise
+    for ex in executors:
+        ex.shutdown()
+
+    print_progress(datasets)
+    if any(ds.status != "ok" for ds in datasets):
+        sys.exit(1)
+
+
+# ────────────────────────── MAIN ──────────────────────────
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description="Integrate STREME results: filter, Tomtom dedupe, logos. "
+                    "Other settings live in the CONFIG block at the top of this file.")
+    p.add_argument("--data_dir", action="append", metavar="DIR",
+                   help="資料集資料夾（可重複；未指定時用 CONFIG 的 DATA_DIRS 或 DATA_DIR）")
+    p.add_argument("--jobs", type=int, default=SHARED_JOBS,
+                   help="多資料集時共用 worker pool 的大小")
+    args = p.parse_args(argv)
+
+    data_dirs = args.data_dir or DATA_DIRS or [DATA_DIR]
+    if len(data_dirs) == 1:
+        integrate(Dataset(data_dirs[0]))
     else:
-        print("⚠️  找不到 redundant_motif_reps.tsv，略過代表 motif-logo")
+        run_many(data_dirs, args.jobs)
 
 
 if __name__ == "__main__":
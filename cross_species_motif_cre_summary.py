@@ -1,59 +1,67 @@
 #!/usr/bin/env python3
 # ----------------------------------------------------------
 # cross_species_motif_cre_summary.py
-# 交叉比對兩物種的 filtered.meme or streme.txt，找出共同 motif
+# 交叉比對多個物種的 filtered.meme or streme.txt，找出共同 motif
+#   ● 每一對物種只比對一次（平行執行），結果依檔案內容快取
+#   ● 所有 pair 的連線合併後以單一 union-find 分群
+#   ● 輸出每個 cluster 涵蓋哪些物種
+#   ● --permute SPECIES：該物種 motif 的 K 組欄位打亂 decoy 寫成單一 MEME 檔，
+#     每個其他物種只需一次（分片平行）Tomtom，得到共通 cluster 數與各 cluster
+#     的經驗 p-value（見 permutation_test）
 # ----------------------------------------------------------
-import os, sys, shutil, subprocess
-from collections import defaultdict, deque
+import os, sys, shutil, hashlib, argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+import numpy as np
+
+from instrument import run_tool, stage
+from motif_cluster import EdgeTable
+from motif_compare import tomtom_rows_sharded, score_rows
+from motif_set import MotifSet
 
 # ========= 可調整參數 =========
 SUMMARY_TYPE = "deg_summary"  # 或 "cre_summary"
 
-TOMTOM_THRESH   = 0.05                       # Tomtom q-value 上限
+TOMTOM_THRESH   = 0.05                       # Tomtom q-value 上限（主要輸出）
+TOMTOM_SWEEP    = [0.01, 0.05, 0.1]          # 額外試算的閾值；[] = 不試算
 TEMP_DIR        = "tomtom_cross_temp"        # Tomtom 暫存資料夾
 OUT_DIR         = "cross_species_motif"
+N_JOBS          = 4                          # 同時執行的 Tomtom 數
+N_PERM          = 100                        # --permute 時的 decoy 組數
+PERM_SEED       = 1
 
+# 物種名稱 → MEME 檔（可任意增加；亦可用 --species name=path 指定）
 if SUMMARY_TYPE == "deg_summary":
-    SPECIES1_FILE   = "./motif_out/arabidopsis_1kb_sig_count_6/streme.txt"
-    SPECIES2_FILE   = "./motif_out/tomato_1kb_sig_count_1/streme.txt"
+    SPECIES_FILES = {
+        "arabidopsis": "./motif_out/arabidopsis_1kb_sig_count_6/streme.txt",
+        "tomato":      "./motif_out/tomato_1kb_sig_count_1/streme.txt",
+        # "rice":      "./motif_out/rice_1kb_sig_count_3/streme.txt",
+    }
     CRE_DIR = os.path.join(OUT_DIR, "deg_summary")
 elif SUMMARY_TYPE == "cre_summary":
-    SPECIES1_FILE   = "./multi_exp_arabidopsis/filtered.meme"
-    SPECIES2_FILE   = "./multi_exp_tomato/filtered.meme"
+    SPECIES_FILES = {
+        "arabidopsis": "./multi_exp_arabidopsis/filtered.meme",
+        "tomato":      "./multi_exp_tomato/filtered.meme",
+    }
     CRE_DIR = os.path.join(OUT_DIR, "cre_summary")
+PAIR_CACHE_DIR  = os.path.join(OUT_DIR, "pair_cache")   # 每對物種的 tomtom.tsv 快取
 OUT_TSV         = os.path.join(CRE_DIR, "repeat_motif_cross_species.tsv")
+SWEEP_DIR       = os.path.join(CRE_DIR, "thresh_sweep")
+PERM_DIR        = os.path.join(CRE_DIR, "permutation")
 # ============================
 
 
 # ---------- 共用工具 ----------
 
-def parse_meme_file(meme_file: str):
-    """回傳 (header_lines, {motif_id: full_text}, {motif_id: e-value})"""
-    header_lines, motifs, evalues = [], {}, {}
+def load_evalues(meme_file: str) -> dict:
+    """回傳 {motif_id: e-value}（motif_id 為 MOTIF 行第一欄，如 1-GNATATNC）"""
     try:
-        with open(meme_file) as fh:
-            txt = fh.read()
+        return MotifSet.read_meme(meme_file).evals()
     except Exception as e:
         sys.exit(f"❌ 讀取 {meme_file} 失敗：{e}")
 
-    first = txt.find("MOTIF")
-    header_lines = txt[:first].strip().splitlines() if first != -1 else txt.strip().splitlines()
-    for blk in txt.split("MOTIF ")[1:]:
-        lines = blk.strip().splitlines()
-        motif_full = "MOTIF " + blk
-        motif_id   = lines[0].split(' STREME-')[0]  # 去掉 STREME-1 之類
-        e_val = float("inf")
-        for ln in lines:
-            if "E=" in ln:
-                try:
-                    e_val = float(ln.split("E=")[1].strip())
-                    break
-                except ValueError:
-                    pass
-        motifs[motif_id]  = motif_full
-        evalues[motif_id] = e_val
-    return header_lines, motifs, evalues
-
 
 def run_tomtom(query: str, target: str, out_dir: str, thresh: float):
     """執行 Tomtom，比對 query vs target，回傳 tsv 路徑"""
@@ -64,84 +72,279 @@ def run_tomtom(query: str, target: str, out_dir: str, thresh: float):
         "--dist", "pearson",
         query, target
     ]
-    subprocess.run(cmd, check=True, capture_output=True, text=True)
+    run_tool(cmd, check=True, capture_output=True, text=True)
     return os.path.join(out_dir, "tomtom.tsv")
 
 
-def build_cross_clusters(tomtom_tsv: str, evalues: dict):
+def file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def compare_pair(sp_q: str, sp_t: str, species_files: dict, thresh: float):
+    """比對一對物種；兩檔內容與閾值皆未變時直接取用快取的 tomtom.tsv"""
+    q_file, t_file = species_files[sp_q], species_files[sp_t]
+    key = hashlib.sha1(
+        f"{file_sha1(q_file)}|{file_sha1(t_file)}|{thresh!r}".encode()
+    ).hexdigest()[:16]
+    cached = os.path.join(PAIR_CACHE_DIR, f"{sp_q}__{sp_t}__{key}.tsv")
+    if os.path.isfile(cached):
+        print(f"  ↺ {sp_q} vs {sp_t}：使用快取")
+        return cached
+
+    tsv = run_tomtom(q_file, t_file,
+                     os.path.join(TEMP_DIR, f"{sp_q}__{sp_t}"), thresh)
+    os.makedirs(PAIR_CACHE_DIR, exist_ok=True)
+    shutil.copy(tsv, cached + ".part")
+    os.replace(cached + ".part", cached)
+    print(f"  ✔ {sp_q} vs {sp_t}：Tomtom 完成")
+    return cached
+
+
+def build_cross_clusters(edges: EdgeTable, evalues: dict,
+                         thresh: float = float('inf')):
     """
-    把 tomtom 連線視為無向圖，取連通元件。
+    把 q-value ≤ thresh 的 tomtom 連線（所有物種對）以 union-find 取連通元件。
     代表 motif = 其 component 中 E-value 最小者 (同分取字典序最小)。
     回傳 rep_to_dups {rep: [other_motifs]}
     """
-    graph = defaultdict(set)
-    with open(tomtom_tsv) as fh:
-        for ln in fh:
-            if ln.startswith('#') or not ln.strip():
-                continue
-            if ln.lower().startswith('query_id'):
-                continue
-            q, t = ln.split('\t', 2)[:2]
-            if q == t:
-                continue
-            graph[q].add(t)
-            graph[t].add(q)
-
-    visited, rep_to_dups = set(), {}
-    for node in graph:
-        if node in visited:
-            continue
-        comp = []
-        dq = deque([node])
-        while dq:
-            cur = dq.popleft()
-            if cur in visited:
-                continue
-            visited.add(cur)
-            comp.append(cur)
-            dq.extend(graph[cur] - visited)
-
-        if len(comp) == 1:           # 只有一個 → 無 cross-match
-            continue
-        comp.sort(key=lambda m: (evalues.get(m, float('inf')), m))
-        rep, dups = comp[0], comp[1:]
-        rep_to_dups[rep] = dups
-    return rep_to_dups
+    return edges.clusters(evalues, thresh)
 
 
 def write_summary(rep_to_dups: dict, evalues: dict, out_tsv: str):
-    """寫出 cross-species motif 重複摘要"""
+    """寫出 cross-species motif 重複摘要（含 cluster 涵蓋的物種）"""
     os.makedirs(os.path.dirname(out_tsv), exist_ok=True)
     reps = sorted(rep_to_dups, key=lambda m: (evalues.get(m, float('inf')), m))
     with open(out_tsv, "w") as fh:
-        fh.write("representative\te_value\tdup_count\tduplicate_motifs\n")
+        fh.write("representative\te_value\tdup_count\tn_species\tspecies\t"
+                 "duplicate_motifs\n")
         for rep in reps:
             e_val = evalues.get(rep, float('nan'))
+            species = sorted({m.split(":", 1)[0] for m in [rep, *rep_to_dups[rep]]})
             fh.write(
-                f"{rep}\t{e_val:.3g}\t{len(rep_to_dups[rep])}\t{';'.join(rep_to_dups[rep])}\n"
+                f"{rep}\t{e_val:.3g}\t{len(rep_to_dups[rep])}\t{len(species)}\t"
+                f"{','.join(species)}\t{';'.join(rep_to_dups[rep])}\n"
             )
     print(f"➡ 已輸出交叉物種重複 motifs → {out_tsv}")
 
 
+def threshold_sweep(edges, evalues: dict, thresholds, out_dir: str):
+    """同一份 edge 表，依各 q-value 閾值分別分群並輸出摘要"""
+    os.makedirs(out_dir, exist_ok=True)
+    summary = os.path.join(out_dir, "summary.tsv")
+    with open(summary, "w") as fh:
+        fh.write("q_thresh\tn_edges\tn_clusters\tn_clustered_motifs\n")
+        for thr in sorted(thresholds):
+            rep_to_dups = build_cross_clusters(edges, evalues, thr)
+            write_summary(rep_to_dups, evalues, os.path.join(
+                out_dir, f"repeat_motif_cross_species_q{thr:g}.tsv"))
+            n_mot = sum(len(d) + 1 for d in rep_to_dups.values())
+            fh.write(f"{thr:g}\t{edges.count(thr)}\t{len(rep_to_dups)}\t{n_mot}\n")
+    print(f"➡ 閾值試算摘要 → {summary}")
+
+
+# ---------- 置換檢定 ----------
+OBS_TAG = "obs"                      # 原始 motif 在合併 MEME 檔中的前綴
+
+def make_decoys(motifs: MotifSet, n_perm: int, seed: int) -> MotifSet:
+    """原始 motif（obs__ID）+ K 組欄位（位置）打亂的 decoy（p0001__ID ...）"""
+    rng = np.random.default_rng(seed)
+    out = MotifSet(list(motifs.header))
+    for m in motifs:
+        out.add(m.renamed(f"{OBS_TAG}__{m.id}"))
+    for k in range(1, n_perm + 1):
+        for m in motifs:
+            d = m.renamed(f"p{k:04d}__{m.id}")
+            d.pwm = m.pwm[rng.permutation(m.width)]
+            out.add(d)
+    return out
+
+
+def replicate_edges(decoys: MotifSet, perm_sp: str, species_files: dict,
+                    n_targets: dict, thresh: float, n_jobs: int):
+    """
+    decoy 檔對每個其他物種各跑一次分片 Tomtom（decoy 為 query）。
+    q-value 依 motif_compare.score_rows 逐 query 以固定 target 數重算，
+    原始 motif 與 decoy 的計分方式完全相同。
+    回傳 {replicate: [(perm_sp:ID, other:ID, q), ...]}（replicate "obs" 為原始）
+    """
+    work = os.path.join(TEMP_DIR, f"perm_{perm_sp}")
+    by_rep = defaultdict(list)
+    for other, target in species_files.items():
+        if other == perm_sp:
+            continue
+        rows = tomtom_rows_sharded(decoys, target, n_targets[other],
+                                   os.path.join(work, other), thresh,
+                                   n_shards=n_jobs, n_jobs=n_jobs)
+        for edge in score_rows(rows, n_targets[other], thresh):
+            rep, mid = edge[0].split("__", 1)
+            by_rep[rep].append((f"{perm_sp}:{mid}", f"{other}:{edge[1]}", edge[5]))
+        print(f"  ✔ {perm_sp} decoys vs {other}：{len(rows):,} 組 pair")
+    return by_rep
+
+
+def permutation_test(perm_sp: str, species_files: dict, all_evals: dict,
+                     base_edges, n_perm: int, seed: int, n_jobs: int,
+                     thresh: float = TOMTOM_THRESH, out_dir: str = PERM_DIR):
+    """
+    以 perm_sp 的 decoy 取代其真實 motif，其餘物種對的 edge（base_edges）不變，
+    每組 replicate 重新分群，得到：
+      ● 共通 cluster 數（及涵蓋全部物種的 cluster 數）的虛無分佈與經驗 p-value
+        p = (1 + #{k: 虛無值 ≥ 觀察值}) / (K + 1)
+      ● 含 perm_sp motif 的每個 cluster：觀察統計量為其 perm_sp 成員與其他物種成員
+        之間的最小 q-value；虛無值為同一批 motif 的 decoy 對同一批成員的最小 q-value
+        p = (1 + #{k: 虛無值 ≤ 觀察值}) / (K + 1)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    motifs = MotifSet.read_meme(species_files[perm_sp])
+    decoys = make_decoys(motifs, n_perm, seed)
+    decoy_file = decoys.write_meme(os.path.join(out_dir, f"{perm_sp}_decoys.meme"))
+    print(f"► 置換檢定：{perm_sp} {len(motifs)} 個 motif × {n_perm} 組 decoy → {decoy_file}")
+
+    n_targets = defaultdict(int)
+    for mid in all_evals:
+        n_targets[mid.split(":", 1)[0]] += 1
+    by_rep = replicate_edges(decoys, perm_sp, species_files, n_targets, thresh, n_jobs)
+
+    n_species = len(species_files)
+    reps = [OBS_TAG] + [f"p{k:04d}" for k in range(1, n_perm + 1)]
+    counts, best = {}, {}
+    for rep in reps:
+        edges = EdgeTable().add_pairs(*base_edges)
+        rows = by_rep.get(rep, [])
+        if rows:
+            edges.add_pairs(*zip(*rows))
+        clusters = edges.clusters(all_evals, thresh)
+        n_all = sum(len({m.split(":", 1)[0] for m in [r, *d]}) == n_species
+                    for r, d in clusters.items())
+        counts[rep] = (len(clusters), n_all, edges.count(thresh))
+        pair_q = defaultdict(lambda: float("inf"))
+        for q, t, qv in rows:
+            pair_q[q, t] = min(pair_q[q, t], qv)
+        best[rep] = pair_q
+        if rep == OBS_TAG:
+            obs_clusters = clusters
+
+    with open(os.path.join(out_dir, "null_counts.tsv"), "w") as fh:
+        fh.write("replicate\tn_clusters\tn_all_species\tn_edges\n")
+        for rep in reps:
+            fh.write(f"{rep}\t" + "\t".join(map(str, counts[rep])) + "\n")
+
+    null = np.array([counts[r][:2] for r in reps[1:]], dtype=float)
+    obs = np.array(counts[OBS_TAG][:2], dtype=float)
+    p_count = (1 + (null >= obs).sum(axis=0)) / (n_perm + 1)
+
+    # ---- 各 cluster ----
+    out_tsv = os.path.join(out_dir, "cluster_perm_pvalues.tsv")
+    tag = f"{perm_sp}:"
+    with open(out_tsv, "w") as fh:
+        fh.write("representative\tn_species\tspecies\tpermuted_motifs\tbest_q\t"
+                 "null_le_best_q\tperm_p\n")
+        for rep_m in sorted(obs_clusters, key=lambda m: (all_evals.get(m, float("inf")), m)):
+            members = [rep_m, *obs_clusters[rep_m]]
+            mine = [m for m in members if m.startswith(tag)]
+            if not mine:
+                continue
+            others = [m for m in members if not m.startswith(tag)]
+            stat = lambda pq: min((pq[m, o] for m in mine for o in others
+                                   if (m, o) in pq), default=float("inf"))
+            obs_q = stat(best[OBS_TAG])
+            hits = sum(stat(best[r]) <= obs_q for r in reps[1:])
+            species = sorted({m.split(":", 1)[0] for m in members})
+            fh.write(f"{rep_m}\t{len(species)}\t{','.join(species)}\t{';'.join(mine)}\t"
+                     f"{obs_q:.3g}\t{hits}\t{(1 + hits) / (n_perm + 1):.4g}\n")
+
+    print(f"➡ 置換檢定（q ≤ {thresh:g}，K = {n_perm}）")
+    print(f"   共通 cluster：觀察 {int(obs[0])}，虛無平均 {null[:, 0].mean():.1f}，"
+          f"p = {p_count[0]:.4g}")
+    print(f"   涵蓋全部 {n_species} 物種：觀察 {int(obs[1])}，虛無平均 {null[:, 1].mean():.1f}，"
+          f"p = {p_count[1]:.4g}")
+    print(f"   各 cluster p-value → {out_tsv}")
+    return p_count
+
+
+def base_pair_edges(pairs, tsvs, skip_sp: str):
+    """不含 skip_sp 的物種對 edge（query, target, q-value 三個 list），供每組 replicate 共用"""
+    import pandas as pd
+    qs, ts, qv = [], [], []
+    for (sp_q, sp_t), tsv in zip(pairs, tsvs):
+        if skip_sp in (sp_q, sp_t):
+            continue
+        df = pd.read_csv(tsv, sep="\t", comment="#",
+                         usecols=["Query_ID", "Target_ID", "q-value"]).dropna()
+        qs += (f"{sp_q}:" + df["Query_ID"].astype(str)).tolist()
+        ts += (f"{sp_t}:" + df["Target_ID"].astype(str)).tolist()
+        qv += df["q-value"].tolist()
+    return qs, ts, qv
+
+
 # ----------------  主程式  ----------------
+def get_args():
+    p = argparse.ArgumentParser(
+        description="All-vs-all cross-species motif comparison")
+    p.add_argument("--species", action="append", metavar="NAME=MEME",
+                   help="物種 MEME 檔（可重複）；未指定時使用 SPECIES_FILES")
+    p.add_argument("--jobs", type=int, default=N_JOBS,
+                   help="同時執行的 Tomtom 數")
+    p.add_argument("--permute", metavar="SPECIES",
+                   help="對此物種 motif 做欄位打亂置換檢定")
+    p.add_argument("--n_perm", type=int, default=N_PERM, help="decoy 組數 K（≥ 1）")
+    p.add_argument("--perm_seed", type=int, default=PERM_SEED)
+    return p.parse_args()
+
+
 def main():
+    args = get_args()
+    species_files = (dict(s.split("=", 1) for s in args.species)
+                     if args.species else dict(SPECIES_FILES))
+    if len(species_files) < 2:
+        sys.exit("❌ 至少需要兩個物種的 MEME 檔")
+    if args.permute and args.permute not in species_files:
+        sys.exit(f"❌ --permute {args.permute} 不在物種清單中：{', '.join(species_files)}")
+    if args.permute and args.n_perm < 1:
+        sys.exit(f"❌ --n_perm 必須 ≥ 1（目前為 {args.n_perm}）")
+
     # 0) 準備目錄
     shutil.rmtree(TEMP_DIR, ignore_errors=True)
     os.makedirs(OUT_DIR, exist_ok=True)
 
-    # 1) 解析兩個 MEME
-    _, motifs1, evals1 = parse_meme_file(SPECIES1_FILE)
-    _, motifs2, evals2 = parse_meme_file(SPECIES2_FILE)
-    all_evals = {**evals1, **evals2}   # 合併字典
+    # 1) 解析各物種 MEME（ID 加上物種前綴避免撞名）
+    all_evals = {}
+    for sp, path in species_files.items():
+        evals = load_evalues(path)
+        all_evals.update({f"{sp}:{m}": e for m, e in evals.items()})
 
-    # 2) Tomtom cross-comparison
-    tsv = run_tomtom(SPECIES1_FILE, SPECIES2_FILE, TEMP_DIR, TOMTOM_THRESH)
+    # 2) Tomtom：每對物種比對一次（以最寬鬆閾值），平行執行
+    loosest = max([TOMTOM_THRESH, *TOMTOM_SWEEP])
+    pairs = list(combinations(species_files, 2))
+    print(f"► {len(species_files)} 個物種，{len(pairs)} 組 pair")
+    with stage("tomtom_pairs", unit="pairs", items=len(pairs)):
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            tsvs = list(pool.map(
+                lambda pr: compare_pair(*pr, species_files, loosest), pairs))
 
     # 3) 組 cross-species clusters
-    rep_to_dups = build_cross_clusters(tsv, all_evals)
+    with stage("cluster", unit="edges") as st:
+        edges = EdgeTable()
+        for (sp_q, sp_t), tsv in zip(pairs, tsvs):
+            edges.add_tsv(tsv, f"{sp_q}:", f"{sp_t}:")
+        rep_to_dups = build_cross_clusters(edges, all_evals, TOMTOM_THRESH)
+        st.items = edges.count()
 
     # 4) 輸出摘要
     write_summary(rep_to_dups, all_evals, OUT_TSV)
+    if TOMTOM_SWEEP:
+        threshold_sweep(edges, all_evals, TOMTOM_SWEEP, SWEEP_DIR)
+
+    # 5) 置換檢定（選用）
+    if args.permute:
+        with stage("permutation", unit="replicates", items=args.n_perm):
+            permutation_test(args.permute, species_files, all_evals,
+                             base_pair_edges(pairs, tsvs, args.permute),
+                             args.n_perm, args.perm_seed, args.jobs)
 
     print(f"✅ 完成！檢測到 {len(rep_to_dups)} 組跨物種共通 motifs")
 
@@ -4,13 +4,15 @@
 # 1. 將 ./exp_files/tomato/*.tsv 合併成 Tomato_all_exp.tsv
 # 2. 依 read_treat_control_list.txt 指定的配對，批次執行 DESeq2
 # ------------------------------------------------
-# 需要 pip install pydeseq2 pandas
+# 需要 pip install pydeseq2 pandas（輸出 Parquet 另需 pyarrow）
 # ================================================================
 import pandas as pd
 import glob, os, pathlib
 from pydeseq2.dds import DeseqDataSet
 from pydeseq2.ds import DeseqStats
 
+from deg_table import DESEQ_SCHEMA, write_table
+
 # ==========================
 # 可調整參數區
 # ==========================
@@ -21,8 +23,9 @@ index_col      = "Geneid"                    # 基因欄位名稱
 merged_counts  = "./exp_files/Tomato_all_exp.tsv"
 
 # --- DESeq2 相關 ---
-sample_info_path = "./read_treat_control_list.txt"  # Treatment/Control 配對設定
+sample_info_path = "./read_treat_control_list.txt"  # Treatment/Control 配對設定（可先用 deg_screen.py --passed 篩出有 DEG 的資料集）
 deg_output_dir   = "./tomato_deg_results"           # DESeq2 輸出資料夾
+deg_output_format = "tsv"   # "tsv" / "parquet" / "both"；parquet 為固定 schema 的中間檔（deg_table.py）
 # ===============================================================
 
 
@@ -95,11 +98,12 @@ for n, entry in enumerate(dataset_list, 1):
         stats.results_df
         .sort_values(["padj", "log2FoldChange"], ascending=[True, False])
         .reset_index()
-        .rename(columns={"index": "Gene"})
+        .rename(columns={"index": "Geneid"})          # 下游腳本皆以 Geneid 讀取
     )
 
-    out_path = deg_dir / f"{ds_id}.tsv"
-    deg.to_csv(out_path, sep="\t", index=False)
-    print(f"  → DEGs saved: {out_path}")
+    exts = {"tsv": [".tsv"], "parquet": [".parquet"], "both": [".tsv", ".parquet"]}[deg_output_format]
+    for ext in exts:
+        out_path = write_table(deg, deg_dir / f"{ds_id}{ext}", DESEQ_SCHEMA)
+        print(f"  → DEGs saved: {out_path}")
 
 print(f"\n 全部完成！結果輸出於：{deg_output_dir}")
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+deg_bits.py
+===========
+基因 × 實驗 的顯著性位元矩陣：由各實驗 DESeq2 結果表建立一次，之後跨實驗查詢
+不必再合併 TSV 或逐一讀取 multi_exp_*/DEG.txt
+
+  python deg_bits.py build --input_dir tomato_deg_results --out deg_bits.npz
+  python deg_bits.py info  deg_bits.npz
+  python deg_bits.py query deg_bits.npz --state up --min 3 --among EXP01 EXP02 EXP03 EXP04 \
+                           --never EXP07 --out DEG.txt        # 可直接給 extract_promoter.py
+
+  from deg_bits import DegBits
+  bits = DegBits.load_npz("deg_bits.npz")
+  genes = bits.query("deg", min_count=2, among=["EXP01", "EXP02"], never=["EXP05"])
+
+● 狀態（每個實驗各自判定，門檻同 extract_multi_expt_DEG_and_nonDEG.py）：
+    up    baseMean ≥ basemean_min、log2FC >  fc_th、padj < padj_th
+    down  baseMean ≥ basemean_min、log2FC < −fc_th、padj < padj_th
+    non   log2FC < non_fc_max（有號，非絕對值）、padj > non_p_min
+  不在該實驗結果表中的基因，三種狀態皆為 0（另有 tested 位元）
+● 每種狀態一個 bit plane：基因 × ceil(實驗數 / 8) 的 uint8（np.packbits）；
+  查詢時以實驗子集的位元遮罩 AND 後做 popcount，一次得到所有基因的計數
+● 輸入可為 .tsv 或同名 .parquet（deg_table.py）；只讀取所需四欄
+"""
+
+from pathlib import Path
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from deg_table import find_tables, read_table
+from instrument import stage
+
+STATES = ("up", "down", "non", "tested")
+BUILD_COLS = ["Geneid", "baseMean", "log2FoldChange", "padj"]
+DEFAULTS = {"padj_th": 0.05, "fc_th": 1.0, "basemean_min": 10.0,
+            "non_fc_max": 0.1, "non_p_min": 0.1}
+
+_POPCOUNT = getattr(np, "bitwise_count", None)
+_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def popcount_rows(packed: np.ndarray) -> np.ndarray:
+    """每列（基因）的位元數；packed 為 uint8 (n_genes, n_bytes)"""
+    if _POPCOUNT is not None:
+        return _POPCOUNT(packed).sum(axis=1, dtype=np.int64)
+    return _LUT[packed].sum(axis=1, dtype=np.int64)
+
+
+class DegBits:
+    """基因 × 實驗 的 up / down / non / tested 位元矩陣"""
+
+    def __init__(self, genes, experiments, planes: dict, params: dict):
+        self.genes = list(genes)
+        self.experiments = list(experiments)
+        self.planes = planes                              # state → uint8 (G, ceil(E/8))
+        self.params = params
+        self._exp_index = {e: i for i, e in enumerate(self.experiments)}
+
+    def __len__(self):
+        return len(self.genes)
+
+    # ---------- 建立 ----------
+    @classmethod
+    def from_tables(cls, paths, **thresholds) -> "DegBits":
+        """各實驗一份 DESeq2 結果表（實驗名稱取檔名 stem）"""
+        p = {**DEFAULTS, **{k: v for k, v in thresholds.items() if v is not None}}
+        tables = [(Path(f).stem, read_table(f, columns=BUILD_COLS)) for f in paths]
+        genes = sorted(set().union(*(t["Geneid"].dropna().astype(str) for _, t in tables)))
+        gene_idx = {g: i for i, g in enumerate(genes)}
+
+        dense = {s: np.zeros((len(genes), len(tables)), dtype=bool) for s in STATES}
+        for e, (_, df) in enumerate(tables):
+            df = df.dropna(subset=["Geneid"])
+            rows = df["Geneid"].astype(str).map(gene_idx).to_numpy()
+            lfc = df["log2FoldChange"].to_numpy(dtype=float)
+            padj = df["padj"].to_numpy(dtype=float)
+            base = df["baseMean"].to_numpy(dtype=float)
+            sig = (base >= p["basemean_min"]) & (padj < p["padj_th"])
+            dense["up"][rows, e] = sig & (lfc > p["fc_th"])
+            dense["down"][rows, e] = sig & (lfc < -p["fc_th"])
+            dense["non"][rows, e] = (lfc < p["non_fc_max"]) & (padj > p["non_p_min"])
+            dense["tested"][rows, e] = True
+
+        planes = {s: np.packbits(m, axis=1, bitorder="little") for s, m in dense.items()}
+        return cls(genes, [name for name, _ in tables], planes, p)
+
+    # ---------- 保存 ----------
+    def save_npz(self, path):
+        np.savez_compressed(path, genes=np.array(self.genes, dtype=str),
+                            experiments=np.array(self.experiments, dtype=str),
+                            params=np.array(json.dumps(self.params)),
+                            **{f"plane_{s}": m for s, m in self.planes.items()})
+        return path
+
+    @classmethod
+    def load_npz(cls, path) -> "DegBits":
+        z = np.load(path, allow_pickle=False)
+        planes = {s: z[f"plane_{s}"] for s in STATES}
+        return cls(z["genes"].tolist(), z["experiments"].tolist(), planes,
+                   json.loads(str(z["params"])))
+
+    # ---------- 查詢 ----------
+    def mask(self, experiments=None) -> np.ndarray:
+        """實驗子集 → 打包後的位元遮罩（None = 全部實驗）"""
+        sel = np.zeros(len(self.experiments), dtype=bool)
+        if experiments is None:
+            sel[:] = True
+        else:
+            unknown = [e for e in experiments if e not in self._exp_index]
+            if unknown:
+                raise KeyError(f"unknown experiment(s): {', '.join(unknown)}")
+            sel[[self._exp_index[e] for e in experiments]] = True
+        return np.packbits(sel, bitorder="little")
+
+    def plane(self, state: str) -> np.ndarray:
+        """state 為 up / down / non / tested，或 deg（= up | down）"""
+        if state == "deg":
+            return self.planes["up"] | self.planes["down"]
+        return self.planes[state]
+
+    def count(self, state: str = "deg", experiments=None) -> np.ndarray:
+        """每個基因在 experiments 中處於 state 的實驗數（向量化 popcount）"""
+        return popcount_rows(self.plane(state) & self.mask(experiments))
+
+    def query(self, state: str = "deg", min_count: int = 1, among=None,
+              never=None, never_state: str = "deg", max_count: int | None = None):
+        """
+        among 中處於 state 的實驗數 ∈ [min_count, max_count]，
+        且在 never 的任何實驗中都不處於 never_state 的基因（依基因 ID 排序）
+        """
+        n = self.count(state, among)
+        keep = n >= min_count
+        if max_count is not None:
+            keep &= n <= max_count
+        if never:
+            keep &= self.count(never_state, never) == 0
+        return [self.genes[i] for i in np.flatnonzero(keep)]
+
+    def summary(self):
+        """每個實驗各狀態的基因數 → [(experiment, {state: n})]"""
+        out = []
+        for e, name in enumerate(self.experiments):
+            byte, bit = divmod(e, 8)
+            out.append((name, {s: int(((m[:, byte] >> bit) & 1).sum())
+                               for s, m in self.planes.items()}))
+        return out
+
+
+# ────── CLI ──────
+def _read_names(values, list_file):
+    names = list(values or [])
+    if list_file:
+        names += [ln.strip() for ln in open(list_file) if ln.strip()]
+    return names or None
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Gene x experiment DEG bitset store.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="由各實驗 DESeq2 結果表建立")
+    b.add_argument("--input_dir", default="./tomato_deg_results")
+    b.add_argument("--file_pattern", default="*.tsv")
+    b.add_argument("--out", default="./deg_bits.npz")
+    for key, val in DEFAULTS.items():
+        b.add_argument(f"--{key}", type=float, help=f"預設 {val}")
+
+    i = sub.add_parser("info", help="列出各實驗 up / down / non 基因數")
+    i.add_argument("store")
+
+    q = sub.add_parser("query", help="跨實驗查詢，輸出基因清單")
+    q.add_argument("store")
+    q.add_argument("--state", choices=["up", "down", "deg", "non"], default="deg")
+    q.add_argument("--min", type=int, default=1, dest="min_count",
+                   help="至少在幾個 --among 實驗中處於 --state")
+    q.add_argument("--max", type=int, dest="max_count")
+    q.add_argument("--among", nargs="+", help="實驗子集（預設全部）")
+    q.add_argument("--among_file", help="實驗名稱清單檔（每行一個）")
+    q.add_argument("--never", nargs="+", help="在這些實驗中不可處於 --never_state")
+    q.add_argument("--never_file")
+    q.add_argument("--never_state", choices=["up", "down", "deg", "non"], default="deg")
+    q.add_argument("--out", help="基因清單輸出（預設 stdout）")
+    args = p.parse_args(argv)
+
+    if args.cmd == "build":
+        paths = find_tables(args.input_dir, args.file_pattern)
+        if not paths:
+            sys.exit(f"❌ No files matched '{args.file_pattern}' in {args.input_dir}")
+        with stage("build_deg_bits", unit="experiments", items=len(paths)):
+            bits = DegBits.from_tables(paths, **{k: getattr(args, k) for k in DEFAULTS})
+            bits.save_npz(args.out)
+        sys.stderr.write(f"[DONE] {len(bits):,} genes × {len(bits.experiments)} experiments "
+                         f"→ {args.out}\n")
+        return
+
+    bits = DegBits.load_npz(args.store)
+    if args.cmd == "info":
+        print("experiment\tup\tdown\tnon\ttested")
+        for name, n in bits.summary():
+            print(f"{name}\t{n['up']}\t{n['down']}\t{n['non']}\t{n['tested']}")
+        return
+
+    try:
+        genes = bits.query(args.state, args.min_count,
+                           _read_names(args.among, args.among_file),
+                           _read_names(args.never, args.never_file),
+                           args.never_state, args.max_count)
+    except KeyError as e:
+        sys.exit(f"❌ {e.args[0]}")
+    text = "".join(f"{g}\n" for g in genes)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text)
+    else:
+        sys.stdout.write(text)
+    sys.stderr.write(f"[INFO] {len(genes):,} gene(s) match\n")
+
+
+if __name__ == "__main__":
+    main()
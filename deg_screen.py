@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+deg_screen.py
+=============
+DESeq2 之前的快速 DEG 篩檢：read_treat_control_list.txt 的所有資料集一次算完，
+估計每個 treatment / control 配對大約有多少 DEG，只對通過的資料集跑 deg_analysis.py
+
+  python deg_screen.py                                    # 與 deg_analysis.py 相同的預設路徑
+  python deg_screen.py --counts exp_files/Tomato_all_exp.tsv --min_degs 100 \
+                       --passed read_treat_control_list.passed.txt
+
+● 表現量：--counts 合併表；不存在時依 --input_folder/*.tsv 合併（同 deg_analysis.py 步驟 1）
+● 所有資料集的 (資料集, sample) 欄排成一個 gene × 欄 矩陣，以 NumPy 一次計算：
+    size factor   DESeq2 median-of-ratios（每個資料集各自的幾何平均）
+    表現量        log2(normalized count + 1)
+    檢定          Welch t（各組 n ≥ 2），df 取 Welch–Satterthwaite，資料集內 BH 校正
+● DEG 估計：padj < --padj_th、|log2FC| > --fc_th 且 baseMean ≥ --min_basemean
+  （log2FC 為 log2 表現量的組間差，未經 DESeq2 的 shrinkage / 離散度估計，僅供篩檢）
+● 輸出每個資料集一列：樣本數、檢定基因數、估計 DEG（上 / 下調）、是否通過 --min_degs；
+  --passed 另寫出只含通過資料集的配對檔，可直接當作 deg_analysis.py 的 sample_info_path
+"""
+
+from pathlib import Path
+import argparse
+import sys
+
+import numpy as np
+
+from instrument import stage
+
+
+# ────── 輸入 ──────
+def read_pairs(path):
+    """兩行一組的配對檔 → [(dataset_id, control, treatment, 原始兩行)]（同 deg_analysis.py）"""
+    rows = [ln for ln in Path(path).read_text().splitlines() if ln.strip()]
+    if len(rows) % 2:
+        sys.exit(f"❌ {path}：行數為奇數，配對不完整")
+    out = []
+    for i in range(0, len(rows), 2):
+        ctrl, treat = rows[i].split("\t"), rows[i + 1].split("\t")
+        out.append((ctrl[0].strip(),
+                    [s.strip() for s in ctrl[2:] if s.strip()],
+                    [s.strip() for s in treat[2:] if s.strip()],
+                    rows[i: i + 2]))
+    return out
+
+
+def load_counts(counts_path, input_folder, pattern="*.tsv", index_col="Geneid"):
+    """合併表存在則直接讀；否則合併 input_folder 內各實驗表（outer join）"""
+    import pandas as pd
+    if counts_path and Path(counts_path).is_file():
+        return pd.read_csv(counts_path, sep="\t", index_col=0)
+    files = sorted(Path(input_folder).glob(pattern))
+    if not files:
+        sys.exit(f"❌ 找不到 {counts_path}，{input_folder}/{pattern} 也沒有檔案")
+    merged = None
+    for f in files:
+        df = pd.read_csv(f, sep="\t").set_index(index_col)
+        merged = df if merged is None else merged.join(df, how="outer")
+    return merged
+
+
+# ────── 計算 ──────
+def bh_columns(p):
+    """逐欄 Benjamini–Hochberg（NaN 不計入檢定數）"""
+    q = np.full_like(p, np.nan)
+    for j in range(p.shape[1]):
+        ok = np.isfinite(p[:, j])
+        pv = p[ok, j]
+        if not len(pv):
+            continue
+        order = np.argsort(pv)
+        ranked = pv[order] * len(pv) / np.arange(1, len(pv) + 1)
+        adj = np.minimum.accumulate(ranked[::-1])[::-1]
+        col = np.empty_like(adj)
+        col[order] = np.minimum(adj, 1.0)
+        q[ok, j] = col
+    return q
+
+
+def screen(counts: np.ndarray, col_sample, col_dataset, col_group, n_datasets: int):
+    """
+    counts：gene × sample 原始 count；col_*：每個 (資料集, sample) 欄對應的
+    sample 索引、資料集索引、組別（0 = control、1 = treatment），
+    須依 (資料集, 組別) 排序成連續區段。
+    回傳 dict：baseMean / log2FC / pvalue / padj（皆為 gene × 資料集）與 size_factors（每欄）
+    """
+    from scipy.stats import t as t_dist
+
+    col_sample, col_dataset, col_group = map(np.asarray, (col_sample, col_dataset, col_group))
+    raw = counts[:, col_sample].astype(np.float64)                 # gene × 欄
+    seg = col_dataset * 2 + col_group                              # 區段 = (資料集, 組)
+    starts = np.flatnonzero(np.r_[True, seg[1:] != seg[:-1]])
+    n_seg = np.diff(np.r_[starts, len(seg)])
+
+    # --- median-of-ratios：每個資料集內，所有樣本皆 > 0 的基因取幾何平均 ---
+    ds_starts = np.flatnonzero(np.r_[True, col_dataset[1:] != col_dataset[:-1]])
+    ds_n = np.diff(np.r_[ds_starts, len(col_dataset)])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        logc = np.log(raw)
+        log_geo = np.repeat(np.add.reduceat(logc, ds_starts, axis=1) / ds_n,
+                            ds_n, axis=1)                          # 含 0 → -inf
+        ratio = np.where(np.isfinite(log_geo), logc - log_geo, np.nan)
+        size_factors = np.exp(np.nanmedian(ratio, axis=0))
+    size_factors[~np.isfinite(size_factors)] = np.nan
+
+    norm = raw / size_factors
+    y = np.log2(norm + 1)
+
+    # --- 各 (資料集, 組) 的平均 / 變異 ---
+    s1 = np.add.reduceat(y, starts, axis=1)
+    s2 = np.add.reduceat(y * y, starts, axis=1)
+    mean = s1 / n_seg
+    with np.errstate(all="ignore"):
+        var = (s2 - n_seg * mean ** 2) / (n_seg - 1)
+    var = np.clip(var, 0, None)
+    seg_ds = col_dataset[starts]
+    seg_grp = col_group[starts]
+
+    shape = (counts.shape[0], n_datasets)
+    m = {g: np.full(shape, np.nan) for g in (0, 1)}
+    v = {g: np.full(shape, np.nan) for g in (0, 1)}
+    n = {g: np.zeros(n_datasets) for g in (0, 1)}
+    for k, (d, g) in enumerate(zip(seg_ds, seg_grp)):
+        m[g][:, d], v[g][:, d], n[g][d] = mean[:, k], var[:, k], n_seg[k]
+
+    # --- Welch t ---
+    with np.errstate(all="ignore"):
+        a, b = v[1] / n[1], v[0] / n[0]
+        se2 = a + b
+        tstat = (m[1] - m[0]) / np.sqrt(se2)
+        df = se2 ** 2 / (a ** 2 / (n[1] - 1) + b ** 2 / (n[0] - 1))
+    tstat[se2 == 0] = np.nan                                        # 兩組皆無變異
+    pval = 2 * t_dist.sf(np.abs(tstat), df)
+
+    base = np.full(shape, np.nan)
+    base[:, col_dataset[ds_starts]] = np.add.reduceat(norm, ds_starts, axis=1) / ds_n
+    return {"baseMean": base, "log2FC": m[1] - m[0], "pvalue": pval,
+            "padj": bh_columns(pval), "size_factors": size_factors}
+
+
+# ────── 主程式 ──────
+def get_args(argv=None):
+    p = argparse.ArgumentParser(
+        description="Fast approximate DEG screen for every dataset in the "
+                    "treatment/control list (before running DESeq2).")
+    p.add_argument("--counts", default="./exp_files/Tomato_all_exp.tsv",
+                   help="合併表現量表（deg_analysis.py 的 merged_counts）")
+    p.add_argument("--input_folder", default="./exp_files/tomato",
+                   help="--counts 不存在時，合併此資料夾內的 *.tsv")
+    p.add_argument("--sample_info", default="./read_treat_control_list.txt")
+    p.add_argument("--padj_th", type=float, default=0.05)
+    p.add_argument("--fc_th", type=float, default=1.0, help="|log2FC| 門檻")
+    p.add_argument("--min_basemean", type=float, default=10)
+    p.add_argument("--min_degs", type=int, default=50,
+                   help="估計 DEG 數 ≥ 此值視為通過")
+    p.add_argument("--out", default="./deg_screen.tsv")
+    p.add_argument("--passed", help="只含通過資料集的配對檔（給 deg_analysis.py）")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = get_args(argv)
+    pairs = read_pairs(args.sample_info)
+    counts_df = load_counts(args.counts, args.input_folder)
+    sample_idx = {s: i for i, s in enumerate(counts_df.columns.astype(str))}
+
+    # (資料集, 組) 連續排列；缺樣本者略過並提示
+    col_sample, col_dataset, col_group, groups = [], [], [], []
+    for d, (ds_id, ctrl, treat, _) in enumerate(pairs):
+        kept = []
+        for g, samples in enumerate((ctrl, treat)):
+            found = [s for s in samples if s in sample_idx]
+            missing = sorted(set(samples) - set(found))
+            if missing:
+                sys.stderr.write(f"[WARN] {ds_id}: {len(missing)} sample(s) not in counts "
+                                 f"({', '.join(missing[:3])}{' ...' if len(missing) > 3 else ''})\n")
+            col_sample += [sample_idx[s] for s in found]
+            col_dataset += [d] * len(found)
+            col_group += [g] * len(found)
+            kept.append(len(found))
+        groups.append(kept)
+    if not col_sample:
+        sys.exit("❌ 配對檔中的樣本都不在表現量表內")
+
+    counts = np.nan_to_num(counts_df.to_numpy(dtype=np.float64), nan=0.0)
+    with stage("deg_screen", unit="datasets", items=len(pairs)):
+        res = screen(counts, col_sample, col_dataset, col_group, len(pairs))
+
+    rows = []
+    for d, (ds_id, *_rest) in enumerate(pairs):
+        n_ctrl, n_treat = groups[d]
+        tested = (np.isfinite(res["padj"][:, d])
+                  & (res["baseMean"][:, d] >= args.min_basemean))
+        lfc = res["log2FC"][:, d]
+        sig = tested & (res["padj"][:, d] < args.padj_th) & (np.abs(lfc) > args.fc_th)
+        if min(n_ctrl, n_treat) < 2:
+            status = "n<2"
+        else:
+            status = "pass" if sig.sum() >= args.min_degs else "fail"
+        rows.append((ds_id, n_ctrl, n_treat, int(tested.sum()), int(sig.sum()),
+                     int((sig & (lfc > 0)).sum()), int((sig & (lfc < 0)).sum()), status))
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as fh:
+        fh.write("dataset_id\tn_control\tn_treatment\tn_tested\tn_deg\tn_up\tn_down\tstatus\n")
+        for r in rows:
+            fh.write("\t".join(map(str, r)) + "\n")
+            print(f"[INFO] {r[0]:<28} {r[1]} ctrl / {r[2]} treat  "
+                  f"DEG≈{r[4]:,} (↑{r[5]:,} ↓{r[6]:,})  {r[7]}")
+
+    n_pass = sum(r[7] == "pass" for r in rows)
+    if args.passed:
+        with open(args.passed, "w") as fh:
+            for (_, _, _, lines), r in zip(pairs, rows):
+                if r[7] == "pass":
+                    fh.write("\n".join(lines) + "\n")
+    sys.stderr.write(f"[DONE] {n_pass}/{len(rows)} dataset(s) pass (≥ {args.min_degs} DEGs) → {out}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,29 @@ merge_tomato_deg.py
 ===================
 Merge per-sample DEG result TSVs, then output stringent DEG / Non-DEG lists.
 
-每個輸入 TSV 必含欄位：Geneid, log2FoldChange, lfcSE, padj
+每個輸入 TSV（或同名 .parquet，見 deg_table.py）必含欄位：Geneid, log2FoldChange, lfcSE, padj
+只讀取這四欄；--out_format parquet 時摘要表改寫成 .parquet
+
+可匯入使用（pipeline_driver.py）：
+  merged = merge_tables(input_dir)             # 合併 + meta_p / meta_log2FC（與閾值無關）
+  deg, non_deg = call_deg(merged, padj_th, fc_th)
 """
 
 from pathlib import Path
 from functools import partial
 import argparse
 import numpy as np
-import pandas as pd
-from scipy.stats import combine_pvalues
+
+from deg_table import SUMMARY_SCHEMA, FORMATS, find_tables, read_table, write_table
+from instrument import stage
+
+MERGE_COLS = ["Geneid", "log2FoldChange", "lfcSE", "padj"]
 
 
 # ----------------------------------------------------------------------
 # Argument parser
 # ----------------------------------------------------------------------
-def get_args():
+def get_args(argv=None):
     p = argparse.ArgumentParser(
         description="Merge multiple DEG tables and call rigorous "
                     "DEG / Non-DEG gene sets"
@@ -34,12 +42,15 @@ def get_args():
                    help="abs(log2FC) threshold for significance")
     p.add_argument("--prefix",    default="tomato",
                    help="Prefix for output filenames (e.g. species)")
-    return p.parse_args()
+    p.add_argument("--out_format", choices=FORMATS, default="tsv",
+                   help="Summary table format (parquet needs pyarrow)")
+    return p.parse_args(argv)
 
 
 # ----------------------------------------------------------------------
 def fisher_p(row, sig_cols, min_p=1e-300):
     """Fisher’s method to combine p-values along a row."""
+    from scipy.stats import combine_pvalues
     ps = row[sig_cols].dropna()
     if ps.empty:
         return np.nan
@@ -59,33 +70,23 @@ def meta_fc(row, fc_cols, se_cols):
 
 
 # ----------------------------------------------------------------------
-def main():
-    args = get_args()
-
-    INPUT_DIR  = Path(args.input_dir)
-    TSV_DIR    = Path(args.out_dir)
-    PADJ_TH    = args.padj_th
-    FC_TH      = args.fc_th
-    OUT_DEG    = TSV_DIR / f"{args.prefix}_DEG.tsv"
-    OUT_NON    = TSV_DIR / f"{args.prefix}_nonDEG.tsv"
+def merge_tables(input_dir):
+    """合併 input_dir/*.tsv / *.parquet（inner join on Geneid），並計算 meta_p / meta_log2FC"""
+    import pandas as pd
+    INPUT_DIR = Path(input_dir)
 
     # ---------- Merge all sample tables ----------
     dfs = []
-    for path in INPUT_DIR.glob("*.tsv"):
+    for path in find_tables(INPUT_DIR, "*.tsv"):
         tag = path.stem
-        df  = pd.read_csv(path, sep="\t")
-
-        # 強制關鍵欄位轉數值
-        for col in ["log2FoldChange", "lfcSE", "padj"]:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors="coerce")
+        df  = read_table(path, columns=MERGE_COLS)       # TSV 時數值欄以 coerce 轉型
 
         df = df.add_prefix(f"{tag}__")
         df = df.rename(columns={f"{tag}__Geneid": "Geneid"})
         dfs.append(df.set_index("Geneid"))
 
     if not dfs:
-        raise SystemExit(f"[ERROR] No *.tsv files found in {INPUT_DIR}")
+        raise SystemExit(f"[ERROR] No *.tsv / *.parquet files found in {INPUT_DIR}")
 
     merged = pd.concat(dfs, axis=1, join="inner")
 
@@ -96,6 +97,13 @@ def main():
 
     merged["meta_p"]      = merged.apply(partial(fisher_p, sig_cols=sig_cols), axis=1)
     merged["meta_log2FC"] = merged.apply(partial(meta_fc, fc_cols=fc_cols, se_cols=se_cols), axis=1)
+    return merged
+
+
+def call_deg(merged, padj_th, fc_th):
+    """依 padj / |log2FC| 閾值計算 sig_count，回傳 (DEG, Non-DEG) DataFrame"""
+    sig_cols = [c for c in merged.columns if c.endswith("__padj")]
+    fc_cols  = [c.replace("__padj", "__log2FoldChange") for c in sig_cols]
 
     padj_mat = merged[sig_cols].fillna(1)           # 不顯著
     fc_mat   = merged[fc_cols].abs().fillna(0)      # 無變化
@@ -105,15 +113,16 @@ def main():
     fc_mat.columns   = tags
 
     # ---------- Call DEG / Non-DEG ----------
-    sig_bool    = (padj_mat < PADJ_TH) & (fc_mat > FC_TH)
-    nonsig_bool = (padj_mat >= PADJ_TH) | (fc_mat <= FC_TH)
+    sig_bool    = (padj_mat < padj_th) & (fc_mat > fc_th)
+    nonsig_bool = (padj_mat >= padj_th) | (fc_mat <= fc_th)
 
-    merged["sig_count"] = sig_bool.sum(axis=1)
-    merged["sig_prop"]  = merged["sig_count"] / len(sig_cols)
+    calls = merged[["meta_p", "meta_log2FC"]].copy()
+    calls["sig_count"] = sig_bool.sum(axis=1)
+    calls["sig_prop"]  = calls["sig_count"] / len(sig_cols)
 
     # DEG
-    deg = (merged[["sig_count", "sig_prop", "meta_p", "meta_log2FC"]]
-           .loc[merged["sig_count"] > 0]
+    deg = (calls[["sig_count", "sig_prop", "meta_p", "meta_log2FC"]]
+           .loc[calls["sig_count"] > 0]
            .dropna(subset=["meta_p"])
            .sort_values(by=["meta_log2FC", "sig_count", "meta_p"],
                         ascending=[False, False, True])
@@ -121,15 +130,32 @@ def main():
 
     # Non-DEG：所有比較皆非顯著
     mask_non = nonsig_bool.all(axis=1)
-    non_deg  = (merged.loc[mask_non,
-                           ["sig_count", "sig_prop",
-                            "meta_p", "meta_log2FC"]]
+    non_deg  = (calls.loc[mask_non,
+                          ["sig_count", "sig_prop",
+                           "meta_p", "meta_log2FC"]]
                 .reset_index())
+    return deg, non_deg
+
+
+# ----------------------------------------------------------------------
+def main(argv=None):
+    args = get_args(argv)
+
+    TSV_DIR    = Path(args.out_dir)
+    ext        = FORMATS[args.out_format]
+    OUT_DEG    = TSV_DIR / f"{args.prefix}_DEG{ext}"
+    OUT_NON    = TSV_DIR / f"{args.prefix}_nonDEG{ext}"
+
+    with stage("merge_tables", unit="genes") as st:
+        merged = merge_tables(args.input_dir)
+        st.items = len(merged)
+    with stage("call_deg", unit="genes", items=len(merged)):
+        deg, non_deg = call_deg(merged, args.padj_th, args.fc_th)
 
     # ---------- Save ----------
     TSV_DIR.mkdir(parents=True, exist_ok=True)
-    deg.to_csv(OUT_DEG,  sep="\t", index=False)
-    non_deg.to_csv(OUT_NON, sep="\t", index=False)
+    write_table(deg,     OUT_DEG, SUMMARY_SCHEMA)
+    write_table(non_deg, OUT_NON, SUMMARY_SCHEMA)
 
     print(f"[INFO] DEG     → {OUT_DEG}  (n={len(deg):,})")
     print(f"[INFO] Non-DEG → {OUT_NON} (n={len(non_deg):,})")
@@ -25,6 +25,13 @@ FASTA_PATH="ref/S_lycopersicum/S_lycopersicum_chromosomes.4.00.fa"
 # GFF_PATH="ref/Araport/Araport11_GFF3_genes_transposons.current.gff"
 # FASTA_PATH="ref/Araport/TAIR10_chr_all.fas"
 SEED=42                            # Down-sampling Non-DEG 用
+
+# ── 快取：輸入 / 參數 / 輸出未變的步驟自動略過 ─────────────────
+STAGE_CACHE=".stage_cache"         # manifest 存放處
+FORCE=false                        # true = 全部重跑
+
+# ── 量測紀錄（instrument.py）：各 stage 耗時 / 記憶體寫成 JSON-lines ──
+RUN_LOG="./deg_summary/run_log.jsonl"   # 留空則不記錄
 ################################################################
 
 
@@ -35,14 +42,39 @@ if [ -z "$PYTHON" ]; then
   exit 1
 fi
 
+# stage_run.py：依 manifest 判斷是否需要重跑（見該檔說明）
+STAGE=("$PYTHON" stage_run.py --cache_dir "$STAGE_CACHE")
+$FORCE && STAGE+=(--force)
+
+# 同一次執行的所有腳本共用 run ID；結束後可用 instrument.py summary 彙整
+if [ -n "$RUN_LOG" ]; then
+  export CRE_RUN_LOG="$RUN_LOG"
+  export CRE_RUN_ID="${CRE_RUN_ID:-$(date +%Y%m%d_%H%M%S)_$$}"
+fi
+
+SUM_DIR="./deg_summary"
+PROM_DIR="./prom_seq_files"
+PROM_KB=$((PROMOTER_UP_BP / 1000))
+
 echo "=== Step 1. DEG summary ==="
-"$PYTHON" deg_summary.py \
+"${STAGE[@]}" --name "${SPECIES}_deg_summary" \
+  --in deg_summary.py --in deg_table.py --in instrument.py --in "$INPUT_DIR" \
+  --out "$SUM_DIR/${SPECIES}_DEG.tsv" --out "$SUM_DIR/${SPECIES}_nonDEG.tsv" \
+  -- "$PYTHON" deg_summary.py \
   --input_dir "$INPUT_DIR" \
   --padj_th   "$PADJ_TH" \
-  --fc_th     "$FC_TH"
+  --fc_th     "$FC_TH" \
+  --prefix    "$SPECIES"
 
 echo "=== Step 2. Filter DEG / Non-DEG lists ==="
-"$PYTHON" extract_DEG_and_nonDEG.py \
+"${STAGE[@]}" --name "${SPECIES}_filter_sig_count_${SIG_COUNT}" \
+  --in extract_DEG_and_nonDEG.py --in deg_table.py --in instrument.py \
+  --in "$SUM_DIR/${SPECIES}_DEG.tsv" --in "$SUM_DIR/${SPECIES}_nonDEG.tsv" \
+  --out "$SUM_DIR/${SPECIES}_DEG_filtered_sig_count_${SIG_COUNT}.tsv" \
+  --out "$SUM_DIR/${SPECIES}_nonDEG_filtered_sig_count_${SIG_COUNT}.tsv" \
+  --out "$SUM_DIR/${SPECIES}_DEG_filtered_sig_count_${SIG_COUNT}_geneid.txt" \
+  --out "$SUM_DIR/${SPECIES}_nonDEG_filtered_sig_count_${SIG_COUNT}_geneid.txt" \
+  -- "$PYTHON" extract_DEG_and_nonDEG.py \
   --species     "$SPECIES" \
   --sig_th      "$SIG_COUNT" \
   --deg_fc_th   "$DEG_FC_TH" \
@@ -50,7 +82,12 @@ echo "=== Step 2. Filter DEG / Non-DEG lists ==="
   --non_fc_th   "$NON_FC_NEAR0_TH"
 
 echo "=== Step 3. Extract promoter FASTA ==="
-"$PYTHON" extract_promoter.py \
+"${STAGE[@]}" --name "${SPECIES}_promoter_${PROM_KB}kb_sig_count_${SIG_COUNT}" \
+  --in extract_promoter.py --in instrument.py --in "$GFF_PATH" --in "$FASTA_PATH" \
+  --in "$SUM_DIR/${SPECIES}_DEG_filtered_sig_count_${SIG_COUNT}_geneid.txt" \
+  --in "$SUM_DIR/${SPECIES}_nonDEG_filtered_sig_count_${SIG_COUNT}_geneid.txt" \
+  --out "$PROM_DIR/${SPECIES}_*_promoter_${PROM_KB}kb_sig_count_${SIG_COUNT}.fa" \
+  -- "$PYTHON" extract_promoter.py \
   --sig_count     "$SIG_COUNT" \
   --up_bp         "$PROMOTER_UP_BP" \
   --gff_path      "$GFF_PATH" \
@@ -61,3 +98,6 @@ echo "=== Step 3. Extract promoter FASTA ==="
   --neg_min        "$NEG_MIN"
 
 echo "✅  Pipeline finished – promoter FASTA files are in ./prom_seq_files/"
+if [ -n "$RUN_LOG" ] && [ -f "$RUN_LOG" ]; then
+  "$PYTHON" instrument.py summary "$RUN_LOG" --run_id "$CRE_RUN_ID"
+fi
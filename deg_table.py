@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+deg_table.py
+============
+DEG 各步驟之間的表格讀寫（TSV 或 Parquet，依副檔名決定）
+
+  write_table(df, "tomato_deg_results/EXP01.parquet", DESEQ_SCHEMA)
+  df = read_table(path, columns=["Geneid", "log2FoldChange", "lfcSE", "padj"])
+  paths = find_tables("tomato_deg_results", "*.tsv")
+
+● TSV 仍為預設（人可直接閱讀）；Parquet 為選用的中間格式，需安裝 pyarrow
+● Parquet 以固定 schema 寫出：Geneid 為 dictionary 編碼字串、數值欄為 float64 / int32，
+  讀取時不需再解析文字或猜欄位型別，且只載入 columns 指定的欄位
+● TSV 讀取同樣只取 columns 指定的欄位，數值欄以 to_numeric(errors="coerce") 轉型
+● find_tables()：同一 stem 同時有 .tsv 與 .parquet 時取較新的一份（同時間則取 Parquet）
+"""
+
+from pathlib import Path
+import sys
+
+# 欄位 → 型別（"str" 以 dictionary 編碼寫出）
+DESEQ_SCHEMA = {
+    "Geneid": "str", "baseMean": "float64", "log2FoldChange": "float64",
+    "lfcSE": "float64", "stat": "float64", "pvalue": "float64", "padj": "float64",
+}
+SUMMARY_SCHEMA = {
+    "Geneid": "str", "sig_count": "int32", "sig_prop": "float64",
+    "meta_p": "float64", "meta_log2FC": "float64",
+}
+FORMATS = {"tsv": ".tsv", "parquet": ".parquet"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        sys.exit("❌ Parquet 格式需要 pyarrow：conda install -c conda-forge pyarrow")
+    return pa, pq
+
+
+def is_parquet(path) -> bool:
+    return Path(path).suffix == ".parquet"
+
+
+def with_format(path, fmt: str) -> Path:
+    """依 fmt（tsv / parquet）替換副檔名"""
+    return Path(path).with_suffix(FORMATS[fmt])
+
+
+# ────── 寫出 ──────
+def write_table(df, path, schema: dict):
+    """依副檔名寫出 TSV 或 Parquet；Parquet 只寫 schema 中的欄位並固定型別"""
+    path = Path(path)
+    if not is_parquet(path):
+        df.to_csv(path, sep="\t", index=False)
+        return path
+
+    pa, pq = _pyarrow()
+    missing = [c for c in schema if c not in df.columns]
+    if missing:
+        sys.exit(f"❌ {path.name}: 缺少欄位 {', '.join(missing)}")
+    arrays, fields = [], []
+    for col, kind in schema.items():
+        if kind == "str":
+            arr = pa.array(df[col].astype(str), type=pa.string()).dictionary_encode()
+        else:
+            arr = pa.array(df[col].to_numpy(dtype=kind), type=getattr(pa, kind)())
+        arrays.append(arr)
+        fields.append(pa.field(col, arr.type))
+    pq.write_table(pa.Table.from_arrays(arrays, schema=pa.schema(fields)), str(path),
+                   compression="zstd")
+    return path
+
+
+# ────── 讀取 ──────
+def read_table(path, columns=None, schema: dict = DESEQ_SCHEMA):
+    """讀取 TSV / Parquet；columns=None 表示全部欄位。Geneid 一律回傳一般字串欄"""
+    import pandas as pd
+    path = Path(path)
+    if is_parquet(path):
+        _, pq = _pyarrow()
+        df = pq.read_table(str(path), columns=columns).to_pandas()
+        for col, kind in schema.items():
+            if kind == "str" and col in df.columns:
+                df[col] = df[col].astype(str)
+        return df
+
+    df = pd.read_csv(path, sep="\t",
+                     usecols=(lambda c: c in columns) if columns else None)
+    for col, kind in schema.items():
+        if col in df.columns and kind != "str":
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def find_tables(folder, pattern="*.tsv"):
+    """pattern 符合的 TSV 與同名 Parquet，每個 stem 取一份（較新者），依 stem 排序"""
+    folder = Path(folder)
+    base = pattern[: -len(Path(pattern).suffix)] if Path(pattern).suffix else pattern
+    best = {}
+    for p in [*folder.glob(pattern), *folder.glob(base + ".parquet")]:
+        if p.suffix not in FORMATS.values():
+            continue
+        key = (p.stat().st_mtime, is_parquet(p))
+        if p.stem not in best or key > best[p.stem][0]:
+            best[p.stem] = (key, p)
+    return [best[s][1] for s in sorted(best)]
+
+
+def resolve(path):
+    """<stem>.tsv / <stem>.parquet 中存在且較新的一份；皆不存在時回傳原路徑"""
+    path = Path(path)
+    found = find_tables(path.parent, path.stem + ".tsv")
+    found = [p for p in found if p.stem == path.stem]
+    return found[0] if found else path
@@ -1,4 +1,5 @@
 #!/bin/bash
+# 並行／可續跑版本：python fetch_sra.py --srr_list srr_list.txt --compress
 
 # ==== 可調整參數 ====
 SRR_LIST="srr_list.txt"                  # SRR ID 清單檔案
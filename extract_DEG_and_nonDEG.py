@@ -12,17 +12,22 @@ Apply stringent thresholds to merged DEG / Non-DEG tables.
   ./deg_summary/{species}_DEG_filtered_sig_count_{sig_th}.tsv
   ./deg_summary/{species}_nonDEG_filtered_sig_count_{sig_th}.tsv
 以及對應 _geneid.txt 清單
+（deg_summary.py --out_format parquet 產生的 .parquet 摘要亦可讀取，取較新的一份）
+
+可匯入使用：filter_lists(deg, non, sig_th, deg_fc_th, non_p_th, non_fc_th)
 """
 
 from pathlib import Path
 import argparse
-import pandas as pd
+
+from deg_table import SUMMARY_SCHEMA, read_table, resolve
+from instrument import stage
 
 
 # ----------------------------------------------------------------------
 # Argument parser
 # ----------------------------------------------------------------------
-def get_args():
+def get_args(argv=None):
     p = argparse.ArgumentParser(
         description="Filter rigorous DEG / Non-DEG gene lists"
     )
@@ -38,17 +43,34 @@ def get_args():
                    help="meta_p > this for Non-DEG")
     p.add_argument("--non_fc_th",   type=float, default=0.1,
                    help="|meta_log2FC| ≤ this for Non-DEG")
-    return p.parse_args()
+    return p.parse_args(argv)
 
 
 # ----------------------------------------------------------------------
-def main():
-    args = get_args()
+def filter_lists(deg, non, sig_th, deg_fc_th, non_p_th, non_fc_th):
+    """回傳 (deg_filt, non_filt)"""
+    # DEG：sig_count ≥ sig_th 且 meta_log2FC > deg_fc_th
+    deg_filt = (deg
+        .loc[(deg["sig_count"] >= sig_th) & (deg["meta_log2FC"] > deg_fc_th)]
+        .reset_index(drop=True))
+
+    # Non-DEG：meta_p > non_p_th 且 |meta_log2FC| ≤ non_fc_th
+    non_filt = (non
+        .dropna(subset=["meta_p", "meta_log2FC"])
+        .loc[(non["meta_p"] > non_p_th) &
+             (non["meta_log2FC"].abs() <= non_fc_th)]
+        .reset_index(drop=True))
+    return deg_filt, non_filt
+
+
+# ----------------------------------------------------------------------
+def main(argv=None):
+    args = get_args(argv)
 
     sp          = args.species
     SUM_DIR     = Path(args.summary_dir)
-    IN_DEG      = SUM_DIR / f"{sp}_DEG.tsv"
-    IN_NON      = SUM_DIR / f"{sp}_nonDEG.tsv"
+    IN_DEG      = resolve(SUM_DIR / f"{sp}_DEG.tsv")         # 或 .parquet
+    IN_NON      = resolve(SUM_DIR / f"{sp}_nonDEG.tsv")
 
     # 門檻
     SIG_TH      = args.sig_th
@@ -60,21 +82,12 @@ def main():
     OUT_NON = SUM_DIR / f"{sp}_nonDEG_filtered_sig_count_{SIG_TH}.tsv"
 
     # ---------- 1. 讀檔 ----------
-    deg  = pd.read_csv(IN_DEG, sep="\t")
-    non  = pd.read_csv(IN_NON, sep="\t")
+    deg  = read_table(IN_DEG, schema=SUMMARY_SCHEMA)
+    non  = read_table(IN_NON, schema=SUMMARY_SCHEMA)
 
     # ---------- 2. 過濾 ----------
-    # 2-1 DEG：sig_count ≥ SIG_TH 且 meta_log2FC > DEG_FC_TH
-    deg_filt = (deg
-        .loc[(deg["sig_count"] >= SIG_TH) & (deg["meta_log2FC"] > DEG_FC_TH)]
-        .reset_index(drop=True))
-
-    # 2-2 Non-DEG：meta_p > NON_P_TH 且 |meta_log2FC| ≤ NON_FC_TH
-    non_filt = (non
-        .dropna(subset=["meta_p", "meta_log2FC"])
-        .loc[(non["meta_p"] > NON_P_TH) &
-             (non["meta_log2FC"].abs() <= NON_FC_TH)]
-        .reset_index(drop=True))
+    with stage("filter_lists", unit="genes", items=len(deg) + len(non)):
+        deg_filt, non_filt = filter_lists(deg, non, SIG_TH, DEG_FC_TH, NON_P_TH, NON_FC_TH)
 
     # ---------- 3. 輸出 ----------
     deg_filt.to_csv(OUT_DEG,  sep="\t", index=False)
@@ -2,14 +2,20 @@
 # -*- coding: utf-8 -*-
 """
 Batch split DEG / non-DEG and save Geneid lists.
+
+輸入可為 DESeq2 的 .tsv 或同名 .parquet（deg_table.py；同 stem 取較新者），只讀取所需四欄。
 """
 
 from pathlib import Path
-import pandas as pd
 import random
 import argparse
 import sys
 
+from deg_table import find_tables, read_table
+from instrument import stage
+
+SPLIT_COLS = ["Geneid", "baseMean", "log2FoldChange", "padj"]
+
 
 # ────── 主工具函式 ──────
 def split_deg(
@@ -25,8 +31,9 @@ def split_deg(
     random_seed: int | None,
     verbose: bool,
 ):
-    """將單一 DESeq2 TSV 拆分成 DEG 與 non-DEG Geneid 名單"""
-    df = pd.read_csv(file_path, sep="\t")
+    """將單一 DESeq2 TSV / Parquet 拆分成 DEG 與 non-DEG Geneid 名單；回傳讀入的基因數"""
+    import pandas as pd
+    df = read_table(file_path, columns=SPLIT_COLS)
 
     # ------------ 篩選正樣本 (DEG) ------------
     deg_mask = (
@@ -64,6 +71,7 @@ def split_deg(
             f"non-DEG={len(non_ids):5d} "
             f"(requested {target_neg}, original {len(non_ids_all)})"
         )
+    return len(df)
 
 
 # ────── 主程式 ──────
@@ -101,24 +109,25 @@ def main(argv=None):
     out_root = Path(args.output_dir).expanduser().resolve()
     out_root.mkdir(exist_ok=True)
 
-    tsv_files = sorted(in_root.glob(args.file_pattern))
+    tsv_files = find_tables(in_root, args.file_pattern)
     if not tsv_files:
         sys.exit(f"No files matched '{args.file_pattern}' in {in_root}")
 
-    for fp in tsv_files:
-        split_deg(
-            fp,
-            out_root,
-            args.basemean_deg_min,
-            args.log2fc_deg_min,
-            args.padj_deg_max,
-            args.log2fc_non_max,
-            args.padj_non_min,
-            args.neg_multiplier,
-            args.neg_min,
-            args.random_seed,
-            args.verbose,
-        )
+    with stage("split_deg", unit="genes") as st:
+        for fp in tsv_files:
+            st.add(split_deg(
+                fp,
+                out_root,
+                args.basemean_deg_min,
+                args.log2fc_deg_min,
+                args.padj_deg_max,
+                args.log2fc_non_max,
+                args.padj_non_min,
+                args.neg_multiplier,
+                args.neg_min,
+                args.random_seed,
+                args.verbose,
+            ))
 
 
 if __name__ == "__main__":
@@ -37,11 +37,32 @@ NONDEG_FILENAME="nonDEG.txt"
 # 3) 其他
 RANDOM_SEED=42
 VERBOSE=true                              # 是否顯示進度
+
+# 4) 快取：輸入 / 參數 / 輸出未變的步驟自動略過（stage_run.py）
+STAGE_CACHE="${OUTPUT_DIR}/.stage_cache"
+FORCE=false                               # true = 全部重跑
+
+# 5) 量測紀錄（instrument.py）：各 stage 耗時 / 記憶體寫成 JSON-lines；留空則不記錄
+RUN_LOG="${OUTPUT_DIR}/run_log.jsonl"
 # ───────────────────────────────────────────────────────────
 
+STAGE=(python stage_run.py --cache_dir "${STAGE_CACHE}")
+[[ "${FORCE}" == true ]] && STAGE+=(--force)
+PROM_KB=$((PROMOTER_UP_BP / 1000))
+
+# 同一次執行的所有腳本共用 run ID；結束後以 instrument.py summary 彙整
+if [[ -n "${RUN_LOG}" ]]; then
+    export CRE_RUN_LOG="${RUN_LOG}"
+    export CRE_RUN_ID="${CRE_RUN_ID:-$(date +%Y%m%d_%H%M%S)_$$}"
+fi
+
 # ===== (1) 產生 DEG / non-DEG GeneID 清單 =====
 echo "=== Step 1. Get DEG / non-DEG GeneID list ==="
-python extract_multi_expt_DEG_and_nonDEG.py \
+"${STAGE[@]}" --name deg_lists \
+    --in extract_multi_expt_DEG_and_nonDEG.py --in deg_table.py --in instrument.py \
+    --in "${INPUT_DIR}/${FILE_PATTERN}" --in "${INPUT_DIR}/${FILE_PATTERN%.*}.parquet" \
+    --out "${OUTPUT_DIR}/*/DEG.txt" --out "${OUTPUT_DIR}/*/nonDEG.txt" \
+    -- python extract_multi_expt_DEG_and_nonDEG.py \
     --input_dir          "${INPUT_DIR}" \
     --output_dir         "${OUTPUT_DIR}" \
     --file_pattern       "${FILE_PATTERN}" \
@@ -57,7 +78,11 @@ python extract_multi_expt_DEG_and_nonDEG.py \
 
 # ===== (2) 批次擷取 promoter FASTA =====
 echo "=== Step 2. Extract promoter FASTA ==="
-python extract_multi_expt_promoter.py \
+"${STAGE[@]}" --name "promoter_${PROM_KB}kb" \
+    --in extract_multi_expt_promoter.py --in instrument.py --in "${GFF_PATH}" --in "${FASTA_PATH}" \
+    --in "${OUTPUT_DIR}/*/${DEG_FILENAME}" --in "${OUTPUT_DIR}/*/${NONDEG_FILENAME}" \
+    --out "${OUTPUT_DIR}/*/*_promoter_${PROM_KB}kb.fa" \
+    -- python extract_multi_expt_promoter.py \
     --root_dir        "${OUTPUT_DIR}" \
     --deg_filename    "${DEG_FILENAME}" \
     --nondeg_filename "${NONDEG_FILENAME}" \
@@ -68,3 +93,6 @@ python extract_multi_expt_promoter.py \
     $( [[ "${VERBOSE}" == true ]] && echo "--verbose" )
 
 echo -e "\n Finished successfully."
+if [[ -n "${RUN_LOG}" && -f "${RUN_LOG}" ]]; then
+    python instrument.py summary "${RUN_LOG}" --run_id "${CRE_RUN_ID}"
+fi
@@ -15,12 +15,12 @@
 
 from pathlib import Path
 import random, sys, argparse
-import pandas as pd
-from pyfaidx import Fasta
-from tqdm import tqdm
+
+from instrument import stage
 
 # ---------- 共用工具 ----------
 def load_gene_table(gff_path):
+    import pandas as pd
     keep_types = {
         "gene", "transposable_element_gene",
         "ncRNA_gene", "lncRNA_gene", "pseudogene"
@@ -55,6 +55,7 @@ def rc(seq: str) -> str:
 
 
 def write_promoters(id_list, label, sample_name, anno, fa, out_dir):
+    from tqdm import tqdm
     if not id_list:
         return 0
     fa_name = out_dir / f"{sample_name}_{label}_promoter_{PROMOTER_UP_BP//1000}kb.fa"
@@ -106,23 +107,28 @@ def main(argv=None):
         random.seed(args.random_seed)
 
     root = Path(args.root_dir).expanduser()
-    anno = load_gene_table(args.gff)
-    fa   = Fasta(args.fasta, sequence_always_upper=True)
-
-    for subdir in sorted(p for p in root.iterdir() if p.is_dir()):
-        sample = subdir.name
-        deg_path  = subdir / args.deg_filename
-        ndeg_path = subdir / args.nondeg_filename
-        if not deg_path.exists() and not ndeg_path.exists():
-            continue
+    with stage("load_annotation", unit="genes") as st:
+        anno = load_gene_table(args.gff)
+        from pyfaidx import Fasta
+        fa   = Fasta(args.fasta, sequence_always_upper=True)
+        st.items = len(anno)
+
+    with stage("extract_promoters", unit="sequences") as st:
+        for subdir in sorted(p for p in root.iterdir() if p.is_dir()):
+            sample = subdir.name
+            deg_path  = subdir / args.deg_filename
+            ndeg_path = subdir / args.nondeg_filename
+            if not deg_path.exists() and not ndeg_path.exists():
+                continue
 
-        deg_ids  = deg_path.read_text().strip().splitlines()  if deg_path.exists()  else []
-        ndeg_ids = ndeg_path.read_text().strip().splitlines() if ndeg_path.exists() else []
+            deg_ids  = deg_path.read_text().strip().splitlines()  if deg_path.exists()  else []
+            ndeg_ids = ndeg_path.read_text().strip().splitlines() if ndeg_path.exists() else []
 
-        n_deg  = write_promoters(deg_ids,  "DEG",    sample, anno, fa, subdir)
-        n_ndeg = write_promoters(ndeg_ids, "nonDEG", sample, anno, fa, subdir)
+            n_deg  = write_promoters(deg_ids,  "DEG",    sample, anno, fa, subdir)
+            n_ndeg = write_promoters(ndeg_ids, "nonDEG", sample, anno, fa, subdir)
+            st.add(n_deg + n_ndeg)
 
-        sys.stderr.write(f"[DONE] {sample}: DEG {n_deg}, non-DEG {n_ndeg}\n")
+            sys.stderr.write(f"[DONE] {sample}: DEG {n_deg}, non-DEG {n_ndeg}\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
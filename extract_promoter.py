@@ -8,19 +8,29 @@ Grab −1 kb / −2 kb promoter sequences for DEG & Non-DEG gene lists.
 輸入：
   ./deg_summary/{prefix}_DEG_filtered_sig_count_{sig_count}_geneid.txt
   ./deg_summary/{prefix}_nonDEG_filtered_sig_count_{sig_count}_geneid.txt
+
+串流模式（--stream）：stdin 讀基因 ID 或 BED 行，FASTA 直接寫到 stdout
+  cut -f1 deg_summary/tomato_DEG_filtered_sig_count_3_geneid.txt \
+    | python extract_promoter.py --stream --label DEG | gzip > DEG_1kb.fa.gz
+  ● 單欄 → 基因 ID（查 GFF）；≥3 欄 → BED（chrom, 0-based start, end[, name, score, strand]），
+    以該區段為「基因」取其上游
+  ● generator 逐筆處理，記憶體不隨輸入增長；輸出累積到 --block_kb 才寫出並 flush
+  ● 只有遇到基因 ID 時才載入 GFF；找不到的 ID 只在 stderr 回報
+
+可匯入使用：load_gene_table / sample_negatives / write_promoters / stream_promoters
 """
 
-import sys, random, argparse
+import os, sys, random, argparse
+from collections import namedtuple
 from pathlib import Path
-import pandas as pd
-from pyfaidx import Fasta
-from tqdm import tqdm
+
+from instrument import stage
 
 
 # ----------------------------------------------------------------------
 # Argument parser
 # ----------------------------------------------------------------------
-def get_args():
+def get_args(argv=None):
     p = argparse.ArgumentParser(
         description="Extract upstream promoter sequences for DEG / Non-DEG"
     )
@@ -44,7 +54,13 @@ def get_args():
                    help="Random seed for down-sampling Non-DEG (None = off)")
     p.add_argument("--out_dir", default="prom_seq_files",
                    help="Output folder for FASTA & log files")
-    return p.parse_args()
+    p.add_argument("--stream", action="store_true",
+                   help="stdin 讀基因 ID / BED 行，FASTA 寫到 stdout")
+    p.add_argument("--label", default="query",
+                   help="--stream 時 FASTA header 的標籤")
+    p.add_argument("--block_kb", type=int, default=1024,
+                   help="--stream 時每次寫出的區塊大小 (KB)")
+    return p.parse_args(argv)
 
 
 # ----------------------------------------------------------------------
@@ -55,6 +71,7 @@ def read_id_list(path):
 
 
 def load_gene_table(gff_path):
+    import pandas as pd
     keep_types = {
         "gene", "transposable_element_gene",
         "ncRNA_gene", "lncRNA_gene", "pseudogene",
@@ -91,16 +108,145 @@ def reverse_complement(seq):
     return seq[::-1].translate(str.maketrans("ACGTacgt", "TGCAtgca"))
 
 
+def sample_negatives(deg_ids, nondeg_all, neg_multiplier, neg_min, seed=None):
+    """Down-sample Non-DEG：max(len(DEG) × neg_multiplier, neg_min) 條"""
+    target_neg = max(len(deg_ids) * neg_multiplier, neg_min)
+
+    # ❷ 依照目標數量抽樣 Non-DEG
+    if deg_ids and nondeg_all and len(nondeg_all) >= target_neg:
+        nondeg_ids = random.Random(seed).sample(nondeg_all, k=target_neg)
+        sys.stderr.write(
+            f"[INFO] Down-sampled {target_neg} Non-DEG IDs "
+            f"(3× positives, ≥{neg_min}) out of {len(nondeg_all)}\n"
+        )
+    else:
+        nondeg_ids = nondeg_all       # 不足目標數，全部保留
+        sys.stderr.write(
+            f"[INFO] Only {len(nondeg_all)} Non-DEG IDs available; kept them all\n"
+        )
+    return nondeg_ids
+
+
+def write_promoters(id_list, label, anno, fa, up_bp, out_path, miss_path):
+    """寫出 promoter FASTA；不在 GFF 的 ID 記錄到 miss_path，回傳寫出條數"""
+    if not id_list:
+        return 0
+
+    from tqdm import tqdm
+    missing = []
+    with Path(out_path).open("w") as out_fa:
+        for gid in tqdm(id_list, desc=label):
+            if gid not in anno.index:
+                missing.append(gid)
+                continue
+            row = anno.loc[gid]
+            chr_len = len(fa[row.chr])
+            p_start, p_end = calc_promoter(row, up_bp, chr_len)
+            seq = fa[row.chr][p_start - 1: p_end].seq
+            if row.strand == "-":
+                seq = reverse_complement(seq)
+            header = (f">{gid}|{row.chr}:{p_start}-{p_end}({row.strand})|"
+                      f"{up_bp}bp_upstream|{label}")
+            out_fa.write(f"{header}\n{seq}\n")
+
+    # Write missing ID log
+    if missing:
+        Path(miss_path).write_text("\n".join(missing))
+        sys.stderr.write(
+            f"[WARN] {label}: {len(missing)} IDs not in GFF (see {miss_path})\n"
+        )
+    return len(id_list) - len(missing)
+
+
+# ----------------------------------------------------------------------
+# Streaming mode
+# ----------------------------------------------------------------------
+Locus = namedtuple("Locus", "chr start end strand")
+
+
+def parse_stream(lines):
+    """逐行產生 (名稱, Locus)；基因 ID 行的 Locus 為 None"""
+    for ln in lines:
+        if not ln.strip() or ln.startswith(("#", "track", "browser")):
+            continue
+        f = ln.rstrip("\n").split("\t") if "\t" in ln else ln.split()
+        if len(f) >= 3 and f[1].isdigit() and f[2].isdigit():
+            start, end = int(f[1]) + 1, int(f[2])              # BED → 1-based
+            strand = f[5] if len(f) > 5 and f[5] in ("+", "-") else "+"
+            name = f[3] if len(f) > 3 and f[3] not in ("", ".") else f"{f[0]}:{start}-{end}"
+            yield name, Locus(f[0], start, end, strand)
+        else:
+            yield f[0].strip(), None
+
+
+def stream_promoters(records, gff_path, fa, up_bp, label, missing):
+    """(名稱, Locus) → FASTA 字串；略過的名稱計入 missing（Counter-like dict）"""
+    anno, chr_len = None, {}
+    for name, loc in records:
+        if loc is None:
+            if anno is None:
+                anno = load_gene_table(gff_path)
+            if name not in anno.index:
+                missing[name] = missing.get(name, 0) + 1
+                continue
+            loc = anno.loc[name]
+        if loc.chr not in chr_len:
+            if loc.chr not in fa:
+                missing[name] = missing.get(name, 0) + 1
+                continue
+            chr_len[loc.chr] = len(fa[loc.chr])
+        p_start, p_end = calc_promoter(loc, up_bp, chr_len[loc.chr])
+        seq = fa[loc.chr][p_start - 1: p_end].seq
+        if loc.strand == "-":
+            seq = reverse_complement(seq)
+        yield (f">{name}|{loc.chr}:{p_start}-{p_end}({loc.strand})|"
+               f"{up_bp}bp_upstream|{label}\n{seq}\n")
+
+
+def write_blocks(chunks, out, block_bytes=1 << 20):
+    """累積到 block_bytes 才寫出並 flush；回傳寫出筆數"""
+    buf, size, n = [], 0, 0
+    for chunk in chunks:
+        buf.append(chunk)
+        size += len(chunk)
+        n += 1
+        if size >= block_bytes:
+            out.write("".join(buf))
+            out.flush()
+            buf, size = [], 0
+    if buf:
+        out.write("".join(buf))
+        out.flush()
+    return n
+
+
+def run_stream(args):
+    from pyfaidx import Fasta
+    fa = Fasta(args.fasta_path, sequence_always_upper=True)
+    missing = {}
+    chunks = stream_promoters(parse_stream(sys.stdin), args.gff_path, fa,
+                              args.up_bp, args.label, missing)
+    try:
+        with stage("stream_promoters", unit="sequences") as st:
+            n = st.items = write_blocks(chunks, sys.stdout, args.block_kb * 1024)
+    except BrokenPipeError:                     # 下游（如 head）提早結束
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    if missing:
+        sys.stderr.write(f"[WARN] {args.label}: {len(missing)} IDs not in GFF / genome "
+                         f"(e.g. {', '.join(list(missing)[:5])})\n")
+    sys.stderr.write(f"[DONE] Streamed {n} {args.label} promoters.\n")
+
+
 # ----------------------------------------------------------------------
-def main():
-    args = get_args()
+def main(argv=None):
+    args = get_args(argv)
+    if args.stream:
+        return run_stream(args)
 
     SIG_COUNT      = args.sig_count
-    NEG_MULTIPLIER = args.neg_multiplier
-    NEG_MIN        = args.neg_min
     PROMOTER_UP_BP = args.up_bp
     PREFIX         = args.prefix
-    SEED           = args.seed
     OUT_DIR        = args.out_dir
 
     Path(OUT_DIR).mkdir(parents=True, exist_ok=True)
@@ -109,71 +255,33 @@ def main():
     DEG_FILE    = f"{args.summary_dir}/{PREFIX}_DEG_filtered_sig_count_{SIG_COUNT}_geneid.txt"
     NONDEG_FILE = f"{args.summary_dir}/{PREFIX}_nonDEG_filtered_sig_count_{SIG_COUNT}_geneid.txt"
 
-    # Reproducible down-sampling
-    if SEED is not None:
-        random.seed(SEED)
-
     # Read gene lists
     deg_ids      = read_id_list(DEG_FILE)
     nondeg_all   = read_id_list(NONDEG_FILE)
 
-    # Down-sample Non-DEG to match DEG count
-    target_neg = max(len(deg_ids) * NEG_MULTIPLIER, NEG_MIN)
-
-    # ❷ 依照目標數量抽樣 Non-DEG
-    if deg_ids and nondeg_all and len(nondeg_all) >= target_neg:
-        nondeg_ids = random.sample(nondeg_all, k=target_neg)
-        sys.stderr.write(
-            f"[INFO] Down-sampled {target_neg} Non-DEG IDs "
-            f"(3× positives, ≥{NEG_MIN}) out of {len(nondeg_all)}\n"
-        )
-    else:
-        nondeg_ids = nondeg_all       # 不足目標數，全部保留
-        sys.stderr.write(
-            f"[INFO] Only {len(nondeg_all)} Non-DEG IDs available; kept them all\n"
-        )
+    # Down-sample Non-DEG to match DEG count（seed 固定可重現）
+    nondeg_ids = sample_negatives(deg_ids, nondeg_all, args.neg_multiplier,
+                                  args.neg_min, args.seed)
 
     # Load annotation & genome
-    anno = load_gene_table(args.gff_path)
-    fa   = Fasta(args.fasta_path, sequence_always_upper=True)
+    with stage("load_annotation", unit="genes") as st:
+        anno = load_gene_table(args.gff_path)
+        from pyfaidx import Fasta
+        fa   = Fasta(args.fasta_path, sequence_always_upper=True)
+        st.items = len(anno)
 
     # --------------------------------------------------------------
-    def write_promoters(id_list, label):
-        if not id_list:
-            return 0
-
-        out_path = (Path(OUT_DIR) /
-                    f"{PREFIX}_{label}_promoter_{PROMOTER_UP_BP//1000}kb_sig_count_{SIG_COUNT}.fa")
-        missing = []
-
-        with out_path.open("w") as out_fa:
-            for gid in tqdm(id_list, desc=label):
-                if gid not in anno.index:
-                    missing.append(gid)
-                    continue
-                row = anno.loc[gid]
-                chr_len = len(fa[row.chr])
-                p_start, p_end = calc_promoter(row, PROMOTER_UP_BP, chr_len)
-                seq = fa[row.chr][p_start - 1: p_end].seq
-                if row.strand == "-":
-                    seq = reverse_complement(seq)
-                header = (f">{gid}|{row.chr}:{p_start}-{p_end}({row.strand})|"
-                          f"{PROMOTER_UP_BP}bp_upstream|{label}")
-                out_fa.write(f"{header}\n{seq}\n")
-
-        # Write missing ID log
-        if missing:
-            miss_path = (Path(OUT_DIR) /
-                         f"{PREFIX}_{label}_sig_count_{SIG_COUNT}_missing_ids.txt")
-            Path(miss_path).write_text("\n".join(missing))
-            sys.stderr.write(
-                f"[WARN] {label}: {len(missing)} IDs not in GFF (see {miss_path})\n"
-            )
-        return len(id_list) - len(missing)
+    def out_paths(label):
+        return (Path(OUT_DIR) /
+                f"{PREFIX}_{label}_promoter_{PROMOTER_UP_BP//1000}kb_sig_count_{SIG_COUNT}.fa",
+                Path(OUT_DIR) / f"{PREFIX}_{label}_sig_count_{SIG_COUNT}_missing_ids.txt")
 
-    # --------------------------------------------------------------
-    n_deg  = write_promoters(deg_ids, "DEG") if deg_ids else 0
-    n_ndeg = write_promoters(nondeg_ids, "nonDEG") if nondeg_ids else 0
+    with stage("write_promoters", unit="sequences") as st:
+        n_deg  = write_promoters(deg_ids, "DEG", anno, fa, PROMOTER_UP_BP,
+                                 *out_paths("DEG")) if deg_ids else 0
+        n_ndeg = write_promoters(nondeg_ids, "nonDEG", anno, fa, PROMOTER_UP_BP,
+                                 *out_paths("nonDEG")) if nondeg_ids else 0
+        st.items = n_deg + n_ndeg
 
     sys.stderr.write(
         f"[DONE] Extracted {n_deg} DEG promoters and {n_ndeg} Non-DEG promoters.\n"
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+fetch_sra.py
+============
+download.sh 的並行、可續跑版：prefetch → fasterq-dump（→ gzip）
+
+● srr_list.txt 格式不變：第一行為專案名稱，其後每行一個 SRR
+● prefetch（網路）與 fasterq-dump（CPU / 磁碟）各自有並行上限，
+  某個 SRR 下載完成就立即進入 dump，不必等整批下載
+● fasterq-dump 先寫到 <OUTDIR>/.tmp/<SRR>/，完成後才搬到 <OUTDIR>；失敗依 --retries 重試
+● --compress：各 mate 的輸出檔先建成 FIFO，由 pigz / gzip 邊讀邊壓縮，
+  不會先落地完整的未壓縮 FASTQ（若 fasterq-dump 改以一般檔案取代 FIFO，則事後壓縮）
+● 每個 SRR 在 <OUTDIR>/.manifest/<SRR>.json 記錄檔案大小與各步驟耗時
+● 續跑時略過已完成的 SRR：
+    有 manifest 且檔案大小相符；或（無 manifest 的舊下載）FASTQ 最後一筆 record 完整
+
+--prefetch / --fasterq_dump 可指定執行檔（離線測試用的替身）。
+"""
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+
+# ────── 工具函式 ──────
+def read_srr_list(path: Path):
+    lines = [ln.strip() for ln in path.read_text().splitlines() if ln.strip()]
+    if len(lines) < 2:
+        sys.exit(f"❌ {path} 至少需要專案名稱與一個 SRR")
+    return lines[0], list(dict.fromkeys(lines[1:]))
+
+
+def fastq_tail_ok(path: Path) -> bool:
+    """未壓縮 FASTQ：檢查最後一筆 record 是否完整（@ / 序列 / + / 品質）"""
+    size = path.stat().st_size
+    if size == 0:
+        return False
+    with open(path, "rb") as fh:
+        fh.seek(max(0, size - 65536))
+        tail = fh.read()
+    if not tail.endswith(b"\n"):
+        return False
+    lines = tail.rstrip(b"\n").split(b"\n")
+    if len(lines) < 4:
+        return False
+    head, seq, plus, qual = lines[-4:]
+    return head.startswith(b"@") and plus.startswith(b"+") and len(seq) == len(qual)
+
+
+def run_files(out_dir: Path, srr: str):
+    return sorted(out_dir.glob(f"{srr}.fastq*")) + sorted(out_dir.glob(f"{srr}_[12].fastq*"))
+
+
+def is_complete(out_dir: Path, srr: str) -> bool:
+    man = out_dir / ".manifest" / f"{srr}.json"
+    if man.is_file():
+        info = json.loads(man.read_text())
+        return info.get("status") == "done" and all(
+            (out_dir / name).is_file() and (out_dir / name).stat().st_size == size
+            for name, size in info["files"].items())
+    files = run_files(out_dir, srr)
+    return bool(files) and all(f.suffix == ".fastq" and fastq_tail_ok(f) for f in files)
+
+
+def timed(cmd, log_path: Path, retries: int = 0):
+    """執行指令（失敗重試），回傳 (returncode, 秒數)"""
+    t0 = time.perf_counter()
+    for _ in range(retries + 1):
+        with open(log_path, "a") as log:
+            log.write(f"$ {' '.join(cmd)}\n")
+            log.flush()
+            rc = subprocess.run(cmd, stdout=log, stderr=subprocess.STDOUT).returncode
+        if rc == 0:
+            break
+    return rc, time.perf_counter() - t0
+
+
+def gzip_file(src: Path, level: int, threads: int) -> Path:
+    """壓縮成 <src>.gz 並刪除原檔；有 pigz 時使用多執行緒"""
+    dst = src.with_name(src.name + ".gz")
+    pigz = shutil.which("pigz")
+    if pigz:
+        with open(dst, "wb") as out:
+            subprocess.run([pigz, f"-{level}", "-p", str(threads), "-c", str(src)],
+                           stdout=out, check=True)
+    else:
+        with open(src, "rb") as fin, gzip.open(dst, "wb", compresslevel=level) as fout:
+            shutil.copyfileobj(fin, fout, 1 << 20)
+    src.unlink()
+    return dst
+
+
+def _gzip_fd(fd: int, dst: Path, level: int):
+    with os.fdopen(fd, "rb") as fin, gzip.open(dst, "wb", compresslevel=level) as fout:
+        shutil.copyfileobj(fin, fout, 1 << 20)
+
+
+def gzip_ok(path: Path) -> bool:
+    """壓縮檔是否含有資料（空 FIFO 只會產生空的 gzip）"""
+    with gzip.open(path, "rb") as fh:
+        return bool(fh.read(1))
+
+
+class GzipFifos:
+    """
+    在 tmp/ 建立 fasterq-dump 可能寫出的各 mate 檔名（FIFO），每個 FIFO 接一個壓縮器。
+    父行程自己持有一個寫端，fasterq-dump 結束前壓縮器不會讀到 EOF；
+    close() 關閉寫端並等待壓縮器 → {FIFO 路徑: 壓縮檔}
+    """
+
+    def __init__(self, tmp: Path, srr: str, level: int, threads: int):
+        pigz = shutil.which("pigz")
+        self.streams = []
+        for name in (f"{srr}.fastq", f"{srr}_1.fastq", f"{srr}_2.fastq"):
+            fifo = tmp / name
+            os.mkfifo(fifo)
+            r = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+            w = os.open(fifo, os.O_WRONLY)
+            os.set_blocking(r, True)
+            dst = tmp / (name + ".gz")
+            if pigz:
+                with open(dst, "wb") as out:
+                    job = subprocess.Popen([pigz, f"-{level}", "-p", str(threads), "-c"],
+                                           stdin=r, stdout=out)
+                os.close(r)
+            else:
+                job = threading.Thread(target=_gzip_fd, args=(r, dst, level), daemon=True)
+                job.start()
+            self.streams.append((fifo, w, job, dst))
+
+    def close(self) -> dict:
+        out = {}
+        for fifo, w, job, dst in self.streams:
+            os.close(w)
+            ok = job.wait() == 0 if isinstance(job, subprocess.Popen) else (job.join() or True)
+            out[fifo] = dst if ok else None
+        return out
+
+
+# ────── 兩個步驟 ──────
+def prefetch_one(args, srr: str, sra_dir: Path, log_dir: Path):
+    rc, wall = timed([args.prefetch, srr, "--output-directory", str(sra_dir)],
+                     log_dir / f"{srr}.log", args.retries)
+    return srr, rc, wall
+
+
+def dump_attempt(args, srr: str, src, tmp: Path, log_path: Path):
+    """執行一次 fasterq-dump → (returncode, 輸出檔清單)"""
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    cmd = [args.fasterq_dump, str(src), "--split-files", "--threads", str(args.threads),
+           "-O", str(tmp), "--temp", str(tmp)]
+    if not args.compress:
+        rc, _ = timed(cmd, log_path)
+        return rc, sorted(tmp.glob(f"{srr}*.fastq"))
+
+    fifos = GzipFifos(tmp, srr, args.gzip_level, args.threads)
+    try:
+        rc, _ = timed(cmd + ["--force"], log_path)         # 輸出檔（FIFO）已存在
+    finally:
+        streams = fifos.close()
+    fastqs = []
+    for fifo, gz in streams.items():
+        if fifo.is_file():                                 # FIFO 被一般檔案取代 → 事後壓縮
+            gz.unlink(missing_ok=True)
+            fastqs.append(gzip_file(fifo, args.gzip_level, args.threads))
+        elif gz is None:
+            rc = rc or 1
+        elif gzip_ok(gz):
+            fastqs.append(gz)
+    return rc, sorted(fastqs)
+
+
+def dump_one(args, srr: str, sra_dir: Path, out_dir: Path, log_dir: Path, info: dict):
+    tmp = out_dir / ".tmp" / srr
+    src = sra_dir / srr if (sra_dir / srr).exists() else srr
+    t0 = time.perf_counter()
+    for attempt in range(args.retries + 1):
+        rc, fastqs = dump_attempt(args, srr, src, tmp, log_dir / f"{srr}.log")
+        if rc == 0 and fastqs:
+            break
+    info["dump_s"] = round(time.perf_counter() - t0, 2)
+    info["dump_attempts"] = attempt + 1
+    if rc != 0:
+        return srr, rc
+    if not fastqs:
+        return srr, 1
+
+    for f in fastqs:
+        f.replace(out_dir / f.name)
+    shutil.rmtree(tmp, ignore_errors=True)
+    if not args.keep_sra:
+        shutil.rmtree(sra_dir / srr, ignore_errors=True)
+    info["files"] = {f.name: (out_dir / f.name).stat().st_size for f in fastqs}
+    return srr, 0
+
+
+def write_manifest(out_dir: Path, srr: str, info: dict):
+    info["finished_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    (out_dir / ".manifest" / f"{srr}.json").write_text(json.dumps(info, indent=1))
+
+
+# ────── 主程式 ──────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Parallel, resumable SRA download.")
+    p.add_argument("--srr_list", default="srr_list.txt", help="SRR ID 清單檔案")
+    p.add_argument("--base_dir", default="raw_data", help="基礎儲存資料夾")
+    p.add_argument("--prefetch_jobs", type=int, default=4, help="同時 prefetch 數")
+    p.add_argument("--dump_jobs", type=int, default=2, help="同時 fasterq-dump 數")
+    p.add_argument("--threads", type=int, default=8, help="每個 fasterq-dump 的執行緒")
+    p.add_argument("--retries", type=int, default=2,
+                   help="prefetch / fasterq-dump 失敗重試次數")
+    p.add_argument("--compress", action="store_true",
+                   help="輸出 .fastq.gz（經 FIFO 邊 dump 邊壓縮）")
+    p.add_argument("--gzip_level", type=int, default=6)
+    p.add_argument("--keep_sra", action="store_true", help="保留 .sra 檔")
+    p.add_argument("--prefetch", default="prefetch", help="prefetch 執行檔")
+    p.add_argument("--fasterq_dump", default="fasterq-dump", help="fasterq-dump 執行檔")
+    args = p.parse_args(argv)
+    if args.retries < 0:
+        sys.exit("❌ --retries 必須 ≥ 0")
+
+    project, srrs = read_srr_list(Path(args.srr_list))
+    out_dir = Path(args.base_dir) / project
+    sra_dir = out_dir / ".sra"
+    log_dir = out_dir / ".logs"
+    for d in (out_dir / ".manifest", sra_dir, log_dir):
+        d.mkdir(parents=True, exist_ok=True)
+
+    todo = []
+    for srr in srrs:
+        if is_complete(out_dir, srr):
+            print(f"↺  {srr} 已完成 – skipped.")
+        else:
+            todo.append(srr)
+    print(f"\n=== {project}: {len(todo)} to fetch, {len(srrs) - len(todo)} done ===")
+
+    failed, infos = [], {srr: {"run": srr, "status": "running"} for srr in todo}
+    with ThreadPoolExecutor(max_workers=args.prefetch_jobs) as fetch_pool, \
+         ThreadPoolExecutor(max_workers=args.dump_jobs) as dump_pool:
+        pending = {fetch_pool.submit(prefetch_one, args, s, sra_dir, log_dir): "prefetch"
+                   for s in todo}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                step = pending.pop(fut)
+                if step == "prefetch":
+                    srr, rc, wall = fut.result()
+                    info = infos[srr]
+                    info["prefetch_s"] = round(wall, 2)
+                    info["sra_bytes"] = sum(f.stat().st_size
+                                            for f in (sra_dir / srr).rglob("*")
+                                            if f.is_file())
+                    if rc != 0:
+                        failed.append(srr)
+                        info["status"] = "prefetch_failed"
+                        write_manifest(out_dir, srr, info)
+                        print(f"❌ prefetch 失敗：{srr}（見 {log_dir}/{srr}.log）")
+                        continue
+                    print(f"⬇  {srr} downloaded（{wall:.0f}s）")
+                    nxt = dump_pool.submit(dump_one, args, srr, sra_dir,
+                                           out_dir, log_dir, info)
+                    pending[nxt] = "dump"
+                else:
+                    srr, rc = fut.result()
+                    info = infos[srr]
+                    info["status"] = "done" if rc == 0 else "dump_failed"
+                    write_manifest(out_dir, srr, info)
+                    if rc != 0:
+                        failed.append(srr)
+                        print(f"❌ fasterq-dump 失敗：{srr}（見 {log_dir}/{srr}.log）")
+                    else:
+                        mb = sum(info["files"].values()) / 1e6
+                        print(f"✅ {srr} → {', '.join(info['files'])}（{mb:.1f} MB）")
+
+    try:
+        (out_dir / ".tmp").rmdir()            # 全部成功時已空；失敗者的暫存保留供檢查
+    except OSError:
+        pass
+    if failed:
+        sys.exit(f"❌ {len(failed)} 個 SRR 失敗：{', '.join(failed)}（重新執行即可續跑）")
+    print("=== All done ===")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+instrument.py
+=============
+各腳本共用的輕量量測：每個具名 stage 與外部工具呼叫的耗時、CPU、peak RSS、處理量
+
+  from instrument import stage, run_tool, popen_tool
+
+  with stage("tomtom", unit="motifs") as st:
+      st.items = len(motifs)
+      run_tool(["tomtom", ...], capture_output=True, text=True, check=True)
+
+環境變數：
+  CRE_RUN_LOG=run_log.jsonl   寫出 JSON-lines 紀錄（未設定則不寫，僅量測）
+  CRE_RUN_ID=...              同一次流程的多支腳本共用的 run ID（預設 <時間>_<pid>）
+  CRE_PROFILE=tomtom,prepare  對指定 stage 開 cProfile（"*" = 全部）
+  CRE_PROFILE_DIR=profiles    .prof 輸出位置（<stage>_<pid>.prof，可用 snakeviz / pstats 檢視）
+
+每筆紀錄：run_id, script, kind (stage / tool), name, started_at, wall_s, cpu_s,
+          peak_rss_mb, items, unit, items_per_s（tool 另有 cmd, returncode）
+● stage：cpu_s = 本行程（含所有 thread）+ 期間結束的子行程；
+  peak_rss_mb 為 stage 期間的行程 peak（Linux 於最外層 stage 開始時以 clear_refs 歸零，
+  無法歸零時為行程啟動以來的 peak）
+● tool：cpu_s 取自該子行程的 rusage（os.wait4 回收時取得）；peak_rss_mb 為執行中取樣該行程的 VmHWM
+  （非 Linux 退回 rusage，會包含 fork 前父行程的記憶體）
+
+彙整：python instrument.py summary run_log.jsonl [--run_id ID]
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+_LOCK = threading.Lock()
+_ACTIVE = [0]                       # 目前開啟中的 stage 數（最外層才歸零 peak RSS）
+RUN_ID = os.environ.get("CRE_RUN_ID") or f"{time.strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+SCRIPT = Path(sys.argv[0]).name if sys.argv and sys.argv[0] else "python"
+
+
+# ────── 紀錄 ──────
+def log_path():
+    return os.environ.get("CRE_RUN_LOG") or None
+
+
+def emit(record: dict):
+    """附加一筆 JSON 到 CRE_RUN_LOG（O_APPEND 單次寫入，多行程共用同一檔案亦安全）"""
+    path = log_path()
+    if not path:
+        return
+    line = json.dumps({"run_id": RUN_ID, "script": SCRIPT, "pid": os.getpid(), **record},
+                      ensure_ascii=False) + "\n"
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with _LOCK:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+
+
+def _vm_hwm_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for ln in fh:
+                if ln.startswith("VmHWM"):
+                    return int(ln.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak():
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _self_peak_mb():
+    hwm = _vm_hwm_mb()
+    if hwm is not None:
+        return hwm
+    import resource
+    scale = 1 if sys.platform == "darwin" else 1024            # macOS 為 bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 / scale
+
+
+def _rate(items, wall):
+    return round(items / wall, 2) if items is not None and wall > 0 else None
+
+
+# ────── stage ──────
+class Stage:
+    def __init__(self, name, unit=None, items=None):
+        self.name, self.unit, self.items = name, unit, items
+
+    def add(self, n=1):
+        self.items = (self.items or 0) + n
+
+
+def _want_profile(name):
+    spec = os.environ.get("CRE_PROFILE", "")
+    return bool(spec) and (spec == "*" or name in spec.split(","))
+
+
+@contextmanager
+def stage(name, unit=None, items=None):
+    """量測一個具名區段；st.items / st.add() 記錄處理量"""
+    st = Stage(name, unit, items)
+    with _LOCK:
+        outermost = _ACTIVE[0] == 0
+        _ACTIVE[0] += 1
+    if outermost:
+        _reset_peak()
+
+    prof = None
+    if _want_profile(name):
+        import cProfile
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:                      # 已有其他 profiler 啟用中
+            sys.stderr.write(f"[WARN] cProfile already active – {name} not profiled\n")
+            prof = None
+
+    started = time.strftime("%Y-%m-%d %H:%M:%S")
+    t0, c0 = time.perf_counter(), time.process_time()
+    k0 = os.times()
+    status = "ok"
+    try:
+        yield st
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        wall = time.perf_counter() - t0
+        k1 = os.times()
+        cpu = (time.process_time() - c0 + (k1.children_user - k0.children_user)
+               + (k1.children_system - k0.children_system))
+        if prof is not None:
+            prof.disable()
+            out = Path(os.environ.get("CRE_PROFILE_DIR", "profiles"))
+            out.mkdir(parents=True, exist_ok=True)
+            prof.dump_stats(out / f"{name}_{os.getpid()}.prof")
+        with _LOCK:
+            _ACTIVE[0] -= 1
+        emit({"kind": "stage", "name": name, "started_at": started,
+              "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+              "peak_rss_mb": round(_self_peak_mb(), 1), "items": st.items,
+              "unit": st.unit, "items_per_s": _rate(st.items, wall), "status": status})
+
+
+# ────── 外部工具 ──────
+def _reap(proc):
+    """以 os.wait4 回收子行程並設定 returncode → rusage（呼叫端已自行 wait() 時為 None）"""
+    if proc.returncode is not None:
+        return None
+    try:
+        _, status, ru = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        proc.wait()
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return ru
+
+
+def _communicate(proc, inp=None):
+    """同 Popen.communicate()，但不回收子行程（留給 _reap 取得 rusage）"""
+    out = {}
+
+    def drain(key, fh):
+        out[key] = fh.read()
+        fh.close()
+
+    readers = [threading.Thread(target=drain, args=(key, fh), daemon=True)
+               for key, fh in (("stdout", proc.stdout), ("stderr", proc.stderr))
+               if fh is not None]
+    for t in readers:
+        t.start()
+    if proc.stdin is not None:
+        try:
+            if inp:
+                proc.stdin.write(inp)
+            proc.stdin.close()
+        except BrokenPipeError:                 # 子行程未讀完 input 就結束
+            pass
+    for t in readers:
+        t.join()
+    return out.get("stdout"), out.get("stderr")
+
+
+class _PeakSampler(threading.Thread):
+    """執行期間定期讀取子行程 VmHWM（單調遞增，最後一次讀值即 peak）"""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid, self.interval, self.peak = pid, interval, None
+        self.done = threading.Event()
+
+    def run(self):
+        while not self.done.is_set():
+            hwm = _vm_hwm_mb(self.pid)
+            if hwm is None:
+                break
+            self.peak = hwm
+            self.done.wait(self.interval)
+
+
+@contextmanager
+def popen_tool(cmd, name=None, unit=None, items=None, **kw):
+    """
+    Popen 版本（需邊執行邊讀 stdout 時使用）；離開 with 時以 os.wait4 等待結束並記錄。
+    with 內不要自行 proc.wait() / communicate()，否則子行程已被回收，cpu_s 記為 None
+    """
+    name = name or Path(str(cmd[0])).name
+    started = time.strftime("%Y-%m-%d %H:%M:%S")
+    t0 = time.perf_counter()
+    with subprocess.Popen(cmd, **kw) as proc:
+        sampler = _PeakSampler(proc.pid)
+        sampler.start()
+        try:
+            yield proc
+        finally:
+            ru = _reap(proc)
+            sampler.done.set()
+            sampler.join()
+            wall = time.perf_counter() - t0
+            peak = sampler.peak or None             # 太短而來不及取樣 → None
+            if peak is None and ru is not None and not os.path.exists("/proc/self/status"):
+                peak = ru.ru_maxrss / 1024
+            emit({"kind": "tool", "name": name, "started_at": started,
+                  "cmd": [str(c) for c in cmd], "returncode": proc.returncode,
+                  "wall_s": round(wall, 4),
+                  "cpu_s": round(ru.ru_utime + ru.ru_stime, 4) if ru else None,
+                  "peak_rss_mb": round(peak, 1) if peak is not None else None,
+                  "items": items, "unit": unit, "items_per_s": _rate(items, wall)})
+
+
+def run_tool(cmd, name=None, unit=None, items=None, check=False, **kw):
+    """subprocess.run 的替代品：參數相同（input / capture_output / text ...），另記錄一筆 tool 紀錄"""
+    inp = kw.pop("input", None)
+    if kw.pop("capture_output", False):
+        kw["stdout"] = kw["stderr"] = subprocess.PIPE
+    if inp is not None:
+        kw["stdin"] = subprocess.PIPE
+    with popen_tool(cmd, name, unit, items, **kw) as proc:
+        stdout, stderr = _communicate(proc, inp)
+    done = subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
+    if check:
+        done.check_returncode()
+    return done
+
+
+# ────── 彙整 ──────
+def summary(path, run_id=None):
+    rows = [json.loads(ln) for ln in open(path) if ln.strip()]
+    if run_id is None and rows:
+        run_id = rows[-1]["run_id"]
+    rows = [r for r in rows if r["run_id"] == run_id]
+    print(f"run_id: {run_id}")
+    print("script\tkind\tname\tcalls\twall_s\tcpu_s\tpeak_rss_mb\titems\titems_per_s")
+    agg = {}
+    for r in rows:
+        key = (r["script"], r["kind"], r["name"])
+        a = agg.setdefault(key, {"calls": 0, "wall": 0.0, "cpu": 0.0, "peak": 0.0,
+                                 "items": None, "unit": r.get("unit")})
+        a["calls"] += 1
+        a["wall"] += r["wall_s"]
+        a["cpu"] += r["cpu_s"] or 0
+        a["peak"] = max(a["peak"], r["peak_rss_mb"] or 0)
+        if r.get("items") is not None:
+            a["items"] = (a["items"] or 0) + r["items"]
+    for (script, kind, name), a in sorted(agg.items(), key=lambda kv: -kv[1]["wall"]):
+        items = "" if a["items"] is None else f"{a['items']} {a['unit'] or ''}".strip()
+        rate = "" if a["items"] is None or not a["wall"] else f"{a['items'] / a['wall']:.1f}"
+        print(f"{script}\t{kind}\t{name}\t{a['calls']}\t{a['wall']:.2f}\t{a['cpu']:.2f}\t"
+              f"{a['peak']:.1f}\t{items}\t{rate}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Summarise a CRE_RUN_LOG JSON-lines file.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("summary", help="依 stage / tool 彙整（預設最後一個 run）")
+    s.add_argument("log")
+    s.add_argument("--run_id")
+    args = p.parse_args(argv)
+    summary(args.log, args.run_id)
+
+
+if __name__ == "__main__":
+    main()
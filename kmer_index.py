@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+kmer_index.py
+=============
+全部 promoter 的 k-mer 倒排索引：IUPAC consensus 即時查詢
+
+● 每個無 N 的 k-mer 以 2-bit 編成整數（4^k 個 bucket），
+  postings 為正股起點（依 k-mer、位置排序，CSR offsets）
+● 查詢：
+    - 去掉 STREME ID 前綴（"1-GNATATNC" → GNATATNC），依 IUPAC 展開
+    - 長度 ≥ k：挑展開數最少的 k 長錨點取 postings，再以整段樣式逐位驗證
+    - 長度 < k：樣式補成 k 長前綴，對應連續的 bucket 區間；
+      另外逐一驗證「k 長視窗含 N」的起點（promoter 尾端 k−1 bp、N 附近）
+    - 反股以樣式的 IUPAC 反向互補查正股（回文樣式只回報 +）
+● build 可吃全基因體 promoter（GFF + 基因體）或任一 *_DEG_promoter_*.fa；
+  query --subset 可把結果限制在某個 FASTA 的基因
+
+位置為 promoter 序列內 0-based 起點（同 motif_scan.py）；
+strand = "-" 時為反向互補 match 在正股上的起點。
+"""
+
+from pathlib import Path
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+
+from promoter_seq import (N_CODE, PromoterSet, genome_promoters, load_promoters,
+                          read_fasta, gene_id)
+
+IUPAC = {
+    "A": "A", "C": "C", "G": "G", "T": "T", "U": "T",
+    "R": "AG", "Y": "CT", "S": "CG", "W": "AT", "K": "GT", "M": "AC",
+    "B": "CGT", "D": "AGT", "H": "ACT", "V": "ACG", "N": "ACGT",
+}
+IUPAC_RC = dict(zip("ACGTURYSWKMBDHVN", "TGCAAYRSWMKVHDBN"))
+_STREME_ID = re.compile(r"^\d+-([A-Za-z]+)$")
+
+
+def clean_consensus(text: str) -> str:
+    """STREME motif ID（如 1-GNATATNC）→ 純 IUPAC 字串"""
+    text = text.strip()
+    m = _STREME_ID.match(text)
+    pat = (m.group(1) if m else text).upper()
+    bad = set(pat) - set(IUPAC)
+    if bad or not pat:
+        raise ValueError(f"非 IUPAC 字元：{text}")
+    return pat
+
+
+def rc_consensus(pat: str) -> str:
+    return "".join(IUPAC_RC[c] for c in reversed(pat))
+
+
+def _masks(pat: str) -> np.ndarray:
+    """(L, 5) bool：第 j 位允許的鹼基（N_CODE 永不允許）"""
+    out = np.zeros((len(pat), N_CODE + 1), dtype=bool)
+    for j, c in enumerate(pat):
+        for b in IUPAC[c]:
+            out[j, "ACGT".index(b)] = True
+    return out
+
+
+def _expand_codes(pat: str) -> np.ndarray:
+    """IUPAC 樣式 → 所有具體序列的 2-bit 整數編碼"""
+    codes = np.zeros(1, dtype=np.int64)
+    for c in pat:
+        bases = np.array(["ACGT".index(b) for b in IUPAC[c]], dtype=np.int64)
+        codes = (codes[:, None] * 4 + bases[None, :]).ravel()
+    return codes
+
+
+class KmerIndex:
+    def __init__(self, pset: PromoterSet, k: int, offsets: np.ndarray,
+                 postings: np.ndarray, tail: np.ndarray):
+        self.pset, self.k = pset, k
+        self.offsets = offsets        # (4^k + 1,) CSR
+        self.postings = postings      # 串接座標
+        self.tail = tail              # k 長視窗含 N 的非 N 起點（短樣式用）
+
+    # ---------- 建立 ----------
+    @classmethod
+    def build(cls, pset: PromoterSet, k: int = 8) -> "KmerIndex":
+        if not 1 <= k <= 15:
+            raise ValueError("k 必須介於 1–15")
+        codes = pset.codes
+        n_win = max(len(codes) - k + 1, 0)
+        kmer = np.zeros(n_win, dtype=np.int64)
+        bad = np.zeros(n_win, dtype=bool)
+        for j in range(k):
+            c = codes[j: j + n_win]
+            kmer = kmer * 4 + np.minimum(c, 3)
+            bad |= c == N_CODE
+        pos = np.flatnonzero(~bad)
+        kmer = kmer[pos]
+        order = np.argsort(kmer, kind="stable")           # 同 bucket 內位置遞增
+        dtype = np.int32 if len(codes) < 2**31 else np.int64
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(kmer, minlength=4**k))])
+        irregular = np.ones(len(codes), dtype=bool)
+        irregular[pos] = False
+        tail = np.flatnonzero(irregular & (codes != N_CODE))
+        return cls(pset, k, offsets.astype(np.int64), pos[order].astype(dtype),
+                   tail.astype(dtype))
+
+    # ---------- 查詢 ----------
+    def _candidates(self, pat: str) -> np.ndarray:
+        """回傳可能的正股起點（尚未驗證整段樣式）"""
+        k, L = self.k, len(pat)
+        if L < k:
+            lo = _expand_codes(pat) << (2 * (k - L))
+            hi = lo + (1 << (2 * (k - L)))
+            parts = [self.postings[self.offsets[a]: self.offsets[b]]
+                     for a, b in zip(lo.tolist(), hi.tolist())]
+            return np.concatenate(parts + [self.tail]).astype(np.int64)
+        deg = [len(IUPAC[c]) for c in pat]
+        sizes = [np.prod(deg[i: i + k], dtype=np.float64) for i in range(L - k + 1)]
+        anchor = int(np.argmin(sizes))
+        buckets = _expand_codes(pat[anchor: anchor + k])
+        parts = [self.postings[self.offsets[b]: self.offsets[b + 1]] for b in buckets.tolist()]
+        cand = np.concatenate(parts) if parts else np.empty(0, np.int64)
+        return cand.astype(np.int64) - anchor
+
+    def _match(self, pat: str) -> np.ndarray:
+        cand = self._candidates(pat)
+        cand = cand[(cand >= 0) & (cand + len(pat) <= len(self.pset.codes))]
+        ok = np.ones(len(cand), dtype=bool)
+        for j, mask in enumerate(_masks(pat)):
+            ok &= mask[self.pset.codes[cand + j]]
+        return np.sort(cand[ok])
+
+    def query(self, consensus: str, genes=None):
+        """回傳 [(gene, 位置, strand)]；genes 為可選的基因集合限制"""
+        pat = clean_consensus(consensus)
+        rc = rc_consensus(pat)
+        strands = [("+", pat)] + ([("-", rc)] if rc != pat else [])
+        out = []
+        for strand, p in strands:
+            pos = self._match(p)
+            idx, local = self.pset.locate(pos)
+            for g, x in zip(idx.tolist(), local.tolist()):
+                gid = self.pset.ids[g]
+                if genes is None or gid in genes:
+                    out.append((gid, x, strand))
+        out.sort()
+        return out
+
+    def genes_with(self, consensus: str, genes=None):
+        return sorted({g for g, _, _ in self.query(consensus, genes)})
+
+    # ---------- 二進位 ----------
+    def save(self, path):
+        """索引與 promoter 集合存成同一個 .npz（不壓縮，載入較快）"""
+        ps = self.pset
+        np.savez(path, k=np.int64(self.k), offsets=self.offsets, postings=self.postings,
+                 tail=self.tail, ids=np.array(ps.ids, dtype=str), codes=ps.codes,
+                 starts=ps.starts, lengths=ps.lengths)
+        return path
+
+    @classmethod
+    def load(cls, path) -> "KmerIndex":
+        z = np.load(path, allow_pickle=False)
+        pset = PromoterSet(z["ids"].tolist(), z["codes"], z["starts"], z["lengths"])
+        return cls(pset, int(z["k"]), z["offsets"], z["postings"], z["tail"])
+
+
+# ────── 工具 ──────
+def fasta_gene_ids(path) -> set:
+    """只讀 header，取得 FASTA 中的基因 ID"""
+    with open(path) as fh:
+        return {gene_id(ln[1:].rstrip("\n")) for ln in fh if ln.startswith(">")}
+
+
+def read_consensus_list(args):
+    items = list(args.consensus)
+    if args.motif_tsv:
+        with open(args.motif_tsv) as fh:
+            cols = next(fh).rstrip("\n").split("\t")
+            col = cols.index("motif_id") if "motif_id" in cols else 0
+            items += [ln.rstrip("\n").split("\t")[col] for ln in fh if ln.strip()]
+    return list(dict.fromkeys(items))
+
+
+# ────── CLI ──────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Inverted k-mer index over promoters.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    b = sub.add_parser("build", help="建立索引")
+    b.add_argument("--promoters", nargs="*", default=[],
+                   help="promoter FASTA（可多個）或 promoter_seq .npz")
+    b.add_argument("--gff_path", help="與 --fasta_path 一起使用：全基因體 promoter")
+    b.add_argument("--fasta_path", help="Reference genome FASTA")
+    b.add_argument("--up_bp", type=int, default=1000)
+    b.add_argument("-k", type=int, default=8)
+    b.add_argument("--index", default="promoter_kmer_index.npz")
+
+    q = sub.add_parser("query", help="查詢 IUPAC consensus")
+    q.add_argument("consensus", nargs="*", help="如 GNATATNC 或 1-GNATATNC")
+    q.add_argument("--motif_tsv", help="cre_integrate 的 kept_motif_ids.tsv（取 motif_id 欄）")
+    q.add_argument("--index", default="promoter_kmer_index.npz")
+    q.add_argument("--subset", nargs="*", default=[],
+                   help="只回報這些 FASTA（如 *_DEG_promoter_1kb.fa）中的基因")
+    q.add_argument("--genes_only", action="store_true", help="每個 consensus 只列基因")
+    args = p.parse_args(argv)
+
+    if args.cmd == "build":
+        t0 = time.perf_counter()
+        if args.gff_path and args.fasta_path:
+            pset = PromoterSet.from_records(
+                genome_promoters(args.gff_path, args.fasta_path, args.up_bp))
+        elif len(args.promoters) == 1 and Path(args.promoters[0]).suffix == ".npz":
+            pset = load_promoters(args.promoters[0])
+        elif args.promoters:
+            pset = PromoterSet.from_records(rec for f in args.promoters
+                                            for rec in read_fasta(f))
+        else:
+            sys.exit("❌ 需要 --promoters 或 --gff_path + --fasta_path")
+        idx = KmerIndex.build(pset, args.k)
+        idx.save(args.index)
+        sys.stderr.write(f"[DONE] {len(pset)} promoters, {len(idx.postings):,} {args.k}-mers "
+                         f"→ {args.index}（{time.perf_counter() - t0:.1f}s）\n")
+        return
+
+    patterns = read_consensus_list(args)
+    if not patterns:
+        sys.exit("❌ 沒有要查詢的 consensus")
+    idx = KmerIndex.load(args.index)
+    genes = set().union(*map(fasta_gene_ids, args.subset)) if args.subset else None
+
+    out = sys.stdout
+    out.write("consensus\tgene\n" if args.genes_only
+              else "consensus\tgene\tposition\tstrand\n")
+    for text in patterns:
+        t0 = time.perf_counter()
+        try:
+            hits = idx.query(text, genes)
+        except ValueError as e:
+            sys.stderr.write(f"[WARN] {e}\n")
+            continue
+        if args.genes_only:
+            for g in sorted({h[0] for h in hits}):
+                out.write(f"{text}\t{g}\n")
+        else:
+            for g, x, s in hits:
+                out.write(f"{text}\t{g}\t{x}\t{s}\n")
+        n_genes = len({h[0] for h in hits})
+        sys.stderr.write(f"[INFO] {text}: {len(hits)} sites / {n_genes} genes "
+                         f"({(time.perf_counter() - t0) * 1000:.1f} ms)\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+motif_cluster.py
+================
+Tomtom edge 表的串流讀取與 union-find 分群（cre_integrate / cross-species 共用）
+
+● tomtom.tsv 以 pandas 分塊讀取，只取 Query_ID / Target_ID / q-value 三欄
+● motif ID 對應成整數，edge 以 NumPy 陣列保存（同一份表可套用多個閾值）
+● 連通元件以陣列式 union-find 求得（最小 label 掛接 + path compression）
+● 代表 motif 規則與原本相同：E-value 最小者，同分取字典序最小
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+EDGE_COLUMNS = ["Query_ID", "Target_ID", "q-value"]
+
+
+class EdgeTable:
+    """整數編碼的 motif edge 表"""
+
+    def __init__(self):
+        self.ids = []                 # 整數 → motif ID
+        self.index = {}               # motif ID → 整數
+        self._src, self._dst, self._qval = [], [], []
+
+    # ---------- 讀取 ----------
+    def _encode(self, col) -> np.ndarray:
+        import pandas as pd
+        for mid in pd.unique(col):
+            if mid not in self.index:
+                self.index[mid] = len(self.ids)
+                self.ids.append(mid)
+        return col.map(self.index).to_numpy(np.int64)
+
+    def add_tsv(self, tsv: str, q_prefix: str = "", t_prefix: str = "",
+                chunksize: int = 1_000_000):
+        """分塊讀取 tomtom.tsv；prefix 用於跨物種時替 ID 加上物種名稱"""
+        import pandas as pd
+        reader = pd.read_csv(tsv, sep="\t", comment="#", usecols=EDGE_COLUMNS,
+                             dtype={"Query_ID": str, "Target_ID": str,
+                                    "q-value": np.float64},
+                             chunksize=chunksize)
+        for chunk in reader:
+            chunk = chunk.dropna(subset=["Query_ID", "Target_ID"])
+            self.add_pairs(q_prefix + chunk["Query_ID"], t_prefix + chunk["Target_ID"],
+                           chunk["q-value"])
+        return self
+
+    def add_pairs(self, query, target, qval):
+        """直接加入 edge（三個等長序列：query ID、target ID、q-value）"""
+        import pandas as pd
+        q = pd.Series(query, dtype=object).reset_index(drop=True)
+        t = pd.Series(target, dtype=object).reset_index(drop=True)
+        keep = (q != t).to_numpy()               # 略過自身比對
+        self._src.append(self._encode(q[keep]))
+        self._dst.append(self._encode(t[keep]))
+        self._qval.append(np.asarray(qval, dtype=np.float64)[keep])
+        return self
+
+    def _arrays(self):
+        if len(self._src) != 1:
+            cat = lambda xs, dt: np.concatenate(xs) if xs else np.empty(0, dt)
+            self._src = [cat(self._src, np.int64)]
+            self._dst = [cat(self._dst, np.int64)]
+            self._qval = [cat(self._qval, np.float64)]
+        return self._src[0], self._dst[0], self._qval[0]
+
+    def count(self, thresh: float = float("inf")) -> int:
+        """q-value ≤ thresh 的 edge 數"""
+        return int((self._arrays()[2] <= thresh).sum())
+
+    # ---------- 分群 ----------
+    def components(self, thresh: float = float("inf")):
+        """回傳 (有 edge 的節點, 其元件 label)"""
+        src, dst, qval = self._arrays()
+        keep = qval <= thresh
+        src, dst = src[keep], dst[keep]
+
+        parent = np.arange(len(self.ids))
+        while True:
+            ps, pt = parent[src], parent[dst]
+            lo, hi = np.minimum(ps, pt), np.maximum(ps, pt)
+            diff = lo != hi
+            if not diff.any():
+                break
+            np.minimum.at(parent, hi[diff], lo[diff])     # 根節點掛到較小 label
+            while True:                                   # path compression
+                nxt = parent[parent]
+                if np.array_equal(nxt, parent):
+                    break
+                parent = nxt
+
+        nodes = np.unique(np.concatenate([src, dst]))
+        return nodes, parent[nodes]
+
+    def clusters(self, evals: dict, thresh: float = float("inf")):
+        """回傳 rep_to_dups {rep: [其餘 motif]}，依 (E-value, ID) 排序"""
+        nodes, labels = self.components(thresh)
+        comps = defaultdict(list)
+        for node, lab in zip(nodes.tolist(), labels.tolist()):
+            comps[lab].append(self.ids[node])
+
+        rep_to_dups = {}
+        for comp in comps.values():
+            comp.sort(key=lambda m: (evals.get(m, float("inf")), m))
+            rep_to_dups[comp[0]] = comp[1:]
+        return rep_to_dups
+
+
+def read_edges(tsv: str, chunksize: int = 1_000_000) -> EdgeTable:
+    return EdgeTable().add_tsv(tsv, chunksize=chunksize)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+motif_compare.py
+================
+Tomtom motif 兩兩比對：以 PWM 內容雜湊為 key 的持久快取
+
+● 每個 motif 依 PWM 數值計算 SHA-1（Motif.hash），改名不影響快取
+● 只對「尚未比對過的 motif」執行 Tomtom：new vs 全部，加上 old vs new，
+  舊 pair 直接取快取（成本約 new × 全部 + old × new，而非全部 × 全部）；
+  每個 query 因此對目前每個 target 都有一列（雙向皆比對，與完整執行相同）
+● 快取只保留目前集合中的 motif：離開集合的雜湊連同其 pair 一併移除，
+  之後若再出現則視為新 motif 重新比對
+● 由快取組出與 tomtom.tsv 相同欄位的 edge 表，可直接交給 graph_dedupe()
+● 分片模式：query 切成 N 份，各自對「完整 target」執行 Tomtom（有上限的平行），
+  再合併成一份 edge 表；pool= 可傳入共用的 executor（多資料集同時執行時）
+
+E-value / q-value 不取 Tomtom 輸出，而是依本次 target 數量由 p-value 重算：
+  E = p × n_targets；q = 每個 query 對全部 target 的 Benjamini–Hochberg。
+只保留 p ≤ p_cutoff 的 pair；只要 p_cutoff ≥ q-value 閾值，
+q ≤ 閾值的 edge 與（同樣這些 p-value）保留全部 pair 時相同。
+分片時每份都對同一個完整 target 檔比對，資料庫大小固定，p-value 與 E-value
+與單次執行相同；q-value 為上述逐 query BH，可能與 Tomtom 自己輸出的 q-value
+略有差異（Tomtom 依單次執行的整體 p-value 分佈估計）。
+
+注意：Tomtom 以 target 資料庫的欄位建立 p-value 虛無分佈，快取中舊 pair 的
+p-value 來自當時的 target 集合（old vs new 則是對「只含 new」的資料庫），
+與單次完整比對的 p-value 會有些微差異，邊界上的 edge 可能不同。
+需與單次完整比對完全一致時刪除快取檔即可。
+"""
+
+import sqlite3, subprocess, sys
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from instrument import run_tool
+from motif_set import MotifSet
+
+TOMTOM_COLUMNS = ["Query_ID", "Target_ID", "Optimal_offset", "p-value",
+                  "E-value", "q-value", "Overlap", "Query_consensus",
+                  "Target_consensus", "Orientation"]
+
+
+# ╭────────────────────── 共用工具 ───────────────────────╮
+def run(cmd, **kw):
+    try:
+        return run_tool(cmd, check=True, text=True, capture_output=True, **kw)
+    except subprocess.CalledProcessError as e:
+        sys.stderr.write(f"\n❌ 指令失敗：{' '.join(cmd)}\n{e.stderr}\n")
+        sys.exit(1)
+
+
+def bh_qvalues(pvals, m: int):
+    """Benjamini–Hochberg；m 為總檢定數（未快取的 p-value 皆 > p_cutoff）"""
+    order = sorted(range(len(pvals)), key=pvals.__getitem__)
+    q, running = [1.0] * len(pvals), 1.0
+    for rank in range(len(order), 0, -1):
+        i = order[rank - 1]
+        running = min(running, pvals[i] * m / rank)
+        q[i] = min(running, 1.0)
+    return q
+
+
+# ╭────────────────────── Tomtom 執行 ───────────────────────╮
+def tomtom_rows(query: str, target: str, p_cutoff: float,
+                n_targets: int, dist: str = "pearson"):
+    """執行 Tomtom（純文字輸出），回傳 p ≤ p_cutoff 的 pair"""
+    # E = p × n_targets → 以 E-value 閾值等價於 p ≤ p_cutoff
+    e_thr = p_cutoff * n_targets
+    out = run(["tomtom", "--text", "--evalue", "--thresh", str(e_thr),
+               "--dist", dist, query, target]).stdout
+
+    rows = []
+    for ln in out.splitlines():
+        if ln.startswith('#') or ln.startswith('Query_ID') or not ln.strip():
+            continue
+        q, t, off, p, _e, _q, ovl, qc, tc, ori = ln.rstrip("\n").split("\t")[:10]
+        rows.append((q, t, int(off), float(p), int(ovl), qc, tc, ori))
+    return rows
+
+
+def tomtom_rows_sharded(query: MotifSet, target: str, n_targets: int,
+                        work_dir: str, p_cutoff: float,
+                        n_shards: int = 1, n_jobs: int = 1,
+                        dist: str = "pearson", pool=None):
+    """query 切成 n_shards 份，最多 n_jobs 個 Tomtom 同時對完整 target 比對；
+    pool 不為 None 時改用該共用 executor（平行數由 pool 決定）"""
+    work = Path(work_dir)
+    work.mkdir(parents=True, exist_ok=True)
+    ids = query.ids()
+    n_shards = max(1, min(n_shards, len(ids)))
+    shards = [str(query.write_meme(work / f"query_shard_{k:03d}.meme",
+                                   ids[k::n_shards]))
+              for k in range(n_shards)]
+
+    one = lambda q: tomtom_rows(q, target, p_cutoff, n_targets, dist)
+    if pool is not None:
+        return [row for part in pool.map(one, shards) for row in part]
+    with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as own:
+        return [row for part in own.map(one, shards) for row in part]
+
+
+def score_rows(rows, n_targets: int, thresh: float):
+    """依固定 target 數重算 E / q-value，回傳 q ≤ thresh 的 edge"""
+    by_query = defaultdict(list)
+    for row in rows:
+        by_query[row[0]].append(row)
+
+    edges = []
+    for grp in by_query.values():
+        qvals = bh_qvalues([r[3] for r in grp], n_targets)
+        for (q, t, off, p, ovl, qc, tc, ori), qv in zip(grp, qvals):
+            if qv <= thresh:
+                edges.append((q, t, off, p, p * n_targets, qv, ovl, qc, tc, ori))
+    return edges
+
+
+def run_tomtom_sharded(motifs: MotifSet, meme_file: str, work_dir: str,
+                       thresh: float, n_shards: int, n_jobs: int,
+                       dist: str = "pearson", pool=None) -> str:
+    """分片版 Tomtom 自比對（meme_file vs meme_file），回傳 tomtom.tsv 相容路徑"""
+    rows = tomtom_rows_sharded(motifs, meme_file, len(motifs),
+                               work_dir, thresh, n_shards, n_jobs, dist, pool)
+    print(f"✔ Tomtom 分片比對：{len(motifs)} 個 motif，{n_shards} 份 / {n_jobs} 平行")
+    return write_edges_tsv(score_rows(rows, len(motifs), thresh),
+                           f"{work_dir}/tomtom.tsv")
+
+
+# ╭────────────────────── 快取 ───────────────────────╮
+def open_cache(db_path: str, p_cutoff: float, dist: str = "pearson"):
+    """開啟（或建立）快取；比對設定改變時清空重建"""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS meta     (key TEXT PRIMARY KEY, value TEXT);
+        CREATE TABLE IF NOT EXISTS compared (hash TEXT PRIMARY KEY);
+        CREATE TABLE IF NOT EXISTS pairs (
+            query TEXT, target TEXT, offset INTEGER, pvalue REAL,
+            overlap INTEGER, query_cons TEXT, target_cons TEXT, orientation TEXT,
+            PRIMARY KEY (query, target));
+    """)
+    settings = {"dist": dist, "p_cutoff": repr(float(p_cutoff))}
+    stored = dict(conn.execute("SELECT key, value FROM meta"))
+    if stored and stored != settings:
+        print(f"⚠️  快取設定不同 ({stored} → {settings})，清空 {db_path}")
+        conn.executescript("DELETE FROM compared; DELETE FROM pairs; DELETE FROM meta;")
+    conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", settings.items())
+    conn.commit()
+    return conn
+
+
+def update_cache(conn, hashed: MotifSet, work_dir: str,
+                 p_cutoff: float, dist: str = "pearson",
+                 n_shards: int = 1, n_jobs: int = 1, pool=None) -> int:
+    """對尚未比對的 motif 執行 new vs 全部、old vs new 的 Tomtom，回傳新 motif 數
+
+    hashed：以 PWM 雜湊為 ID 的 motif 集合（每個雜湊一個）
+    比對後 compared 中任兩個雜湊的兩個方向都已比對過（p ≤ p_cutoff 者存於 pairs）
+    """
+    done = {h for (h,) in conn.execute("SELECT hash FROM compared")}
+    gone = [(h,) for h in done if h not in hashed]
+    if gone:                                   # 沒有 PWM 可補比對 → 移出快取
+        conn.executemany("DELETE FROM compared WHERE hash = ?", gone)
+        conn.executemany("DELETE FROM pairs WHERE query = ?", gone)
+        conn.executemany("DELETE FROM pairs WHERE target = ?", gone)
+        conn.commit()
+    new = hashed.filter(lambda m: m.id not in done)
+    old = hashed.filter(lambda m: m.id in done)
+    if not len(new):
+        return 0
+
+    work = Path(work_dir)
+    target = work / "target.meme"
+    target.parent.mkdir(parents=True, exist_ok=True)
+    hashed.write_meme(target)
+    rows = tomtom_rows_sharded(new, str(target), len(hashed),
+                               work_dir, p_cutoff, n_shards, n_jobs, dist, pool)
+    if len(old):
+        new_target = work / "new_target.meme"
+        new.write_meme(new_target)
+        rows += tomtom_rows_sharded(old, str(new_target), len(new),
+                                    str(work / "old_vs_new"), p_cutoff,
+                                    n_shards, n_jobs, dist, pool)
+    conn.executemany("INSERT OR REPLACE INTO pairs VALUES (?,?,?,?,?,?,?,?)", rows)
+    conn.executemany("INSERT OR IGNORE INTO compared VALUES (?)",
+                     ((h,) for h in new.ids()))
+    conn.commit()
+    return len(new)
+
+
+def cached_edges(conn, id2hash: dict, thresh: float):
+    """由快取組出目前 motif 集合的 edge（q ≤ thresh），ID 展開為原始 motif ID"""
+    hash2ids = defaultdict(list)
+    for mid, h in id2hash.items():
+        hash2ids[h].append(mid)
+    rows = [r for r in conn.execute("SELECT * FROM pairs")
+            if r[0] in hash2ids and r[1] in hash2ids]
+
+    edges = []
+    for hq, ht, *rest in score_rows(rows, len(hash2ids), thresh):
+        for qi in hash2ids[hq]:
+            for ti in hash2ids[ht]:
+                edges.append((qi, ti, *rest))
+    return edges
+
+
+def write_edges_tsv(edges, tsv_path: str) -> str:
+    """以 tomtom.tsv 欄位格式輸出 edge 表"""
+    Path(tsv_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(tsv_path, "w") as fh:
+        fh.write("\t".join(TOMTOM_COLUMNS) + "\n")
+        for qi, ti, off, p, e, qv, ovl, qc, tc, ori in edges:
+            fh.write(f"{qi}\t{ti}\t{off}\t{p:.3g}\t{e:.3g}\t{qv:.3g}\t"
+                     f"{ovl}\t{qc}\t{tc}\t{ori}\n")
+    return tsv_path
+
+
+def run_tomtom_cached(motifs: MotifSet, db_path: str, work_dir: str,
+                      thresh: float, p_cutoff: float,
+                      dist: str = "pearson",
+                      n_shards: int = 1, n_jobs: int = 1, pool=None) -> str:
+    """快取版 Tomtom 自比對：只算新 motif，回傳 tomtom.tsv 相容路徑"""
+    if p_cutoff < thresh:
+        sys.exit(f"❌ 快取 p_cutoff ({p_cutoff}) 必須 ≥ q-value 閾值 ({thresh})")
+    id2hash = {m.id: m.hash for m in motifs}
+    hashed = MotifSet(list(motifs.header))
+    for m in motifs:
+        if id2hash[m.id] not in hashed:
+            hashed.add(m.renamed(id2hash[m.id], alt=""))
+
+    conn = open_cache(db_path, p_cutoff, dist)
+    try:
+        n_new = update_cache(conn, hashed, work_dir, p_cutoff,
+                             dist, n_shards, n_jobs, pool)
+        print(f"✔ Tomtom 快取：{len(hashed)} 個 motif，新比對 {n_new} 個")
+        edges = cached_edges(conn, id2hash, thresh)
+    finally:
+        conn.close()
+    return write_edges_tsv(edges, f"{work_dir}/tomtom.tsv")
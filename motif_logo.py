@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+motif_logo.py
+=============
+Motif logo 平行繪製（Agg backend worker processes）＋ 內容快取
+
+● 每張圖的 key = PWM 雜湊 + 標題 + 樣式（figsize / dpi / 色盤 / 格式）
+● 輸出資料夾內的 .logo_manifest.json 記錄 檔名 → key
+   - 同檔名 key 相同且檔案存在 → 略過
+   - 其他檔名已有相同 key 的圖 → 直接複製，不重畫
+● 其餘交給 ProcessPoolExecutor，各 worker 只在子行程內載入 matplotlib / logomaker
+  （pool= 可傳入共用的 process pool，例如以 new_logo_pool() 建立）
+"""
+
+import hashlib, json, multiprocessing, os, shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from motif_set import ALPHABET, Motif
+
+MANIFEST = ".logo_manifest.json"
+
+
+def meme_info_matrix(pwm_df, nsites):
+    entropy = -(pwm_df * np.log2(pwm_df.clip(lower=1e-9))).sum(axis=1)
+    e_n = 3 / (2 * np.log(2) * nsites)
+    return pwm_df.mul(2.0 - (entropy + e_n), axis=0).clip(lower=0)
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+def draw_logo(pwm, nsites, title, save_path, figsize, dpi, color_scheme):
+    """繪製單一 logo（於 worker 內呼叫）"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import logomaker as lm
+
+    import pandas as pd
+    info_mat = meme_info_matrix(pd.DataFrame(pwm, columns=list(ALPHABET)), nsites)
+    fig, ax = plt.subplots(figsize=figsize)
+    lm.Logo(info_mat, ax=ax, color_scheme=color_scheme)
+    ax.set_title(title, fontsize=9)
+    ax.set_xticks([]); ax.set_yticks([])
+    plt.tight_layout()
+    fig.savefig(save_path, dpi=dpi, bbox_inches='tight')
+    plt.close(fig)
+    return save_path
+
+
+def new_logo_pool(n_jobs=None) -> ProcessPoolExecutor:
+    """可跨多次 render_logos 共用的繪圖 process pool
+    （可能在多 thread 下才啟動 worker，能用 forkserver 時避免直接 fork）"""
+    ctx = (multiprocessing.get_context("forkserver")
+           if "forkserver" in multiprocessing.get_all_start_methods() else None)
+    return ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1,
+                               mp_context=ctx, initializer=_init_worker)
+
+
+def logo_key(motif: Motif, title: str, style: dict, ext: str) -> str:
+    payload = json.dumps([motif.hash, motif.nsites, title, style, ext],
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def render_logos(jobs, out_dir: str, figsize=(4, 1.5), dpi=200,
+                 color_scheme="classic", formats=("png",), n_jobs=None, pool=None):
+    """
+    jobs：[(motif, title, stem)]，輸出 <out_dir>/<stem>.<ext>
+    回傳 (重畫張數, 快取略過張數)
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    man_path = out / MANIFEST
+    manifest = json.loads(man_path.read_text()) if man_path.is_file() else {}
+    style = {"figsize": list(figsize), "dpi": dpi, "color_scheme": color_scheme}
+
+    by_key = {k: name for name, k in manifest.items() if (out / name).is_file()}
+    todo, pending, copies, n_cached = [], set(), [], 0
+    for motif, title, stem in jobs:
+        for ext in formats:
+            name = f"{stem}.{ext}"
+            key = logo_key(motif, title, style, ext)
+            if manifest.get(name) == key and (out / name).is_file():
+                n_cached += 1
+            elif key in pending:                 # 本次才繪製 → 畫完再複製
+                copies.append((by_key[key], name))
+                n_cached += 1
+            elif key in by_key:
+                shutil.copyfile(out / by_key[key], out / name)
+                n_cached += 1
+            else:
+                todo.append((motif.pwm, motif.nsites, title, str(out / name),
+                             tuple(figsize), dpi, color_scheme))
+                by_key[key] = name
+                pending.add(key)
+            manifest[name] = key
+
+    if todo and pool is not None:
+        list(pool.map(draw_logo, *zip(*todo), chunksize=8))
+    elif todo:
+        workers = min(len(todo), n_jobs or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_worker) as pool:
+            list(pool.map(draw_logo, *zip(*todo), chunksize=8))
+    for src, dst in copies:
+        shutil.copyfile(out / src, out / dst)
+
+    man_path.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    return len(todo), n_cached
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+motif_scan.py
+=============
+以 NumPy 向量化掃描全部 promoter，輸出 gene × motif 的稀疏 hit 矩陣
+
+● PWM → log-odds（log2，背景模型 + pseudocount，同 FIMO：
+    f = (p × nsites + pseudo × bg) / (nsites + pseudo)）
+● 每個 motif 的分數閾值由 p-value 換算：
+    log-odds 乘 SCORE_SCALE 取整，以動態規劃求背景下的精確分數分佈
+● 掃描：promoter 串接成一條 2-bit 編碼陣列（promoter_seq.PromoterSet），
+    相鄰兩欄合併成 25 格查表，每個 motif 約 w/2 次查表相加即算完整個區塊
+    所有視窗；正反兩股皆掃
+● 輸出（.npz，HitMatrix）：每個有 hit 的 (gene, motif) 記錄
+    count / best_score，以及所有 hit 的位置、股別、分數（CSR 索引）
+
+位置為 promoter 序列內 0-based 起點；序列方向同 extract_promoter.py
+（負股基因已反向互補，即 5'→3' 朝向 TSS）。strand = +1 表示與序列同向。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import sys
+
+import numpy as np
+
+from motif_set import read_any
+from promoter_seq import N_CODE, PromoterSet, genome_promoters, load_promoters
+
+SCORE_SCALE = 100          # 閾值計算的整數化倍率（0.01 bit）
+CHUNK = 1 << 22            # 每次掃描的視窗數
+
+
+# ╭────────────────────── 背景與 log-odds ───────────────────────╮
+def background(pset: PromoterSet, kind: str = "promoters") -> np.ndarray:
+    """ACGT 背景頻率；promoters = 由序列估計並做正反股對稱"""
+    if kind == "uniform":
+        return np.full(4, 0.25)
+    cnt = np.bincount(pset.codes, minlength=5)[:4].astype(np.float64) + 1
+    cnt = cnt + cnt[::-1]                     # A↔T、C↔G
+    return cnt / cnt.sum()
+
+
+def log_odds(pwm: np.ndarray, nsites: int, bg: np.ndarray, pseudo: float = 0.1):
+    freq = (pwm * nsites + pseudo * bg) / (nsites + pseudo)
+    return np.log2(freq / bg)
+
+
+def score_threshold(lo: np.ndarray, bg: np.ndarray, pvalue: float) -> float:
+    """背景下 P(score ≥ s) ≤ pvalue 的最小 s（log-odds 單位）"""
+    ilo = np.rint(lo * SCORE_SCALE).astype(np.int64)
+    lo_min = ilo.min(axis=1)
+    dist = np.ones(1)
+    for col, cmin in zip(ilo, lo_min):
+        span = col - cmin
+        new = np.zeros(len(dist) + span.max())
+        for b in range(4):
+            new[span[b]: span[b] + len(dist)] += dist * bg[b]
+        dist = new
+    sf = np.cumsum(dist[::-1])[::-1]          # sf[k] = P(score ≥ k + Σmin)
+    ok = np.flatnonzero(sf <= pvalue)
+    k = ok[0] if len(ok) else len(dist)
+    return (k + lo_min.sum()) / SCORE_SCALE
+
+
+# ╭────────────────────── 掃描 ───────────────────────╮
+def pair_codes(codes: np.ndarray) -> np.ndarray:
+    """相鄰兩個鹼基合併成一個 0–24 的編碼（查表次數減半）"""
+    return codes[:-1] * np.uint8(N_CODE + 1) + codes[1:]
+
+
+def _scan_matrix(codes: np.ndarray, pairs: np.ndarray, mat: np.ndarray, thresh: float):
+    """mat：(w, 5) float32（第 5 欄為 N → 極小值）；回傳 (起點, 分數)"""
+    w = mat.shape[0]
+    n_win = len(codes) - w + 1
+    # 第 j、j+1 欄合併成 25 格查表
+    tables = [(mat[j][:, None] + mat[j + 1][None, :]).ravel() for j in range(0, w - 1, 2)]
+    pos_out, score_out = [], []
+    for c0 in range(0, max(n_win, 0), CHUNK):
+        c1 = min(c0 + CHUNK, n_win)
+        s = tables[0][pairs[c0:c1]] if tables else mat[0][codes[c0:c1]]
+        for k, tab in enumerate(tables[1:], start=1):
+            s += tab[pairs[c0 + 2 * k: c1 + 2 * k]]
+        if w % 2 and tables:
+            s += mat[w - 1][codes[c0 + w - 1: c1 + w - 1]]
+        hit = np.flatnonzero(s >= thresh)
+        pos_out.append(hit + c0)
+        score_out.append(s[hit])
+    if not pos_out:
+        return np.empty(0, np.int64), np.empty(0, np.float32)
+    return np.concatenate(pos_out), np.concatenate(score_out)
+
+
+def scan_motif(pset: PromoterSet, lo: np.ndarray, thresh: float, pairs=None):
+    """正反兩股掃描，回傳 (串接座標, 股別 ±1, 分數)"""
+    pairs = pair_codes(pset.codes) if pairs is None else pairs
+    mask = np.full((lo.shape[0], 1), -1e9)
+    fwd = np.hstack([lo, mask]).astype(np.float32)
+    rev = np.hstack([lo[::-1, ::-1], mask]).astype(np.float32)   # 反向互補
+    eps = 1e-4
+    p1, s1 = _scan_matrix(pset.codes, pairs, fwd, thresh - eps)
+    p2, s2 = _scan_matrix(pset.codes, pairs, rev, thresh - eps)
+    return (np.concatenate([p1, p2]),
+            np.concatenate([np.ones(len(p1), np.int8), -np.ones(len(p2), np.int8)]),
+            np.concatenate([s1, s2]))
+
+
+# ╭────────────────────── 稀疏 hit 矩陣 ───────────────────────╮
+class HitMatrix:
+    """gene × motif 稀疏 hit 表（依 gene、motif 排序的 pair 列表 + hit CSR）"""
+
+    FIELDS = ("pair_gene", "pair_motif", "count", "best", "hit_ptr",
+              "hit_pos", "hit_strand", "hit_score")
+
+    def __init__(self, genes, motifs, thresholds, **arrays):
+        self.genes, self.motifs = list(genes), list(motifs)
+        self.thresholds = np.asarray(thresholds, dtype=np.float32)
+        for k in self.FIELDS:
+            setattr(self, k, arrays[k])
+
+    def __len__(self):
+        return len(self.pair_gene)
+
+    @classmethod
+    def build(cls, pset: PromoterSet, motif_ids, thresholds, hits):
+        """hits：每個 motif 一組 (串接座標, 股別, 分數)"""
+        g_all, m_all, p_all, st_all, sc_all = [], [], [], [], []
+        for m, (pos, strand, score) in enumerate(hits):
+            g, local = pset.locate(pos)
+            g_all.append(g); p_all.append(local)
+            m_all.append(np.full(len(pos), m, np.int64))
+            st_all.append(strand); sc_all.append(score)
+        cat = lambda xs, dt: np.concatenate(xs).astype(dt) if xs else np.empty(0, dt)
+        g, m = cat(g_all, np.int64), cat(m_all, np.int64)
+        pos, strand, score = cat(p_all, np.int32), cat(st_all, np.int8), cat(sc_all, np.float32)
+
+        order = np.lexsort((pos, m, g))
+        g, m, pos, strand, score = g[order], m[order], pos[order], strand[order], score[order]
+        key = g * max(len(motif_ids), 1) + m
+        brk = np.flatnonzero(np.diff(key)) + 1 if len(key) else np.empty(0, np.int64)
+        ptr = np.concatenate([[0], brk, [len(key)]]).astype(np.int64) if len(key) \
+            else np.zeros(1, np.int64)
+        starts = ptr[:-1]
+        return cls(pset.ids, motif_ids, thresholds,
+                   pair_gene=g[starts].astype(np.int32),
+                   pair_motif=m[starts].astype(np.int32),
+                   count=np.diff(ptr).astype(np.int32),
+                   best=(np.maximum.reduceat(score, starts) if len(starts)
+                         else np.empty(0, np.float32)),
+                   hit_ptr=ptr, hit_pos=pos, hit_strand=strand, hit_score=score)
+
+    # ---------- 查詢 ----------
+    def counts_csr(self):
+        """scipy.sparse CSR（gene × motif hit 數）"""
+        from scipy.sparse import csr_matrix
+        return csr_matrix((self.count, (self.pair_gene, self.pair_motif)),
+                          shape=(len(self.genes), len(self.motifs)))
+
+    def hits(self, k: int):
+        """第 k 個 pair 的 (位置, 股別, 分數)"""
+        a, b = self.hit_ptr[k], self.hit_ptr[k + 1]
+        return self.hit_pos[a:b], self.hit_strand[a:b], self.hit_score[a:b]
+
+    def genes_with(self, motif_id: str):
+        m = self.motifs.index(motif_id)
+        return [self.genes[g] for g in self.pair_gene[self.pair_motif == m]]
+
+    def write_tsv(self, path):
+        """每個 (gene, motif) 一列；positions 為 起點(+/-) 以逗號分隔"""
+        with open(path, "w") as fh:
+            fh.write("gene\tmotif\tcount\tbest_score\tpositions\n")
+            for k in range(len(self)):
+                pos, strand, _ = self.hits(k)
+                sites = ",".join(f"{p}{'+' if s > 0 else '-'}"
+                                 for p, s in zip(pos.tolist(), strand.tolist()))
+                fh.write(f"{self.genes[self.pair_gene[k]]}\t"
+                         f"{self.motifs[self.pair_motif[k]]}\t{self.count[k]}\t"
+                         f"{self.best[k]:.3f}\t{sites}\n")
+        return path
+
+    # ---------- 二進位 ----------
+    def save_npz(self, path):
+        np.savez_compressed(path, genes=np.array(self.genes, dtype=str),
+                            motifs=np.array(self.motifs, dtype=str),
+                            thresholds=self.thresholds,
+                            **{k: getattr(self, k) for k in self.FIELDS})
+        return path
+
+    @classmethod
+    def load_npz(cls, path) -> "HitMatrix":
+        z = np.load(path, allow_pickle=False)
+        return cls(z["genes"].tolist(), z["motifs"].tolist(), z["thresholds"],
+                   **{k: z[k] for k in cls.FIELDS})
+
+
+def scan(pset: PromoterSet, motifs, pvalue: float = 1e-4, bg_kind: str = "promoters",
+         pseudo: float = 0.1, n_jobs: int = 1) -> HitMatrix:
+    bg = background(pset, bg_kind)
+    mats = [log_odds(m.pwm, m.nsites, bg, pseudo) for m in motifs]
+    thresholds = [score_threshold(lo, bg, pvalue) for lo in mats]
+    pairs = pair_codes(pset.codes)
+    with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as pool:
+        hits = list(pool.map(lambda a: scan_motif(pset, *a, pairs),
+                             zip(mats, thresholds)))
+    return HitMatrix.build(pset, [m.id for m in motifs], thresholds, hits)
+
+
+# ╭────────────────────── CLI ───────────────────────╮
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description="Scan promoters with PWMs and write a sparse gene × motif hit matrix.")
+    p.add_argument("--motifs", default="./multi_exp_tomato/filtered.meme",
+                   help="MEME 檔或 motif_set .npz（如 cre_integrate 的 filtered.meme）")
+    p.add_argument("--promoters", nargs="*", default=[],
+                   help="promoter FASTA 或 promoter_seq .npz（可多個）")
+    p.add_argument("--gff_path", help="與 --fasta_path 一起使用：擷取全基因體 promoter")
+    p.add_argument("--fasta_path", help="Reference genome FASTA")
+    p.add_argument("--up_bp", type=int, default=1000)
+    p.add_argument("--save_promoters", help="將 promoter 集合存成 .npz 供下次使用")
+    p.add_argument("--pvalue", type=float, default=1e-4, help="每個位置的 p-value 閾值")
+    p.add_argument("--bg", choices=["promoters", "uniform"], default="promoters")
+    p.add_argument("--pseudo", type=float, default=0.1)
+    p.add_argument("--jobs", type=int, default=4)
+    p.add_argument("--out", default="motif_hits.npz")
+    p.add_argument("--tsv", help="另存每個 (gene, motif) 的摘要 TSV")
+    args = p.parse_args(argv)
+
+    if args.gff_path and args.fasta_path:
+        pset = PromoterSet.from_records(
+            genome_promoters(args.gff_path, args.fasta_path, args.up_bp))
+    elif len(args.promoters) == 1 and Path(args.promoters[0]).suffix == ".npz":
+        pset = load_promoters(args.promoters[0])
+    elif args.promoters:
+        pset = PromoterSet.from_fasta(args.promoters)
+    else:
+        sys.exit("❌ 需要 --promoters 或 --gff_path + --fasta_path")
+    if args.save_promoters:
+        pset.save_npz(args.save_promoters)
+
+    motifs = list(read_any(args.motifs))
+    if not motifs:
+        sys.exit(f"❌ {args.motifs} 中沒有 motif")
+    width = max((m.width for m in motifs), default=0)
+    sys.stderr.write(f"[INFO] {len(motifs)} motifs (w ≤ {width}) × {len(pset)} promoters "
+                     f"({len(pset.codes) - len(pset):,} bp)\n")
+
+    hm = scan(pset, motifs, args.pvalue, args.bg, args.pseudo, args.jobs)
+    hm.save_npz(args.out)
+    if args.tsv:
+        hm.write_tsv(args.tsv)
+    n_genes = len(np.unique(hm.pair_gene))
+    sys.stderr.write(f"[DONE] {int(hm.count.sum()):,} hits, {len(hm):,} gene–motif pairs, "
+                     f"{n_genes:,} genes → {args.out}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+motif_set.py
+============
+MEME motif 的結構化資料模型（cre_integrate / cross-species 共用）
+
+● Motif    ：單一 motif，PWM 為 (w, 4) NumPy 陣列，nsites / E-value / 來源實驗為欄位
+● MotifSet ：保留原檔 header 的有序 motif 集合
+● read_meme()  逐行串流解析 MEME 文字（檔案、字串或 meme2meme 的 stdout 皆可）
+● write_meme() 輸出標準 MEME 格式；save_npz()/load_npz() 為二進位保存
+
+Motif ID 一律取 MOTIF 行第一個欄位，其餘（如 STREME-1）保存在 alt。
+"""
+
+import hashlib, io, re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+ALPHABET = "ACGT"
+_ATTR_RE = re.compile(r"(\w+)\s*=\s*(\S+)")
+_ROW_RE  = re.compile(r"^\s*[0-9.]+\s")
+
+
+@dataclass
+class Motif:
+    id: str
+    pwm: np.ndarray                   # (w, 4) letter-probability
+    nsites: int = 1
+    evalue: float = float("inf")
+    alt: str = ""                     # MOTIF 行第二欄之後（如 STREME-1）
+    source: str = ""                  # 來源實驗（如 SRP123_tomato_streme_1kb）
+
+    @property
+    def width(self) -> int:
+        return self.pwm.shape[0]
+
+    @property
+    def consensus(self) -> str:
+        return "".join(ALPHABET[i] for i in self.pwm.argmax(axis=1))
+
+    @property
+    def title(self) -> str:
+        """MOTIF 行完整內容（ID + alt）"""
+        return f"{self.id} {self.alt}".strip()
+
+    @property
+    def hash(self) -> str:
+        """PWM 內容雜湊（數值四捨五入至 6 位），與 ID 無關"""
+        rows = [" ".join(f"{x:.6f}" for x in row) for row in self.pwm.tolist()]
+        return hashlib.sha1("\n".join(rows).encode()).hexdigest()
+
+    def renamed(self, new_id: str, **kw) -> "Motif":
+        return Motif(new_id, self.pwm, self.nsites, self.evalue,
+                     kw.get("alt", self.alt), kw.get("source", self.source))
+
+    def block(self) -> str:
+        attrs = f"alength= {len(ALPHABET)} w= {self.width} nsites= {self.nsites}"
+        if np.isfinite(self.evalue):
+            attrs += f" E= {self.evalue:.3e}"
+        lines = [f"MOTIF {self.title}", f"letter-probability matrix: {attrs}"]
+        lines += [" " + " ".join(f"{x:.6f}" for x in row)
+                  for row in self.pwm.tolist()]
+        return "\n".join(lines)
+
+
+@dataclass
+class MotifSet:
+    header: list = field(default_factory=list)     # MOTIF 之前的原始行
+    motifs: dict = field(default_factory=dict)     # id → Motif（保留順序）
+
+    # ---------- 容器介面 ----------
+    def __len__(self):
+        return len(self.motifs)
+
+    def __iter__(self):
+        return iter(self.motifs.values())
+
+    def __contains__(self, mid):
+        return mid in self.motifs
+
+    def __getitem__(self, mid) -> Motif:
+        return self.motifs[mid]
+
+    def add(self, motif: Motif):
+        self.motifs[motif.id] = motif
+
+    def ids(self):
+        return list(self.motifs)
+
+    def evals(self) -> dict:
+        return {m.id: m.evalue for m in self}
+
+    def subset(self, ids) -> "MotifSet":
+        return MotifSet(list(self.header), {i: self.motifs[i] for i in ids})
+
+    def filter(self, pred) -> "MotifSet":
+        return MotifSet(list(self.header),
+                        {m.id: m for m in self if pred(m)})
+
+    @classmethod
+    def merge(cls, sets) -> "MotifSet":
+        """合併多個集合；header 取第一個非空者"""
+        out = cls()
+        for s in sets:
+            if not out.header:
+                out.header = list(s.header)
+            out.motifs.update(s.motifs)
+        return out
+
+    # ---------- MEME 文字 ----------
+    @classmethod
+    def parse(cls, lines, source: str = "") -> "MotifSet":
+        """逐行解析 MEME 格式（任何可迭代的文字行）"""
+        out, cur, rows, width = cls(), None, [], 0
+
+        def flush():
+            if cur is not None:
+                cur.pwm = np.array(rows, dtype=np.float64).reshape(-1, 4)
+                out.add(cur)
+
+        for ln in lines:
+            ln = ln.rstrip("\n")
+            if ln.startswith("MOTIF "):
+                flush()
+                parts = ln.split(None, 2)
+                cur = Motif(parts[1], None, alt=" ".join(parts[2:]).strip(),
+                            source=source)
+                rows, width = [], 0
+            elif cur is None:
+                out.header.append(ln)
+            elif "letter-probability matrix" in ln:
+                attrs = dict(_ATTR_RE.findall(ln.split(":", 1)[1]))
+                width = int(attrs.get("w", 0))
+                if "nsites" in attrs:
+                    cur.nsites = int(float(attrs["nsites"]))
+                if "E" in attrs:
+                    cur.evalue = float(attrs["E"])
+            elif (not width or len(rows) < width) and _ROW_RE.match(ln):
+                rows.append([float(x) for x in ln.split()[:4]])
+        flush()
+
+        while out.header and not out.header[-1].strip():
+            out.header.pop()
+        return out
+
+    @classmethod
+    def read_meme(cls, path, source: str = "") -> "MotifSet":
+        with open(path) as fh:
+            return cls.parse(fh, source)
+
+    @classmethod
+    def from_text(cls, text: str, source: str = "") -> "MotifSet":
+        return cls.parse(io.StringIO(text), source)
+
+    def write_meme(self, path, ids=None):
+        ids = self.motifs if ids is None else ids
+        with open(path, "w") as fh:
+            fh.write("\n".join(self.header) + "\n\n")
+            for mid in ids:
+                fh.write(self.motifs[mid].block() + "\n\n")
+        return path
+
+    # ---------- 二進位 ----------
+    def save_npz(self, path):
+        ms = list(self)
+        np.savez_compressed(
+            path,
+            header=np.array("\n".join(self.header)),
+            ids=np.array([m.id for m in ms], dtype=str),
+            alts=np.array([m.alt for m in ms], dtype=str),
+            sources=np.array([m.source for m in ms], dtype=str),
+            nsites=np.array([m.nsites for m in ms], dtype=np.int64),
+            evalues=np.array([m.evalue for m in ms], dtype=np.float64),
+            widths=np.array([m.width for m in ms], dtype=np.int64),
+            pwm=(np.concatenate([m.pwm for m in ms]) if ms
+                 else np.empty((0, 4))),
+        )
+        return path
+
+    @classmethod
+    def load_npz(cls, path) -> "MotifSet":
+        z = np.load(path, allow_pickle=False)
+        header = str(z["header"])
+        out = cls(header.split("\n") if header else [])
+        bounds = np.concatenate([[0], np.cumsum(z["widths"])])
+        for k, mid in enumerate(z["ids"].tolist()):
+            out.add(Motif(mid, z["pwm"][bounds[k]:bounds[k + 1]].copy(),
+                          int(z["nsites"][k]), float(z["evalues"][k]),
+                          str(z["alts"][k]), str(z["sources"][k])))
+        return out
+
+
+def read_any(path, source: str = "") -> MotifSet:
+    """依副檔名讀取 .npz 或 MEME 文字"""
+    if Path(path).suffix == ".npz":
+        return MotifSet.load_npz(path)
+    return MotifSet.read_meme(path, source)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+pipeline_driver.py
+==================
+deg_summary → extract_DEG_and_nonDEG → extract_promoter 的單一行程版本，
+可在同一個 session 內跑多組參數
+
+● 合併後的 DEG 表（含 meta_p / meta_log2FC）只算一次；
+  同一組 (padj_th, fc_th) 的 DEG / Non-DEG 判定也只算一次
+● GFF 註解與基因體 FASTA（pyfaidx）只載入一次
+● 各步驟之間直接傳 DataFrame / ID 清單，不經過 TSV 存讀
+● 每組參數輸出到 <out_root>/<name>/（FASTA、params.json；--write_tables 另存中間表），
+  <out_root>/summary.tsv 彙整每組的基因數與耗時
+
+參數組：
+  --param_sets sets.json   [{"name": "sc2", "sig_count": 2}, {"sig_count": 3, "up_bp": 2000}, ...]
+  --sweep sig_count=2,3,4 --sweep up_bp=1000,2000   （笛卡兒積）
+  --set padj_th=0.01       （覆寫所有組的預設值）
+未指定的欄位使用 deg_summary_and_get_promoter.sh 的預設值。
+"""
+
+from itertools import product
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+from deg_summary import merge_tables, call_deg
+from extract_DEG_and_nonDEG import filter_lists
+from extract_promoter import load_gene_table, sample_negatives, write_promoters
+
+DEFAULTS = {
+    "padj_th": 0.05, "fc_th": 1.0,                               # Step-1
+    "sig_count": 3, "deg_fc_th": 1.0, "non_p_th": 0.1, "non_fc_th": 0.1,   # Step-2
+    "up_bp": 1000, "neg_multiplier": 3, "neg_min": 1000, "seed": 42,       # Step-3
+}
+INT_KEYS = {"sig_count", "up_bp", "neg_multiplier", "neg_min", "seed"}
+
+
+def coerce(key: str, value):
+    if key not in DEFAULTS:
+        sys.exit(f"❌ 未知參數：{key}（可用：{', '.join(DEFAULTS)}）")
+    if value is None:
+        return None
+    return int(value) if key in INT_KEYS else float(value)
+
+
+class PipelineSession:
+    """保存合併 DEG 表、註解與基因體，供多組參數重複使用"""
+
+    def __init__(self, input_dir, gff_path, fasta_path, prefix="tomato"):
+        self.input_dir, self.gff_path, self.fasta_path = input_dir, gff_path, fasta_path
+        self.prefix = prefix
+        self._merged, self._calls = None, {}
+        self._anno, self._fa = None, None
+
+    @property
+    def merged(self):
+        if self._merged is None:
+            t0 = time.perf_counter()
+            self._merged = merge_tables(self.input_dir)
+            print(f"[INFO] Merged {self._merged.shape[0]:,} genes from {self.input_dir} "
+                  f"({time.perf_counter() - t0:.1f}s)")
+        return self._merged
+
+    def calls(self, padj_th, fc_th):
+        key = (padj_th, fc_th)
+        if key not in self._calls:
+            self._calls[key] = call_deg(self.merged, padj_th, fc_th)
+        return self._calls[key]
+
+    @property
+    def anno(self):
+        if self._anno is None:
+            self._anno = load_gene_table(self.gff_path)
+        return self._anno
+
+    @property
+    def fa(self):
+        if self._fa is None:
+            from pyfaidx import Fasta
+            self._fa = Fasta(self.fasta_path, sequence_always_upper=True)
+        return self._fa
+
+    def run(self, params: dict, out_dir: Path, write_tables: bool = False) -> dict:
+        t0 = time.perf_counter()
+        sp, sc, kb = self.prefix, params["sig_count"], params["up_bp"] // 1000
+        out_dir.mkdir(parents=True, exist_ok=True)
+        (out_dir / "params.json").write_text(json.dumps(params, indent=1))
+
+        deg, non = self.calls(params["padj_th"], params["fc_th"])
+        deg_f, non_f = filter_lists(deg, non, sc, params["deg_fc_th"],
+                                    params["non_p_th"], params["non_fc_th"])
+        if write_tables:
+            deg.to_csv(out_dir / f"{sp}_DEG.tsv", sep="\t", index=False)
+            non.to_csv(out_dir / f"{sp}_nonDEG.tsv", sep="\t", index=False)
+            deg_f.to_csv(out_dir / f"{sp}_DEG_filtered_sig_count_{sc}.tsv", sep="\t", index=False)
+            non_f.to_csv(out_dir / f"{sp}_nonDEG_filtered_sig_count_{sc}.tsv", sep="\t", index=False)
+
+        deg_ids = deg_f["Geneid"].dropna().astype(str).tolist()
+        non_all = non_f["Geneid"].dropna().astype(str).tolist()
+        non_ids = sample_negatives(deg_ids, non_all, params["neg_multiplier"],
+                                   params["neg_min"], params["seed"])
+
+        written = {}
+        for label, ids in (("DEG", deg_ids), ("nonDEG", non_ids)):
+            fa_path = out_dir / f"{sp}_{label}_promoter_{kb}kb_sig_count_{sc}.fa"
+            miss = out_dir / f"{sp}_{label}_sig_count_{sc}_missing_ids.txt"
+            written[label] = write_promoters(ids, label, self.anno, self.fa,
+                                             params["up_bp"], fa_path, miss) if ids else 0
+
+        return {"n_deg": len(deg_ids), "n_nondeg_pool": len(non_all),
+                "n_deg_promoters": written["DEG"], "n_nondeg_promoters": written["nonDEG"],
+                "seconds": round(time.perf_counter() - t0, 2)}
+
+
+# ────── 參數組 ──────
+def build_param_sets(args):
+    base = dict(DEFAULTS)
+    for kv in args.set:
+        k, v = kv.split("=", 1)
+        base[k] = coerce(k, v)
+
+    sets = []
+    if args.param_sets:
+        for k, raw in enumerate(json.loads(Path(args.param_sets).read_text())):
+            raw = dict(raw)
+            name = str(raw.pop("name", f"set{k + 1:02d}"))
+            sets.append((name, {**base, **{kk: coerce(kk, vv) for kk, vv in raw.items()}}))
+
+    if args.sweep:
+        axes = []
+        for spec in args.sweep:
+            k, vals = spec.split("=", 1)
+            axes.append([(k, coerce(k, v)) for v in vals.split(",")])
+        for combo in product(*axes):
+            name = "_".join(f"{k}{v:g}" for k, v in combo)
+            sets.append((name, {**base, **dict(combo)}))
+
+    if not sets:
+        sets.append(("default", base))
+    names = [n for n, _ in sets]
+    if len(set(names)) != len(names):
+        sys.exit("❌ 參數組名稱重複")
+    return sets
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description="Run DEG summary → filtering → promoter extraction in one process.")
+    p.add_argument("--input_dir", default="./tomato_deg_results",
+                   help="Folder containing per-sample *.tsv DEG tables")
+    p.add_argument("--gff_path", default="ref/S_lycopersicum/ITAG4.1_gene_models.gff")
+    p.add_argument("--fasta_path",
+                   default="ref/S_lycopersicum/S_lycopersicum_chromosomes.4.00.fa")
+    p.add_argument("--prefix", default="tomato", help="Species / file prefix")
+    p.add_argument("--param_sets", help="JSON：參數組清單")
+    p.add_argument("--sweep", action="append", default=[],
+                   help="key=v1,v2,...（可重複，取笛卡兒積）")
+    p.add_argument("--set", action="append", default=[],
+                   help="key=value：覆寫預設值")
+    p.add_argument("--out_root", default="pipeline_runs")
+    p.add_argument("--write_tables", action="store_true",
+                   help="另存 DEG / Non-DEG 中間表 (TSV)")
+    args = p.parse_args(argv)
+
+    sets = build_param_sets(args)
+    session = PipelineSession(args.input_dir, args.gff_path, args.fasta_path, args.prefix)
+    out_root = Path(args.out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+
+    rows = []
+    for name, params in sets:
+        print(f"=== [{name}] {params} ===")
+        res = session.run(params, out_root / name, args.write_tables)
+        rows.append({"name": name, **params, **res})
+
+    cols = list(rows[0])
+    with open(out_root / "summary.tsv", "w") as fh:
+        fh.write("\t".join(cols) + "\n")
+        for r in rows:
+            fh.write("\t".join(str(r[c]) for c in cols) + "\n")
+    print(f"✅ {len(rows)} parameter set(s) → {out_root}/summary.tsv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+promoter_seq.py
+===============
+Promoter 序列的 2-bit 編碼集合（motif_scan / kmer_index 共用）
+
+● 編碼：A=0 C=1 G=2 T=3，其餘字元（N 等）記為 4
+● PromoterSet：所有 promoter 串接成一條 uint8 陣列，promoter 之間以一個 N 分隔
+  （任何跨越邊界的視窗必含 N，掃描時自然排除）
+● 來源：任意 promoter FASTA（ID 取 header 第一個 "|" 前），
+  或由 GFF + 基因體直接擷取全基因體 promoter（與 extract_promoter.py 相同規則）
+● save_npz() 以 2-bit 打包（每 byte 4 個鹼基）＋ N 位置保存
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+ALPHABET = "ACGT"
+N_CODE = 4
+
+_LUT = np.full(256, N_CODE, dtype=np.uint8)
+for _i, _c in enumerate(ALPHABET):
+    _LUT[ord(_c)] = _LUT[ord(_c.lower())] = _i
+
+
+def encode(seq: str) -> np.ndarray:
+    """字串 → uint8 編碼（0–3；非 ACGT 為 4）"""
+    return _LUT[np.frombuffer(seq.encode("ascii", "replace"), dtype=np.uint8)]
+
+
+def decode(codes: np.ndarray) -> str:
+    return np.frombuffer(b"ACGTN", dtype=np.uint8)[codes].tobytes().decode()
+
+
+def read_fasta(path):
+    """逐筆讀取 FASTA，yield (header, seq)；header 不含 '>'"""
+    header, chunks = None, []
+    with open(path) as fh:
+        for ln in fh:
+            ln = ln.rstrip("\n")
+            if ln.startswith(">"):
+                if header is not None:
+                    yield header, "".join(chunks)
+                header, chunks = ln[1:], []
+            elif header is not None:
+                chunks.append(ln.strip())
+    if header is not None:
+        yield header, "".join(chunks)
+
+
+def gene_id(header: str) -> str:
+    """extract_*promoter.py 的 header 格式：<gid>|<chr>:<s>-<e>(<strand>)|..."""
+    return header.split("|", 1)[0].split()[0]
+
+
+def genome_promoters(gff_path, fasta_path, up_bp: int = 1000):
+    """依 GFF 擷取全基因體 promoter，yield (header, seq)；規則同 extract_promoter.py"""
+    from pyfaidx import Fasta
+    from extract_promoter import load_gene_table, calc_promoter, reverse_complement
+
+    anno = load_gene_table(gff_path)
+    fa = Fasta(str(fasta_path), sequence_always_upper=True)
+    chr_len = {name: len(fa[name]) for name in fa.keys()}
+    for gid, row in anno.iterrows():
+        if row.chr not in chr_len:
+            continue
+        p_start, p_end = calc_promoter(row, up_bp, chr_len[row.chr])
+        if p_end < p_start:
+            continue
+        seq = fa[row.chr][p_start - 1: p_end].seq
+        if row.strand == "-":
+            seq = reverse_complement(seq)
+        yield (f"{gid}|{row.chr}:{p_start}-{p_end}({row.strand})|"
+               f"{up_bp}bp_upstream|all"), seq
+
+
+class PromoterSet:
+    """串接的 2-bit 編碼 promoter 集合"""
+
+    def __init__(self, ids, codes: np.ndarray, starts: np.ndarray, lengths: np.ndarray):
+        self.ids = list(ids)
+        self.codes = codes            # uint8，promoter 之間以 N_CODE 分隔
+        self.starts = starts          # 每個 promoter 在 codes 中的起點
+        self.lengths = lengths
+        self.index = {g: i for i, g in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_records(cls, records) -> "PromoterSet":
+        """records：可迭代的 (header, seq)；重複 ID 只保留第一筆"""
+        ids, parts, lengths, seen = [], [], [], set()
+        sep = np.array([N_CODE], dtype=np.uint8)
+        for header, seq in records:
+            gid = gene_id(header)
+            if gid in seen:
+                continue
+            seen.add(gid)
+            ids.append(gid)
+            parts += [encode(seq), sep]
+            lengths.append(len(seq))
+        lengths = np.array(lengths, dtype=np.int64)
+        starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]]).astype(np.int64)
+        codes = np.concatenate(parts) if parts else np.empty(0, np.uint8)
+        return cls(ids, codes, starts, lengths)
+
+    @classmethod
+    def from_fasta(cls, paths) -> "PromoterSet":
+        paths = [paths] if isinstance(paths, (str, Path)) else paths
+        return cls.from_records(rec for p in paths for rec in read_fasta(p))
+
+    def seq(self, gid: str) -> str:
+        i = self.index[gid]
+        return decode(self.codes[self.starts[i]: self.starts[i] + self.lengths[i]])
+
+    def locate(self, pos: np.ndarray):
+        """串接座標 → (promoter 索引, promoter 內座標)"""
+        idx = np.searchsorted(self.starts, pos, side="right") - 1
+        return idx, pos - self.starts[idx]
+
+    # ---------- 二進位 ----------
+    def save_npz(self, path):
+        is_n = self.codes == N_CODE
+        base = np.where(is_n, 0, self.codes).astype(np.uint8)
+        pad = (-len(base)) % 4
+        base = np.concatenate([base, np.zeros(pad, np.uint8)]).reshape(-1, 4)
+        packed = (base[:, 0] << 6) | (base[:, 1] << 4) | (base[:, 2] << 2) | base[:, 3]
+        np.savez_compressed(path, ids=np.array(self.ids, dtype=str),
+                            packed=packed.astype(np.uint8), n_pos=np.flatnonzero(is_n),
+                            length=np.int64(len(self.codes)),
+                            starts=self.starts, lengths=self.lengths)
+        return path
+
+    @classmethod
+    def load_npz(cls, path) -> "PromoterSet":
+        z = np.load(path, allow_pickle=False)
+        packed = z["packed"]
+        codes = np.stack([(packed >> s) & 3 for s in (6, 4, 2, 0)], axis=1).ravel()
+        codes = codes[: int(z["length"])].astype(np.uint8)
+        codes[z["n_pos"]] = N_CODE
+        return cls(z["ids"].tolist(), codes, z["starts"], z["lengths"])
+
+
+def load_promoters(path) -> PromoterSet:
+    """依副檔名讀取 .npz 或 FASTA"""
+    if Path(path).suffix == ".npz":
+        return PromoterSet.load_npz(path)
+    return PromoterSet.from_fasta(path)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+promoter_server.py
+==================
+常駐的本機 promoter 服務：註解與基因體只載入一次，notebook / 腳本以 HTTP 批次取序列
+
+啟動：
+  python promoter_server.py \\
+      --species tomato=ref/S_lycopersicum/ITAG4.1_gene_models.gff,ref/S_lycopersicum/S_lycopersicum_chromosomes.4.00.fa \\
+      --species ara=ref/Araport/Araport11_GFF3_genes_transposons.current.gff,ref/Araport/TAIR10_chr_all.fas
+
+API（僅綁定 127.0.0.1）：
+  GET  /health                       → {"status": "ok"}
+  GET  /species                      → 各物種基因數、快取命中率
+  POST /promoters  JSON {"species", "genes": [...], "up_bp": 1000, "label": "query",
+                         "format": "fasta" | "json" | "npz"}
+       fasta：header 與 extract_promoter.py 相同；找不到的 ID 放在 X-Missing-Ids
+       json ：{"records": [[header, seq], ...], "missing": [...]}
+       npz  ：promoter_seq.PromoterSet 的 2-bit 打包格式（PromoterSet.load_npz 可直接讀）
+
+● 擷取規則沿用 extract_promoter.calc_promoter / reverse_complement
+● ThreadingHTTPServer：多個 client 同時連線；每個物種的 FASTA 讀取以 lock 保護
+● 批次：同一請求的基因依 (染色體, 位置) 排序後讀取，回傳仍依請求順序
+● LRU 快取 (species, gene, up_bp) → 序列，大小由 --cache_size 控制
+
+Python 端可用 fetch_promoters() 取得序列（見下方）。
+"""
+
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+
+from extract_promoter import load_gene_table, calc_promoter, reverse_complement
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+# ────── 物種資料 ──────
+class Species:
+    def __init__(self, name, gff_path, fasta_path, cache_size=20000, preload=False):
+        from pyfaidx import Fasta
+
+        t0 = time.perf_counter()
+        self.name = name
+        anno = load_gene_table(gff_path)
+        self.genes = {row.Index: row for row in anno.itertuples()}
+        self.fa = Fasta(fasta_path, sequence_always_upper=True)
+        self.chr_len = {c: len(self.fa[c]) for c in self.fa.keys()}
+        self.lock = threading.Lock()
+        self.chroms = ({c: self.fa[c][:].seq for c in self.fa.keys()} if preload else None)
+        self.promoter = lru_cache(maxsize=cache_size)(self._promoter)
+        sys.stderr.write(f"[INFO] {name}: {len(self.genes):,} genes, "
+                         f"{len(self.chr_len)} sequences "
+                         f"({time.perf_counter() - t0:.1f}s{', preloaded' if preload else ''})\n")
+
+    def _fetch(self, chrom, start, end):
+        if self.chroms is not None:
+            return self.chroms[chrom][start - 1: end]
+        with self.lock:
+            return self.fa[chrom][start - 1: end].seq
+
+    def _promoter(self, gid, up_bp):
+        """回傳 (位置字串, 序列)；找不到基因或染色體時回傳 None"""
+        row = self.genes.get(gid)
+        if row is None or row.chr not in self.chr_len:
+            return None
+        p_start, p_end = calc_promoter(row, up_bp, self.chr_len[row.chr])
+        seq = self._fetch(row.chr, p_start, p_end)
+        if row.strand == "-":
+            seq = reverse_complement(seq)
+        return f"{row.chr}:{p_start}-{p_end}({row.strand})", seq
+
+    def batch(self, genes, up_bp, label):
+        """依染色體位置排序後擷取，回傳 (records 依請求順序, missing)"""
+        def locus(g):
+            row = self.genes.get(g)
+            return (row.chr, row.start) if row is not None else ("", 0)
+
+        found = {}
+        for gid in sorted(set(genes), key=locus):
+            hit = self.promoter(gid, up_bp)
+            if hit is not None:
+                found[gid] = hit
+        records = [(f"{g}|{found[g][0]}|{up_bp}bp_upstream|{label}", found[g][1])
+                   for g in genes if g in found]
+        missing = [g for g in dict.fromkeys(genes) if g not in found]
+        return records, missing
+
+
+# ────── HTTP ──────
+class Handler(BaseHTTPRequestHandler):
+    species: dict = {}
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, code, body: bytes, ctype="application/json", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, code, obj):
+        self._send(code, json.dumps(obj).encode())
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._json(200, {"status": "ok"})
+        elif self.path == "/species":
+            self._json(200, {n: {"genes": len(s.genes),
+                                 "cache": s.promoter.cache_info()._asdict()}
+                             for n, s in self.species.items()})
+        else:
+            self._json(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/promoters":
+            return self._json(404, {"error": f"unknown path {self.path}"})
+        try:
+            req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            sp = self.species[req["species"]]
+            genes = [str(g) for g in req["genes"]]
+            up_bp = int(req.get("up_bp", 1000))
+            label = str(req.get("label", "query"))
+            fmt = req.get("format", "fasta")
+        except KeyError as e:
+            return self._json(400, {"error": f"missing or unknown field: {e}"})
+        except (ValueError, TypeError) as e:
+            return self._json(400, {"error": str(e)})
+
+        records, missing = sp.batch(genes, up_bp, label)
+        hdr = {"X-Missing-Count": str(len(missing)),
+               "X-Missing-Ids": ",".join(missing[:1000])}
+        if fmt == "json":
+            self._json(200, {"records": records, "missing": missing})
+        elif fmt == "npz":
+            from promoter_seq import PromoterSet
+            buf = io.BytesIO()
+            PromoterSet.from_records(records).save_npz(buf)
+            self._send(200, buf.getvalue(), "application/octet-stream", hdr)
+        elif fmt == "fasta":
+            body = "".join(f">{h}\n{s}\n" for h, s in records).encode()
+            self._send(200, body, "text/x-fasta", hdr)
+        else:
+            self._json(400, {"error": f"unknown format {fmt}"})
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write(f"[{time.strftime('%H:%M:%S')}] {fmt % args}\n")
+
+
+# ────── client ──────
+def fetch_promoters(genes, species, up_bp=1000, label="query",
+                    url=DEFAULT_URL, fmt="fasta"):
+    """向服務要求 promoter：fasta → str；json → dict；npz → PromoterSet"""
+    import urllib.request
+    payload = json.dumps({"species": species, "genes": list(genes), "up_bp": up_bp,
+                          "label": label, "format": fmt}).encode()
+    req = urllib.request.Request(f"{url}/promoters", data=payload,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req) as resp:
+        body = resp.read()
+    if fmt == "json":
+        return json.loads(body)
+    if fmt == "npz":
+        from promoter_seq import PromoterSet
+        return PromoterSet.load_npz(io.BytesIO(body))
+    return body.decode()
+
+
+# ────── 主程式 ──────
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Serve promoter sequences over localhost HTTP.")
+    p.add_argument("--species", action="append", required=True,
+                   help="NAME=GFF,FASTA（可重複）")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--cache_size", type=int, default=20000,
+                   help="每個物種 LRU 快取的序列數")
+    p.add_argument("--preload", action="store_true",
+                   help="把整個基因體讀進記憶體（較快，較耗記憶體）")
+    args = p.parse_args(argv)
+
+    species = {}
+    for spec in args.species:
+        try:
+            name, paths = spec.split("=", 1)
+            gff, fasta = paths.split(",", 1)
+        except ValueError:
+            sys.exit(f"❌ --species 格式應為 NAME=GFF,FASTA：{spec}")
+        species[name] = Species(name, gff, fasta, args.cache_size, args.preload)
+
+    Handler.species = species
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    server.daemon_threads = True
+    sys.stderr.write(f"✅ Serving {', '.join(species)} on http://127.0.0.1:{args.port}\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
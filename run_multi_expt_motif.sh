@@ -4,6 +4,7 @@
 #
 # 需先安裝 MEME Suite 並將 `streme` 加入 $PATH
 # 執行：  bash run_streme_batch.sh
+# 平行／可續跑版本：python streme_batch.py -r <ROOT_DIR> --cores N
 #========================================================================
 
 ######################### CONFIG (edit here) ############################
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+stage_run.py
+============
+Shell 流程用的內容定址 stage 執行器：輸入、參數、輸出皆未變就略過
+
+用法（於 .sh 中）：
+  python stage_run.py --name step2 \\
+      --in extract_DEG_and_nonDEG.py --in deg_summary/tomato_DEG.tsv \\
+      --out "deg_summary/tomato_*_filtered_sig_count_3*" \\
+      -- python extract_DEG_and_nonDEG.py --sig_th 3 ...
+
+● 每個 stage 一份 manifest：<cache_dir>/<name>.json
+    cmd（完整指令）、params（--param K=V）、inputs / outputs 的 SHA-256
+● 略過條件：manifest 存在，且指令與參數相同、目前輸入雜湊相同、
+  輸出檔仍存在且未被改動；否則執行並重寫 manifest
+● --in / --out 可為檔案、資料夾（遞迴）或 glob；
+  上游輸出的內容改變 → 下游輸入雜湊改變 → 下游自動重跑
+● 檔案雜湊依 (大小, mtime) 快取於 <cache_dir>/hashes.json，大型基因體不會每次重算
+"""
+
+from pathlib import Path
+import argparse
+import glob
+import hashlib
+import json
+import sys
+import time
+
+from instrument import run_tool
+
+
+# ────── 雜湊 ──────
+class HashCache:
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = json.loads(path.read_text()) if path.is_file() else {}
+
+    def digest(self, f: Path) -> str:
+        st = f.stat()
+        key = str(f.resolve())
+        hit = self.data.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        h = hashlib.sha256()
+        with open(f, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+        self.data[key] = [st.st_size, st.st_mtime_ns, h.hexdigest()]
+        return h.hexdigest()
+
+    def save(self):
+        self.path.write_text(json.dumps(self.data, indent=0, sort_keys=True))
+
+
+def expand(specs):
+    """檔案 / 資料夾 / glob → 排序後的檔案清單；回傳 (檔案, 不存在的檔案 / 資料夾)
+
+    glob 沒有符合的檔案不算缺少（例如某一類 promoter 清單為空時不會產生 FASTA）
+    """
+    files, missing = [], []
+    for spec in specs:
+        if glob.has_magic(spec):
+            found = [Path(p) for p in glob.glob(spec, recursive=True) if Path(p).is_file()]
+        elif Path(spec).is_dir():
+            found = [p for p in Path(spec).rglob("*") if p.is_file()]
+        elif Path(spec).is_file():
+            found = [Path(spec)]
+        else:
+            found = []
+        if not found and not glob.has_magic(spec):
+            missing.append(spec)
+        files += found
+    return sorted(set(files)), missing
+
+
+def snapshot(specs, hashes: HashCache) -> dict:
+    files, missing = expand(specs)
+    snap = {str(f): hashes.digest(f) for f in files}
+    snap.update({spec: None for spec in missing})
+    return snap
+
+
+# ────── 主程式 ──────
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    p = argparse.ArgumentParser(description="Content-addressed pipeline stage.")
+    p.add_argument("--name", required=True, help="stage 名稱（manifest 檔名）")
+    p.add_argument("--in", dest="inputs", action="append", default=[],
+                   help="輸入檔案 / 資料夾 / glob（可重複）")
+    p.add_argument("--out", dest="outputs", action="append", default=[],
+                   help="輸出檔案 / 資料夾 / glob（可重複）")
+    p.add_argument("--param", action="append", default=[],
+                   help="額外參數 K=V（指令之外、會影響結果的設定）")
+    p.add_argument("--cache_dir", default=".stage_cache")
+    p.add_argument("--force", action="store_true", help="忽略 manifest，一律執行")
+    if "--" not in argv:
+        if {"-h", "--help"} & set(argv):
+            p.parse_args(argv)
+        sys.exit("❌ 需要以 -- 分隔要執行的指令")
+    split = argv.index("--")
+    cmd = argv[split + 1:]
+    if not cmd:
+        sys.exit("❌ -- 之後沒有指令")
+    args = p.parse_args(argv[:split])
+
+    cache = Path(args.cache_dir)
+    cache.mkdir(parents=True, exist_ok=True)
+    man_path = cache / f"{args.name}.json"
+    hashes = HashCache(cache / "hashes.json")
+
+    params = dict(kv.split("=", 1) for kv in args.param)
+    inputs = snapshot(args.inputs, hashes)
+
+    if man_path.is_file() and not args.force:
+        man = json.loads(man_path.read_text())
+        outputs_now = snapshot(args.outputs, hashes)
+        if (man.get("cmd") == cmd and man.get("params") == params
+                and man.get("inputs") == inputs and man.get("outputs") == outputs_now
+                and None not in outputs_now.values()):
+            hashes.save()
+            print(f"↺  [{args.name}] 輸入 / 參數 / 輸出皆未變 – skipped.")
+            return
+        reason = ("指令不同" if man.get("cmd") != cmd else
+                  "參數不同" if man.get("params") != params else
+                  "輸入改變" if man.get("inputs") != inputs else "輸出缺少或被改動")
+        print(f"▶  [{args.name}] {reason}，重新執行")
+
+    man_path.unlink(missing_ok=True)          # 執行失敗時下次一定重跑
+    t0 = time.perf_counter()
+    rc = run_tool(cmd, name=args.name).returncode
+    wall = time.perf_counter() - t0
+    if rc != 0:
+        hashes.save()
+        sys.exit(rc)
+
+    outputs = snapshot(args.outputs, hashes)
+    hashes.save()
+    missing = [k for k, v in outputs.items() if v is None]
+    if missing:
+        sys.exit(f"❌ [{args.name}] 指令完成但找不到輸出：{', '.join(missing)}")
+
+    man_path.write_text(json.dumps({
+        "name": args.name, "cmd": cmd, "params": params,
+        "inputs": inputs, "outputs": outputs,
+        "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"), "wall_s": round(wall, 2),
+    }, indent=1))
+    print(f"✔  [{args.name}] 完成（{wall:.1f}s，{len(outputs)} 個輸出已記錄）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+streme_batch.py
+===============
+run_multi_expt_motif.sh 的 Python 排程版：對每個 <ROOT_DIR>/SRP*/ 執行 STREME
+
+● 在核心預算內同時執行多個 STREME（--cores / --threads_per_job）
+● 依預估時間「最長者優先」排序：
+    歷史紀錄足夠 → 以 wall ≈ b0 + b1·n_pos + b2·n_neg + b3·total_bp 最小平方擬合估計；
+    紀錄太少 → 每 bp 秒數中位數 × 本次序列總長；無紀錄 → 直接用序列總長
+● <sample>/streme_<size>/streme.txt 比輸入 FASTA 新 → 視為完成並略過
+● 先輸出到 streme_<size>.part/，成功後才改名；失敗自動重試 --retries 次
+● 每次嘗試（含失敗後的重試）各附加一列到 <ROOT_DIR>/streme_timings.tsv，
+  status = ok / failed；只有 ok 列作為下次估計依據
+
+--streme 可指定執行檔（例如測試用的 stub）。
+"""
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse
+import shutil
+import statistics
+import sys
+import time
+
+from instrument import run_tool
+
+
+TIMING_COLUMNS = ["sample", "n_pos", "n_neg", "total_bp", "wall_s", "status"]
+
+
+# ────── 工具函式 ──────
+def fasta_stats(path: Path):
+    """回傳 (序列數, 總長度)；逐行讀取"""
+    n, total = 0, 0
+    with open(path) as fh:
+        for ln in fh:
+            if ln.startswith(">"):
+                n += 1
+            else:
+                total += len(ln.strip())
+    return n, total
+
+
+def find_jobs(root: Path, prom_size: str):
+    jobs = []
+    for sample_dir in sorted(root.glob("SRP*/")):
+        pos = sorted(sample_dir.glob(f"*_DEG_promoter_{prom_size}.fa"))
+        neg = sorted(sample_dir.glob(f"*_nonDEG_promoter_{prom_size}.fa"))
+        if not (pos and neg):
+            print(f"⚠️  [{sample_dir.name}] FASTA not found – skipped.")
+            continue
+        n_pos, bp_pos = fasta_stats(pos[0])
+        n_neg, bp_neg = fasta_stats(neg[0])
+        jobs.append({
+            "sample": sample_dir.name, "pos": pos[0], "neg": neg[0],
+            "oc": sample_dir / f"streme_{prom_size}",
+            "n_pos": n_pos, "n_neg": n_neg, "total_bp": bp_pos + bp_neg,
+        })
+    return jobs
+
+
+def is_done(job) -> bool:
+    txt = job["oc"] / "streme.txt"
+    if not txt.is_file():
+        return False
+    newest_input = max(job["pos"].stat().st_mtime, job["neg"].stat().st_mtime)
+    return txt.stat().st_mtime >= newest_input
+
+
+def load_timings(path: Path):
+    if not path.is_file():
+        return []
+    rows = []
+    with open(path) as fh:
+        next(fh, None)
+        for ln in fh:
+            parts = ln.rstrip("\n").split("\t")
+            if len(parts) == len(TIMING_COLUMNS) and parts[-1] == "ok":
+                rows.append(dict(zip(TIMING_COLUMNS, parts)))
+    return rows
+
+
+FIT_FEATURES = ["n_pos", "n_neg", "total_bp"]
+MIN_FIT_ROWS = 2 * (len(FIT_FEATURES) + 1)       # 少於此筆數不擬合
+
+
+def fit_timings(history):
+    """
+    歷史紀錄 → 最小平方係數 [b0, b_pos, b_neg, b_bp]；筆數不足時回傳 None。
+    promoter 長度固定時 total_bp 與序列數幾乎共線，截去極小奇異值取最小範數解
+    """
+    if len(history) < MIN_FIT_ROWS:
+        return None
+    import numpy as np
+    X = np.array([[1.0] + [float(r[c]) for c in FIT_FEATURES] for r in history])
+    y = np.array([float(r["wall_s"]) for r in history])
+    scale = np.abs(X).max(axis=0)                 # 欄位量級差很大（序列數 vs bp）
+    scale[scale == 0] = 1.0
+    coef = np.linalg.lstsq(X / scale, y, rcond=1e-6)[0]
+    return coef / scale
+
+
+def estimate_seconds(job, history, coef=None) -> float:
+    """
+    coef（fit_timings）可用且預測為正 → 依序列數與總長的線性模型；
+    否則以歷史每 bp 秒數中位數估計；無紀錄時回傳總長（只用於排序）
+    """
+    if coef is not None:
+        est = coef[0] + sum(b * job[c] for b, c in zip(coef[1:], FIT_FEATURES))
+        if est > 0:
+            return float(est)
+    rates = [float(r["wall_s"]) / int(r["total_bp"])
+             for r in history if int(r["total_bp"]) > 0]
+    if not rates:
+        return float(job["total_bp"])
+    return statistics.median(rates) * job["total_bp"]
+
+
+def run_streme(job, args) -> tuple:
+    """執行單一 STREME（含重試），回傳 (job, [(秒數, 狀態), ...]) —— 每次嘗試一筆"""
+    part = job["oc"].with_name(job["oc"].name + ".part")
+    cmd = [
+        args.streme,
+        "--p", str(job["pos"]), "--n", str(job["neg"]),
+        "--dna",
+        "--minw", str(args.minw), "--maxw", str(args.maxw),
+        "--nmotifs", str(args.nmotifs),
+        "--oc", str(part),
+        "--verbosity", str(args.verbosity),
+    ]
+    attempts = []
+    for attempt in range(1, args.retries + 2):
+        shutil.rmtree(part, ignore_errors=True)
+        t0 = time.perf_counter()
+        proc = run_tool(cmd, name="streme", capture_output=True, text=True,
+                        items=job["total_bp"], unit="bp")
+        wall = time.perf_counter() - t0
+        if proc.returncode == 0 and (part / "streme.txt").is_file():
+            (part / "streme.log").write_text(proc.stdout + proc.stderr)
+            shutil.rmtree(job["oc"], ignore_errors=True)
+            part.rename(job["oc"])
+            attempts.append((wall, "ok"))
+            return job, attempts
+        attempts.append((wall, "failed"))
+        sys.stderr.write(
+            f"[WARN] {job['sample']}: STREME failed (attempt {attempt}, "
+            f"exit {proc.returncode})\n{proc.stderr[-2000:]}\n")
+    return job, attempts
+
+
+# ────── 主程式 ──────
+def main(argv=None):
+    p = argparse.ArgumentParser(
+        description="Schedule STREME over every SRP*/ sample folder.")
+    p.add_argument("-r", "--root_dir", default="./multi_exp_arabidopsis")
+    p.add_argument("--prom_size", default="1kb",
+                   help='"1kb" / "2kb"... (檔名必須含此字串)')
+    p.add_argument("--minw", type=int, default=5)
+    p.add_argument("--maxw", type=int, default=15)
+    p.add_argument("--nmotifs", type=int, default=20)
+    p.add_argument("--verbosity", type=int, default=1)
+    p.add_argument("--cores", type=int, default=4,
+                   help="Total core budget")
+    p.add_argument("--threads_per_job", type=int, default=1,
+                   help="Cores reserved per STREME job (scheduling unit only; "
+                        "STREME itself runs single-threaded)")
+    p.add_argument("--retries", type=int, default=1,
+                   help="Retries per failed job (>= 0)")
+    p.add_argument("--streme", default="streme",
+                   help="STREME executable")
+    p.add_argument("--force", action="store_true",
+                   help="Rerun even if streme.txt is up to date")
+    args = p.parse_args(argv)
+    if args.retries < 0:
+        p.error("--retries must be >= 0")
+
+    root = Path(args.root_dir).expanduser()
+    timing_path = root / "streme_timings.tsv"
+    history = load_timings(timing_path)
+
+    jobs = find_jobs(root, args.prom_size)
+    todo = [j for j in jobs if args.force or not is_done(j)]
+    for j in jobs:
+        if j not in todo:
+            print(f"↺  [{j['sample']}] streme.txt up to date – skipped.")
+    coef = fit_timings(history)
+    for j in todo:
+        j["estimate"] = estimate_seconds(j, history, coef)
+    todo.sort(key=lambda j: j["estimate"], reverse=True)    # 最長者優先
+
+    n_workers = max(1, args.cores // max(1, args.threads_per_job))
+    print(f"\n=== STREME batch: {len(todo)} to run, "
+          f"{len(jobs) - len(todo)} skipped, {n_workers} concurrent ===")
+
+    if not timing_path.is_file():
+        timing_path.write_text("\t".join(TIMING_COLUMNS) + "\n")
+    n_fail = 0
+    with ThreadPoolExecutor(max_workers=n_workers) as pool:
+        futs = [pool.submit(run_streme, j, args) for j in todo]
+        for fut in as_completed(futs):
+            job, attempts = fut.result()
+            with open(timing_path, "a") as fh:
+                for wall, status in attempts:
+                    fh.write(f"{job['sample']}\t{job['n_pos']}\t{job['n_neg']}\t"
+                             f"{job['total_bp']}\t{wall:.2f}\t{status}\n")
+            status = attempts[-1][1]
+            wall = sum(w for w, _ in attempts)
+            mark = "✅" if status == "ok" else "❌"
+            print(f"{mark} [{job['sample']}] {status} in {wall:.1f}s "
+                  f"({len(attempts)} attempt(s)) → {job['oc']}")
+            n_fail += status != "ok"
+
+    print("=== All done ===")
+    if n_fail:
+        sys.exit(f"{n_fail} STREME job(s) failed")
+
+
+if __name__ == "__main__":
+    main()
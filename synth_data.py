@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+synth_data.py
+=============
+產生可調規模的合成輸入，供 benchmark.py 或本機測試使用（不需 SRA / 真實基因體）
+
+  python synth_data.py --out synth_small --scale small
+  python synth_data.py --out synth_big --scale large --genes 40000   # 預設規模再覆寫
+
+輸出結構：
+  <out>/ref/genome.fa, genes.gff             隨機基因體 + GFF3（gene / mRNA）
+  <out>/raw_counts/SYN_counts.txt            featureCounts 表（# 註解行 + 6 欄註解 + BAM 欄）
+  <out>/run_info.txt                         Run ↔ GEO_Accession (exp)（每個 GSM 2 個 SRR）
+  <out>/deg_results/EXPnn.tsv                DESeq2 結果（Geneid, baseMean, log2FoldChange, lfcSE, stat, pvalue, padj）
+  <out>/gene_lists/EXPnn/DEG.txt, nonDEG.txt extract_multi_expt_promoter.py 的輸入
+  <out>/motifs/streme.meme, tomtom.tsv       STREME 風格 motif 與 Tomtom 自比對 edge 表
+  <out>/synth.json                           規模參數與 seed
+
+● 同一組參數與 seed 產生相同檔案
+● DE 基因在各實驗間部分重疊，sig_count 分佈接近真實資料
+"""
+
+from pathlib import Path
+import argparse
+import json
+import sys
+
+import numpy as np
+
+SCALES = {
+    "tiny":   dict(chroms=2, chr_len=200_000,    genes=500,    experiments=3,  runs=4,
+                   motifs=30,   edges_per_motif=5),
+    "small":  dict(chroms=4, chr_len=2_000_000,  genes=5_000,  experiments=6,  runs=8,
+                   motifs=200,  edges_per_motif=20),
+    "medium": dict(chroms=8, chr_len=10_000_000, genes=20_000, experiments=12, runs=16,
+                   motifs=1_000, edges_per_motif=50),
+    "large":  dict(chroms=12, chr_len=30_000_000, genes=35_000, experiments=24, runs=32,
+                   motifs=5_000, edges_per_motif=100),
+}
+BASES = np.frombuffer(b"ACGT", dtype=np.uint8)
+
+
+# ────── 基因體 / 註解 ──────
+def chrom_names(n):
+    return [f"ch{c:02d}" for c in range(1, n + 1)]
+
+
+def write_genome(path, n_chr, chr_len, rng, line=60):
+    """隨機 ACGT 基因體（含少量 N 區段）"""
+    with open(path, "w") as fh:
+        for name in chrom_names(n_chr):
+            fh.write(f">{name}\n")
+            seq = BASES[rng.integers(0, 4, chr_len)]
+            for s in rng.integers(0, chr_len, max(chr_len // 1_000_000, 1)):
+                seq[s: s + 500] = ord("N")
+            text = seq.tobytes().decode()
+            fh.write("\n".join(text[i: i + line] for i in range(0, chr_len, line)) + "\n")
+    return path
+
+
+def write_gff(path, n_chr, chr_len, n_genes, rng):
+    """基因平均分佈於各染色體、正負股各半；回傳基因 ID 清單"""
+    ids = []
+    per_chr = -(-n_genes // n_chr)
+    with open(path, "w") as fh:
+        fh.write("##gff-version 3\n")
+        for c, name in enumerate(chrom_names(n_chr), 1):
+            n = min(per_chr, n_genes - len(ids))
+            slot = chr_len // max(n, 1)
+            for k in range(n):
+                gid = f"Solyc{c:02d}g{k * 10:06d}"
+                length = int(rng.integers(300, max(min(slot - 200, 8000), 400)))
+                start = k * slot + int(rng.integers(1, max(slot - length, 2)))
+                end = min(start + length, chr_len)
+                strand = "+-"[int(rng.integers(0, 2))]
+                fh.write(f"{name}\tsynth\tgene\t{start}\t{end}\t.\t{strand}\t.\t"
+                         f"ID={gid};Name={gid}\n")
+                fh.write(f"{name}\tsynth\tmRNA\t{start}\t{end}\t.\t{strand}\t.\t"
+                         f"ID={gid}.1;Parent={gid}\n")
+                ids.append(gid)
+    return ids
+
+
+# ────── 表現量 / DEG ──────
+def write_featurecounts(path, run_info, gene_ids, n_runs, rng):
+    runs = [f"SRR{9_000_000 + r}" for r in range(n_runs)]
+    mu = rng.lognormal(4, 2, len(gene_ids))
+    counts = rng.poisson(mu[:, None] * rng.uniform(0.7, 1.3, n_runs)[None, :])
+    with open(path, "w") as fh:
+        fh.write('# Program:featureCounts v2.0.6; Command:"featureCounts" synthetic\n')
+        cols = ["Geneid", "Chr", "Start", "End", "Strand", "Length"]
+        cols += [f"/data/bam/{r}Aligned.sortedByCoord.out.bam" for r in runs]
+        fh.write("\t".join(cols) + "\n")
+        for gid, row in zip(gene_ids, counts.tolist()):
+            fh.write(f"{gid}\tch01\t1\t1000\t+\t1000\t" + "\t".join(map(str, row)) + "\n")
+    with open(run_info, "w") as fh:
+        fh.write("Run\tGEO_Accession (exp)\n")
+        for r, run in enumerate(runs):
+            fh.write(f"{run}\tGSM{7_000_000 + r // 2}\n")
+    return runs
+
+
+def bh_adjust(p):
+    order = np.argsort(p)
+    ranked = p[order] * len(p) / np.arange(1, len(p) + 1)
+    q = np.minimum.accumulate(ranked[::-1])[::-1]
+    out = np.empty_like(q)
+    out[order] = np.minimum(q, 1.0)
+    return out
+
+
+def write_deseq_tables(out_dir, gene_ids, n_exp, rng, frac_de=0.1):
+    """每個實驗一份 DESeq2 結果；DE 基因取自共同池以產生跨實驗重疊"""
+    from scipy.stats import norm
+    out_dir.mkdir(parents=True, exist_ok=True)
+    n = len(gene_ids)
+    pool = rng.choice(n, size=max(int(n * frac_de * 2), 1), replace=False)
+    gid = np.array(gene_ids)
+    for e in range(n_exp):
+        de = np.zeros(n, dtype=bool)
+        de[rng.choice(pool, size=len(pool) // 2, replace=False)] = True
+        base = rng.lognormal(5, 1.5, n)
+        se = rng.uniform(0.1, 0.6, n)
+        lfc = np.where(de, rng.choice([-1, 1], n) * rng.uniform(1.2, 4, n),
+                       rng.normal(0, 0.15, n))
+        stat = lfc / se
+        pval = np.clip(2 * norm.sf(np.abs(stat)), 1e-300, 1)
+        padj = bh_adjust(pval)
+        lowexp = base < 2
+        padj[lowexp] = np.nan
+        order = np.lexsort((-lfc, np.nan_to_num(padj, nan=2)))
+        with open(out_dir / f"EXP{e + 1:02d}.tsv", "w") as fh:
+            fh.write("Geneid\tbaseMean\tlog2FoldChange\tlfcSE\tstat\tpvalue\tpadj\n")
+            for i in order.tolist():
+                fh.write(f"{gid[i]}\t{base[i]:.4f}\t{lfc[i]:.6f}\t{se[i]:.6f}\t"
+                         f"{stat[i]:.6f}\t{pval[i]:.6g}\t{padj[i]:.6g}\n")
+
+
+def write_gene_lists(root, gene_ids, n_exp, rng, n_deg=300, neg_multiplier=3):
+    for e in range(n_exp):
+        d = root / f"EXP{e + 1:02d}"
+        d.mkdir(parents=True, exist_ok=True)
+        k = min(n_deg, len(gene_ids) // (neg_multiplier + 1))
+        pick = rng.choice(len(gene_ids), size=k * (neg_multiplier + 1), replace=False)
+        (d / "DEG.txt").write_text("\n".join(gene_ids[i] for i in pick[:k]) + "\n")
+        (d / "nonDEG.txt").write_text("\n".join(gene_ids[i] for i in pick[k:]) + "\n")
+
+
+# ────── Motif ──────
+MEME_HEADER = ("MEME version 5.5.5\n\nALPHABET= ACGT\n\nstrands: + -\n\n"
+               "Background letter frequencies\nA 0.3 C 0.2 G 0.2 T 0.3\n")
+
+
+def write_meme(path, n_motifs, rng):
+    """STREME 風格 motif（ID = 序號-consensus），回傳 ID 清單"""
+    ids, blocks = [], []
+    for k in range(1, n_motifs + 1):
+        w = int(rng.integers(6, 16))
+        pwm = rng.dirichlet(np.full(4, 0.4), size=w)
+        cons = "".join("ACGT"[j] for j in pwm.argmax(axis=1))
+        mid = f"{k}-{cons}"
+        nsites = int(rng.integers(20, 2000))
+        ev = float(10 ** rng.uniform(-20, 1.2))
+        rows = "\n".join(" " + " ".join(f"{x:.6f}" for x in r) for r in pwm)
+        blocks.append(f"MOTIF {mid} STREME-{k}\nletter-probability matrix: "
+                      f"alength= 4 w= {w} nsites= {nsites} E= {ev:.1e}\n{rows}\n")
+        ids.append(mid)
+    Path(path).write_text(MEME_HEADER + "\n" + "\n".join(blocks))
+    return ids
+
+
+def write_tomtom_edges(path, motif_ids, edges_per_motif, rng):
+    """Tomtom 自比對 tsv（含自身比對與結尾 # 註解）"""
+    n = len(motif_ids)
+    cols = ["Query_ID", "Target_ID", "Optimal_offset", "p-value", "E-value", "q-value",
+            "Overlap", "Query_consensus", "Target_consensus", "Orientation"]
+    with open(path, "w") as fh:
+        fh.write("\t".join(cols) + "\n")
+        for q in range(n):
+            targets = np.concatenate([[q], rng.integers(0, n, edges_per_motif)])
+            pvals = np.concatenate([[1e-12], 10 ** rng.uniform(-8, 0, edges_per_motif)])
+            for t, p in zip(targets.tolist(), pvals.tolist()):
+                qv = min(p * n, 1.0)
+                fh.write(f"{motif_ids[q]}\t{motif_ids[t]}\t0\t{p:.3e}\t{p * n:.3e}\t"
+                         f"{qv:.3e}\t8\tACGTACGT\tACGTACGT\t{'+-'[t % 2]}\n")
+        fh.write("\n# Tomtom (Motif Comparison Tool): synthetic\n")
+
+
+# ────── 主程式 ──────
+def generate(out, scale: dict, seed: int = 1):
+    out = Path(out)
+    rng = np.random.default_rng(seed)
+    for sub in ("ref", "raw_counts", "motifs"):
+        (out / sub).mkdir(parents=True, exist_ok=True)
+
+    write_genome(out / "ref/genome.fa", scale["chroms"], scale["chr_len"], rng)
+    genes = write_gff(out / "ref/genes.gff", scale["chroms"], scale["chr_len"],
+                      scale["genes"], rng)
+    write_featurecounts(out / "raw_counts/SYN_counts.txt", out / "run_info.txt",
+                        genes, scale["runs"], rng)
+    write_deseq_tables(out / "deg_results", genes, scale["experiments"], rng)
+    write_gene_lists(out / "gene_lists", genes, scale["experiments"], rng)
+    ids = write_meme(out / "motifs/streme.meme", scale["motifs"], rng)
+    write_tomtom_edges(out / "motifs/tomtom.tsv", ids, scale["edges_per_motif"], rng)
+
+    (out / "synth.json").write_text(json.dumps({**scale, "seed": seed}, indent=1))
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Generate synthetic pipeline inputs.")
+    p.add_argument("--out", required=True)
+    p.add_argument("--scale", choices=SCALES, default="small")
+    p.add_argument("--seed", type=int, default=1)
+    for key, val in SCALES["small"].items():
+        p.add_argument(f"--{key}", type=int, help=f"覆寫預設規模（small = {val}）")
+    args = p.parse_args(argv)
+
+    scale = dict(SCALES[args.scale])
+    scale.update({k: getattr(args, k) for k in scale if getattr(args, k) is not None})
+    generate(args.out, scale, args.seed)
+    sys.stderr.write(f"[DONE] {args.scale} synthetic data → {args.out}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+共用 fixture：讓測試可直接 import 根目錄的腳本，並產生外部工具的替身（stub）
+
+外部工具（STAR / featureCounts / STREME / prefetch / fasterq-dump）皆以
+--star / --streme ... 參數換成 tmp_path 下的 Python 小腳本，不需實際安裝
+"""
+
+from pathlib import Path
+import stat
+import sys
+import textwrap
+
+import pytest
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+
+@pytest.fixture
+def make_stub(tmp_path):
+    """make_stub(name, body) → 可執行的 Python 替身路徑；body 內 CALLS 為呼叫紀錄檔"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir(exist_ok=True)
+    calls = tmp_path / "calls.log"
+
+    def make(name: str, body: str) -> str:
+        path = bin_dir / name
+        path.write_text(f"#!{sys.executable}\n"
+                        "import os, sys\n"
+                        f"CALLS = {str(calls)!r}\n"
+                        "open(CALLS, 'a').write(' '.join([os.path.basename(sys.argv[0])] + sys.argv[1:]) + '\\n')\n"
+                        + textwrap.dedent(body))
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+        return str(path)
+
+    make.calls = lambda: calls.read_text().splitlines() if calls.is_file() else []
+    return make
@@ -0,0 +1,83 @@
+import subprocess
+import sys
+
+import align_count
+from conftest import REPO
+
+STAR = """
+a = sys.argv
+pre = a[a.index("--outFileNamePrefix") + 1]
+if a[a.index("--genomeLoad") + 1] != "LoadAndKeep":
+    sys.exit(0)
+open(pre + "Aligned.sortedByCoord.out.bam", "w").write("bam")
+open(pre + "Log.final.out", "w").write("ok")
+"""
+
+# featureCounts 格式：一行註解 + Geneid..Length + 每個 BAM 一欄
+FEATURECOUNTS = """
+a = sys.argv
+bams = a[a.index("--primary") + 1:]
+with open(a[a.index("-o") + 1], "w") as fh:
+    fh.write("# Program:featureCounts\\n")
+    fh.write("\\t".join(["Geneid", "Chr", "Start", "End", "Strand", "Length", *bams]) + "\\n")
+    for g in ("g1", "g2"):
+        fh.write("\\t".join([g, "1", "1", "100", "+", "100"] + ["5"] * len(bams)) + "\\n")
+"""
+
+
+def make_project(tmp_path):
+    proj = tmp_path / "raw_data" / "SRP399644_tomato_root"
+    proj.mkdir(parents=True)
+    for srr in ("SRR0001", "SRR0002"):
+        (proj / f"{srr}.fastq").write_text("@r\nACGT\n+\nIIII\n")
+    genome = tmp_path / "star_index"
+    genome.mkdir()
+    for f in align_count.GENOME_FILES:
+        (genome / f).write_bytes(b"x" * 1000)
+    return genome
+
+
+def test_two_samples_shared_genome(tmp_path, make_stub):
+    genome = make_project(tmp_path)
+    argv = ["--base_dir", str(tmp_path / "raw_data"), "--genome_dir", str(genome),
+            "--gtf", "genes.gtf", "--threads", "4", "--star_threads", "2",
+            "--mem_gb", "8", "--sort_ram", "2", "--fc_threads", "2",
+            "--star", make_stub("STAR", STAR),
+            "--featurecounts", make_stub("featureCounts", FEATURECOUNTS)]
+    align_count.main(argv)
+
+    calls = make_stub.calls()
+    star = [c for c in calls if c.startswith("STAR")]
+    assert "--genomeLoad LoadAndExit" in star[0]
+    assert "--genomeLoad Remove" in star[-1]
+    aligns = [c for c in star if "LoadAndKeep" in c]
+    assert len(aligns) == 2
+    assert all(f"--limitBAMsortRAM {int(2e9)}" in c for c in aligns)
+
+    # 與 to_featureCounts.sh 相同的檔名，combine_geo_data.py 可直接讀取
+    counts = tmp_path / "raw_data/SRP399644_tomato_root_count/SRP399644_tomato_counts.txt"
+    assert counts.is_file()
+    (tmp_path / "exp_files/tomato").mkdir(parents=True)
+    (tmp_path / "run_info.txt").write_text(
+        "Run\tGEO_Accession (exp)\nSRR0001\tGSM1\nSRR0002\tGSM2\n")
+    subprocess.run([sys.executable, str(REPO / "combine_geo_data.py")],
+                   cwd=tmp_path, check=True)
+    exp = (tmp_path / "exp_files/tomato/SRP399644_tomato_root_exp.tsv").read_text()
+    assert exp.splitlines()[0].split("\t")[1:] == ["GSM1", "GSM2"]
+
+    # 續跑：全部略過，不再呼叫 LoadAndKeep / featureCounts
+    n = len(calls)
+    align_count.main(argv)
+    again = make_stub.calls()[n:]
+    assert not any("LoadAndKeep" in c or c.startswith("featureCounts") for c in again)
+
+
+def test_keep_tissue_name(tmp_path, make_stub):
+    genome = make_project(tmp_path)
+    align_count.main(["--base_dir", str(tmp_path / "raw_data"), "--genome_dir", str(genome),
+                      "--threads", "2", "--star_threads", "2", "--mem_gb", "4",
+                      "--sort_ram", "1", "--fc_threads", "1", "--keep_tissue",
+                      "--star", make_stub("STAR", STAR),
+                      "--featurecounts", make_stub("featureCounts", FEATURECOUNTS)])
+    out = tmp_path / "raw_data/SRP399644_tomato_root_count"
+    assert [p.name for p in out.glob("*_counts.txt")] == ["SRP399644_tomato_root_counts.txt"]
@@ -0,0 +1,97 @@
+import gzip
+import json
+
+import pytest
+
+import fetch_sra
+
+PREFETCH = """
+a = sys.argv
+d = os.path.join(a[a.index("--output-directory") + 1], a[1])
+os.makedirs(d, exist_ok=True)
+open(os.path.join(d, a[1] + ".sra"), "w").write("x" * 100)
+"""
+
+# SRR2 第一次 dump 失敗；SRR3 為單端。記錄輸出檔是否為 FIFO
+FASTERQ_DUMP = """
+import stat
+a = sys.argv
+srr = os.path.basename(a[1])
+o = a[a.index("-O") + 1]
+flag = os.path.join(os.path.dirname(CALLS), "dump_failed_" + srr)
+if srr == "SRR2" and not os.path.exists(flag):
+    open(flag, "w").close()
+    sys.exit(3)
+names = [srr + ".fastq"] if srr == "SRR3" else [srr + "_1.fastq", srr + "_2.fastq"]
+for name in names:
+    path = os.path.join(o, name)
+    is_fifo = os.path.exists(path) and stat.S_ISFIFO(os.stat(path).st_mode)
+    open(CALLS, "a").write(f"FIFO {name} {is_fifo}\\n")
+    with open(path, "w") as fh:
+        fh.write("".join(f"@r{i}\\nACGT\\n+\\nIIII\\n" for i in range(2000)))
+"""
+
+
+@pytest.fixture
+def project(tmp_path, make_stub):
+    srr_list = tmp_path / "srr_list.txt"
+    srr_list.write_text("PRJ\nSRR1\nSRR2\nSRR3\n")
+    argv = ["--srr_list", str(srr_list), "--base_dir", str(tmp_path / "raw"),
+            "--prefetch", make_stub("prefetch", PREFETCH),
+            "--fasterq_dump", make_stub("fasterq-dump", FASTERQ_DUMP)]
+    return argv, tmp_path / "raw" / "PRJ"
+
+
+def manifest(out, srr):
+    return json.loads((out / ".manifest" / f"{srr}.json").read_text())
+
+
+def test_compress_on_the_fly_with_retry(project, make_stub):
+    argv, out = project
+    fetch_sra.main(argv + ["--compress"])
+
+    files = sorted(p.name for p in out.iterdir() if not p.name.startswith("."))
+    assert files == ["SRR1_1.fastq.gz", "SRR1_2.fastq.gz", "SRR2_1.fastq.gz",
+                     "SRR2_2.fastq.gz", "SRR3.fastq.gz"]
+    with gzip.open(out / "SRR3.fastq.gz", "rt") as fh:
+        assert sum(1 for _ in fh) == 8000
+    # fasterq-dump 寫入的是 FIFO，未先落地未壓縮 FASTQ
+    fifo = [c for c in make_stub.calls() if c.startswith("FIFO")]
+    assert fifo and all(c.endswith("True") for c in fifo)
+
+    info = manifest(out, "SRR2")
+    assert info["status"] == "done" and info["dump_attempts"] == 2
+    assert info["files"]["SRR2_1.fastq.gz"] == (out / "SRR2_1.fastq.gz").stat().st_size
+    assert not (out / ".tmp").exists()
+    assert not (out / ".sra" / "SRR1").exists()
+
+
+def test_uncompressed_and_resume(project, make_stub):
+    argv, out = project
+    fetch_sra.main(argv)
+    assert sorted(p.name for p in out.glob("*.fastq")) == [
+        "SRR1_1.fastq", "SRR1_2.fastq", "SRR2_1.fastq", "SRR2_2.fastq", "SRR3.fastq"]
+    assert all(fetch_sra.fastq_tail_ok(p) for p in out.glob("*.fastq"))
+    assert not any(c.endswith("True") for c in make_stub.calls() if c.startswith("FIFO"))
+
+    # manifest 相符 → 不再呼叫任何工具
+    n = len(make_stub.calls())
+    fetch_sra.main(argv)
+    assert len(make_stub.calls()) == n
+
+    # 檔案大小與 manifest 不符 → 只重抓該 SRR
+    with open(out / "SRR1_2.fastq", "a") as fh:
+        fh.write("@extra\n")
+    fetch_sra.main(argv)
+    again = [c for c in make_stub.calls()[n:] if not c.startswith("FIFO")]
+    assert [c.split()[0:2] for c in again] == [["prefetch", "SRR1"],
+                                               ["fasterq-dump", str(out / ".sra" / "SRR1")]]
+
+
+def test_dump_gives_up_after_retries(project):
+    argv, out = project
+    with pytest.raises(SystemExit) as exc:
+        fetch_sra.main(argv + ["--retries", "0"])
+    assert "SRR2" in str(exc.value)
+    assert manifest(out, "SRR2")["status"] == "dump_failed"
+    assert manifest(out, "SRR1")["status"] == "done"
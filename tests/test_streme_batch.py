@@ -0,0 +1,82 @@
+import os
+import time
+
+import pytest
+
+import streme_batch
+
+# 第一次對 SRP_FLAKY 失敗，之後成功；只寫 streme.txt
+STREME = """
+a = sys.argv
+oc = a[a.index("--oc") + 1]
+flag = os.path.join(os.path.dirname(CALLS), "failed_once")
+if "SRP_FLAKY" in oc and not os.path.exists(flag):
+    open(flag, "w").close()
+    sys.stderr.write("boom\\n")
+    sys.exit(2)
+os.makedirs(oc, exist_ok=True)
+open(os.path.join(oc, "streme.txt"), "w").write("MEME version 5\\n")
+"""
+
+
+def make_root(tmp_path, samples=("SRP_FLAKY", "SRP_OK")):
+    root = tmp_path / "root"
+    for s in samples:
+        d = root / s
+        d.mkdir(parents=True)
+        (d / f"{s}_DEG_promoter_1kb.fa").write_text(">a\nACGT\n>b\nACGTACGT\n")
+        (d / f"{s}_nonDEG_promoter_1kb.fa").write_text(">c\nACGTAC\n")
+    return root
+
+
+def timing_rows(root):
+    lines = (root / "streme_timings.tsv").read_text().splitlines()
+    assert lines[0].split("\t") == streme_batch.TIMING_COLUMNS
+    return [dict(zip(streme_batch.TIMING_COLUMNS, ln.split("\t"))) for ln in lines[1:]]
+
+
+def test_retry_rename_and_skip(tmp_path, make_stub):
+    root = make_root(tmp_path)
+    argv = ["-r", str(root), "--cores", "2", "--retries", "1",
+            "--streme", make_stub("streme", STREME)]
+    streme_batch.main(argv)
+
+    for s in ("SRP_FLAKY", "SRP_OK"):
+        assert (root / s / "streme_1kb" / "streme.txt").is_file()
+        assert (root / s / "streme_1kb" / "streme.log").is_file()
+        assert not (root / s / "streme_1kb.part").exists()
+    # 失敗的那次與重試各記一列
+    rows = timing_rows(root)
+    assert [r["status"] for r in rows if r["sample"] == "SRP_FLAKY"] == ["failed", "ok"]
+    assert [r["status"] for r in rows if r["sample"] == "SRP_OK"] == ["ok"]
+    assert all((r["n_pos"], r["n_neg"], r["total_bp"]) == ("2", "1", "18") for r in rows)
+
+    # streme.txt 比 FASTA 新 → 全部略過
+    n = len(make_stub.calls())
+    streme_batch.main(argv)
+    assert len(make_stub.calls()) == n
+
+    # FASTA 更新 → 只重跑該 sample
+    fa = root / "SRP_OK" / "SRP_OK_DEG_promoter_1kb.fa"
+    future = time.time() + 10
+    os.utime(fa, (future, future))
+    streme_batch.main(argv)
+    again = make_stub.calls()[n:]
+    assert len(again) == 1 and "SRP_OK" in again[0]
+
+
+def test_exhausted_retries_fail(tmp_path, make_stub):
+    root = make_root(tmp_path, ("SRP_FLAKY",))
+    with pytest.raises(SystemExit) as exc:
+        streme_batch.main(["-r", str(root), "--retries", "0",
+                           "--streme", make_stub("streme", STREME)])
+    assert "1 STREME job(s) failed" in str(exc.value)
+    assert not (root / "SRP_FLAKY" / "streme_1kb").exists()
+    assert [r["status"] for r in timing_rows(root)] == ["failed"]
+
+
+def test_negative_retries_rejected(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exc:
+        streme_batch.main(["-r", str(tmp_path), "--retries", "-1"])
+    assert exc.value.code == 2
+    assert "--retries must be >= 0" in capsys.readouterr().err